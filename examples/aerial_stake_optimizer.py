@@ -26,6 +26,7 @@ from kiipy.aerial.client import LedgerClient, NetworkConfig
 from kiipy.aerial.client.distribution import create_withdraw_delegator_reward
 from kiipy.aerial.client.staking import create_delegate_msg
 from kiipy.aerial.faucet import FaucetApi
+from kiipy.aerial.staking_optimizer import optimal_compounding_period
 from kiipy.aerial.tx import SigningCfg, Transaction
 from kiipy.aerial.wallet import LocalWallet
 from kiipy.protos.cosmos.bank.v1beta1.query_pb2 import QueryTotalSupplyRequest
@@ -33,29 +34,6 @@ from kiipy.protos.cosmos.params.v1beta1.query_pb2 import QueryParamsRequest
 from kiipy.protos.cosmos.staking.v1beta1.query_pb2 import QueryValidatorsRequest
 
 
-# This function returns the total reward for given:
-# * f -> fee
-# * S -> Initial Stake
-# * k -> Reward Rate
-# * D -> Total staking period
-# * x -> Compounding Period
-def M(x, f, S, k, D):
-    """
-    Calculate the total reward.
-
-    :param x: Compounding Period
-    :param f: fee
-    :param S: Initial Stake
-    :param k: Reward Rate
-    :param D: Total staking period
-
-    :return: Total reward
-    """
-    return (S * (1 + (k * x)) ** (D / x)) + (
-        (1 - ((1 + (k * x)) ** (D / x))) / (k * x)
-    ) * f
-
-
 def main():
     """Run main."""
     # TODO: make sure to run this script using a network config with faucet api (kii_testnet doesn't have one)
@@ -201,14 +179,8 @@ def main():
     k = rate
     D = total_period
 
-    # List of compounding periods
-    X = list(range(1, D))
-
-    # Evaluate function M on each compounding period
-    R = [M(x, f, S, k, D) for x in X]
-
-    # Fnd the period that maximizes rewards
-    optimal_period = R.index(max(R)) + 1
+    # Find the period that maximizes rewards
+    optimal_period = optimal_compounding_period(f, S, k, D)
 
     # These values can be used in aerial_compounder.py to maximize rewards
     print("total period: ", total_period, "minutes")
@@ -19,10 +19,11 @@
 #
 # ------------------------------------------------------------------------------
 import argparse
-import time
+import threading
 
 from google.protobuf import any_pb2
 
+from kiipy.aerial.balance_watcher import BalanceChange, BalanceWatcher
 from kiipy.aerial.client import LedgerClient, NetworkConfig
 from kiipy.aerial.client.utils import prepare_and_broadcast_basic_transaction
 from kiipy.aerial.faucet import FaucetApi
@@ -58,7 +59,7 @@ def _parse_commandline():
         type=int,
         nargs="?",
         default=5,
-        help="interval time in seconds to query task_wallet's balance",
+        help="interval time in seconds between polls for new blocks",
     )
 
     return parser.parse_args()
@@ -94,40 +95,58 @@ def main():
     # Minimum balance for task_wallet
     minimum_balance = args.minimum_balance
 
-    # Interval to query task_wallet's balance
+    # Interval between polls for new blocks
     interval_time = args.interval_time
 
-    while True:
+    # Balances are only queried again when a block moves tokens of a watched wallet
+    watcher = BalanceWatcher(ledger, denom="ukii")
+    stop = threading.Event()
 
-        wallet_balance = ledger.query_bank_balance(wallet_address)
+    def top_up(change: BalanceChange):
+        if not change.below:
+            return
 
-        if wallet_balance < amount:
+        if watcher.balance(wallet_address) < amount:
             print("Wallet doesn't have enough balance to top-up task_wallet")
-            break
-
-        task_wallet_balance = ledger.query_bank_balance(task_wallet_address)
-
-        if task_wallet_balance < minimum_balance:
-
-            print("topping up task wallet")
-            # Top-up task_wallet
-            msg = any_pb2.Any()
-            msg.Pack(
-                MsgSend(
-                    from_address=wallet_address,
-                    to_address=task_wallet_address,
-                    amount=[top_up_amount],
-                ),
-                "",
+            stop.set()
+            return
+
+        print("topping up task wallet")
+        # Top-up task_wallet
+        msg = any_pb2.Any()
+        msg.Pack(
+            MsgSend(
+                from_address=wallet_address,
+                to_address=task_wallet_address,
+                amount=[top_up_amount],
+            ),
+            "",
+        )
+
+        tx = Transaction()
+        tx.add_message(MsgExec(grantee=str(authz_wallet.address()), msgs=[msg]))
+
+        tx = prepare_and_broadcast_basic_transaction(ledger, tx, authz_wallet)
+        tx.wait_to_complete()
+
+    watcher.watch(wallet_address)
+    watcher.watch(task_wallet_address, threshold=minimum_balance, callback=top_up)
+
+    # the watcher only reports crossings, top-up a task_wallet that is already low
+    task_wallet_balance = watcher.balance(task_wallet_address)
+    if task_wallet_balance < minimum_balance:
+        top_up(
+            BalanceChange(
+                address=task_wallet_address,
+                denom="ukii",
+                height=watcher.height or 0,
+                previous=task_wallet_balance,
+                balance=task_wallet_balance,
+                threshold=minimum_balance,
             )
+        )
 
-            tx = Transaction()
-            tx.add_message(MsgExec(grantee=str(authz_wallet.address()), msgs=[msg]))
-
-            tx = prepare_and_broadcast_basic_transaction(ledger, tx, authz_wallet)
-            tx.wait_to_complete()
-
-        time.sleep(interval_time)
+    watcher.run_forever(stop, interval_secs=interval_time)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""Watcher of the balances of many accounts."""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+from kiipy.aerial.client.balances import BalanceTable
+from kiipy.aerial.tx_helpers import tx_response_events
+from kiipy.crypto.address import Address
+
+
+DEFAULT_WATCH_INTERVAL_SECS = 5.0
+
+# events emitted by the bank module whenever coins move, with their account keys
+BALANCE_EVENT_KEYS = {
+    "transfer": ("recipient", "sender"),
+    "coin_spent": ("spender",),
+    "coin_received": ("receiver",),
+}
+
+_COIN = re.compile(r"^\s*\d+(\S+?)\s*$")
+
+
+@dataclass
+class BalanceChange:
+    """Change of a watched balance."""
+
+    address: str
+    denom: str
+    height: int
+    previous: int
+    balance: int
+    threshold: Optional[int] = None
+
+    @property
+    def below(self) -> bool:
+        """Check if the balance is below the threshold.
+
+        :return: True if the balance is below the threshold
+        """
+        return self.threshold is not None and self.balance < self.threshold
+
+    @property
+    def crossed(self) -> bool:
+        """Check if the change crossed the threshold, in either direction.
+
+        :return: True if the threshold was crossed
+        """
+        if self.threshold is None:
+            return False
+        return (self.previous < self.threshold) != (self.balance < self.threshold)
+
+
+@dataclass
+class _Watch:
+    balance: int
+    threshold: Optional[int]
+    callback: Optional[Callable[[BalanceChange], None]]
+
+
+def _coin_denoms(amount: str) -> Set[str]:
+    denoms = set()
+    for coin in amount.split(","):
+        match = _COIN.match(coin)
+        if match is not None:
+            denoms.add(match.group(1))
+    return denoms
+
+
+class BalanceWatcher:
+    """Watcher of the balances of many accounts, polling only what changed.
+
+    Instead of querying every balance on a fixed period, each poll searches the
+    transactions of the blocks produced since the previous poll, in one search, and
+    scans their bank events. Only the watched accounts appearing in a transfer,
+    ``coin_spent`` or ``coin_received`` event of the watched denomination are queried
+    again, all at the height of the latest block. A poll without new blocks costs a
+    single height query, regardless of the number of watched accounts.
+
+    Callbacks fire when a balance crosses the threshold of its account, in either
+    direction. Coins moved outside of transactions, e.g. matured unbondings paid at
+    the end of a block, are not visible in transaction events: :meth:`refresh`
+    queries all the watched balances again.
+    """
+
+    def __init__(
+        self,
+        client: "LedgerClient",  # type: ignore # noqa: F821
+        denom: Optional[str] = None,
+    ):
+        """Init the balance watcher.
+
+        :param client: Ledger client
+        :param denom: watched denom, defaults to the fee denomination
+        """
+        self._client = client
+        self._denom = denom or client.network_config.fee_denomination
+        self._lock = threading.Lock()
+        self._watches: Dict[str, _Watch] = {}
+        self._height: Optional[int] = None
+
+    @property
+    def denom(self) -> str:
+        """Get the watched denom.
+
+        :return: denom
+        """
+        return self._denom
+
+    @property
+    def height(self) -> Optional[int]:
+        """Get the height the balances are up to date with.
+
+        :return: block height, None before the first watched account or poll
+        """
+        return self._height
+
+    def __len__(self) -> int:
+        """Get the number of watched accounts.
+
+        :return: number of watched accounts
+        """
+        return len(self._watches)
+
+    def __contains__(self, address: Union[Address, str]) -> bool:
+        """Check if an account is watched.
+
+        :param address: account address
+        :return: True if the account is watched
+        """
+        return str(address) in self._watches
+
+    def balance(self, address: Union[Address, str]) -> int:
+        """Get the last known balance of a watched account.
+
+        :param address: account address
+        :raises KeyError: if the account is not watched
+        :return: balance
+        """  # noqa: DAR402
+        return self._watches[str(address)].balance
+
+    def watch(
+        self,
+        address: Union[Address, str],
+        threshold: Optional[int] = None,
+        callback: Optional[Callable[[BalanceChange], None]] = None,
+    ):
+        """Watch the balance of an account.
+
+        :param address: account address
+        :param threshold: balance threshold, defaults to None
+        :param callback: called when the balance crosses the threshold
+        """
+        self.watch_many([address], threshold, callback)
+
+    def watch_many(
+        self,
+        addresses: Iterable[Union[Address, str]],
+        threshold: Optional[int] = None,
+        callback: Optional[Callable[[BalanceChange], None]] = None,
+    ):
+        """Watch the balances of many accounts, querying them in bulk.
+
+        :param addresses: account addresses
+        :param threshold: balance threshold, defaults to None
+        :param callback: called when a balance crosses the threshold
+        """
+        keys = list(dict.fromkeys(str(address) for address in addresses))
+        if len(keys) == 0:
+            return
+        if self._height is None:
+            self._height = self._client.query_height()
+
+        table = self._client.query_balances_bulk(
+            keys, denom=self._denom, height=self._height
+        )
+        with self._lock:
+            for key, amount in zip(keys, table.amounts):
+                self._watches[key] = _Watch(amount, threshold, callback)
+
+    def unwatch(self, address: Union[Address, str]):
+        """Stop watching the balance of an account.
+
+        :param address: account address
+        """
+        with self._lock:
+            self._watches.pop(str(address), None)
+
+    def poll(self) -> List[BalanceChange]:
+        """Process the blocks produced since the previous poll.
+
+        :return: changes of the watched balances
+        """
+        head = self._client.query_height()
+        if self._height is None:
+            self._height = head
+            return []
+        if head <= self._height:
+            return []
+
+        touched: Set[str] = set()
+        for tx in self._client.search_txs(
+            [], from_height=self._height + 1, to_height=head
+        ):
+            self._scan(tx.proto, touched)
+
+        changes = self._update(touched, head)
+        self._height = head
+        return changes
+
+    def refresh(self) -> List[BalanceChange]:
+        """Query all the watched balances again, at the latest height.
+
+        :return: changes of the watched balances
+        """
+        head = self._client.query_height()
+        with self._lock:
+            touched = set(self._watches)
+        changes = self._update(touched, head)
+        self._height = head
+        return changes
+
+    def run_forever(
+        self, stop: threading.Event, interval_secs: float = DEFAULT_WATCH_INTERVAL_SECS
+    ):
+        """Poll the chain until stopped.
+
+        :param stop: event stopping the watcher
+        :param interval_secs: wait between polls
+        """
+        while not stop.is_set():
+            self.poll()
+            stop.wait(interval_secs)
+
+    def _scan(self, tx_response: Any, touched: Set[str]):
+        watches = self._watches
+        for event in tx_response_events(tx_response):
+            keys = BALANCE_EVENT_KEYS.get(event.type)
+            if keys is None:
+                continue
+
+            accounts = []
+            moves_denom = False
+            for attribute in event.attributes:
+                if attribute.key in keys:
+                    if attribute.value in watches:
+                        accounts.append(attribute.value)
+                elif attribute.key == "amount":
+                    moves_denom = moves_denom or self._denom in _coin_denoms(
+                        attribute.value
+                    )
+            if moves_denom:
+                touched.update(accounts)
+
+    def _update(self, touched: Set[str], height: int) -> List[BalanceChange]:
+        with self._lock:
+            keys = [key for key in touched if key in self._watches]
+        if len(keys) == 0:
+            return []
+
+        table: BalanceTable = self._client.query_balances_bulk(
+            keys, denom=self._denom, height=height
+        )
+
+        changes = []
+        crossings = []
+        with self._lock:
+            for key, amount in zip(keys, table.amounts):
+                watch = self._watches.get(key)
+                if watch is None or watch.balance == amount:
+                    continue
+                changes.append(
+                    BalanceChange(
+                        address=key,
+                        denom=self._denom,
+                        height=height,
+                        previous=watch.balance,
+                        balance=amount,
+                        threshold=watch.threshold,
+                    )
+                )
+                watch.balance = amount
+                if changes[-1].crossed and watch.callback is not None:
+                    crossings.append((watch.callback, changes[-1]))
+
+        # callbacks run outside of the lock, they may watch or unwatch accounts
+        for callback, change in crossings:
+            callback(change)
+        return changes
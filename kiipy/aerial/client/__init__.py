@@ -22,24 +22,41 @@
 import json
 import math
 import time
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 import certifi
 import grpc
-from dateutil.parser import isoparse
 from google.protobuf.timestamp_pb2 import Timestamp
 
+from kiipy.aerial.client.balances import (
+    BalanceTable,
+    DEFAULT_BALANCE_RETRIES,
+    query_balances,
+    query_denom_owners,
+)
 from kiipy.aerial.client.bank import create_bank_send_msg
 from kiipy.aerial.client.distribution import create_withdraw_delegator_reward
+from kiipy.aerial.client.search import (
+    DEFAULT_SEARCH_CONCURRENCY,
+    DEFAULT_SEARCH_PAGE_LIMIT,
+    height_ranges,
+    iter_txs_event_pages,
+)
 from kiipy.aerial.client.staking import (
     ValidatorStatus,
     create_delegate_msg,
     create_redelegate_msg,
     create_undelegate_msg,
 )
-from kiipy.aerial.client.utils import (
+from kiipy.aerial.client.utils import (  # noqa: F401
+    BLOCK_HEIGHT_METADATA_KEY,
+    COSMOS_SDK_DEC_COIN_PRECISION,
+    dec_to_int,
     ensure_timedelta,
     get_paginated,
     prepare_and_broadcast_basic_transaction,
@@ -48,12 +65,13 @@ from kiipy.aerial.config import NetworkConfig
 from kiipy.aerial.exceptions import NotFoundError, QueryTimeoutError
 from kiipy.aerial.gas import GasStrategy, SimulationGasStrategy
 from kiipy.aerial.tx import Transaction, TxState
-from kiipy.aerial.tx_helpers import MessageLog, SubmittedTx, TxResponse
+from kiipy.aerial.tx_helpers import SubmittedTx, TxResponse
 from kiipy.aerial.urls import Protocol, parse_url
 from kiipy.aerial.wallet import Wallet
 from kiipy.auth.rest_client import AuthRestClient
 from kiipy.bank.rest_client import BankRestClient
 from kiipy.common.rest_client import RestClient
+from kiipy.common.utils import json_encode
 from kiipy.cosmwasm.rest_client import CosmWasmRestClient
 from kiipy.crypto.address import Address
 from kiipy.crypto.hashfuncs import sha256
@@ -78,7 +96,7 @@ from kiipy.protos.cosmos.crypto.ed25519.keys_pb2 import (  # noqa # pylint: disa
     PubKey,
 )
 from kiipy.protos.cosmos.distribution.v1beta1.query_pb2 import (
-    QueryDelegationRewardsRequest,
+    QueryDelegationTotalRewardsRequest,
 )
 from kiipy.protos.cosmos.distribution.v1beta1.query_pb2_grpc import (
     QueryStub as DistributionGrpcClient,
@@ -87,6 +105,9 @@ from kiipy.protos.cosmos.params.v1beta1.query_pb2 import QueryParamsRequest
 from kiipy.protos.cosmos.params.v1beta1.query_pb2_grpc import (
     QueryStub as QueryParamsGrpcClient,
 )
+from kiipy.protos.cosmos.slashing.v1beta1.query_pb2_grpc import (
+    QueryStub as SlashingGrpcClient,
+)
 from kiipy.protos.cosmos.staking.v1beta1.query_pb2 import (
     QueryDelegatorDelegationsRequest,
     QueryDelegatorUnbondingDelegationsRequest,
@@ -102,7 +123,9 @@ from kiipy.protos.cosmos.tx.v1beta1.service_pb2 import (
     SimulateRequest,
 )
 from kiipy.protos.cosmos.tx.v1beta1.service_pb2_grpc import ServiceStub as TxGrpcClient
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import QuerySmartContractStateRequest
 from kiipy.protos.cosmwasm.wasm.v1.query_pb2_grpc import QueryStub as CosmWasmGrpcClient
+from kiipy.slashing.rest_client import SlashingRestClient
 from kiipy.staking.rest_client import StakingRestClient
 from kiipy.tendermint.rest_client import (
     CosmosBaseTendermintRestClient as TendermintRestClient,
@@ -113,9 +136,11 @@ from kiipy.tx.rest_client import TxRestClient
 DEFAULT_QUERY_TIMEOUT_SECS = 15
 DEFAULT_QUERY_INTERVAL_SECS = 2
 DEFAULT_TX_GAS_LIMIT = 2000000
-COSMOS_SDK_DEC_COIN_PRECISION = (
-    10**18
-)  # TODO: Revisit this, based on discussion with Matt, this should be 10^6
+DEFAULT_QUERY_MAX_WORKERS = 10
+DEFAULT_STAKING_PAGE_LIMIT = 500
+DEFAULT_BLOCK_FETCH_CONCURRENCY = 8
+BLOCK_INTERVAL_SMOOTHING = 0.2
+MIN_BLOCK_POLL_FRACTION = 0.1
 
 
 @dataclass
@@ -185,6 +210,20 @@ class StakingSummary:
         return sum(map(lambda p: p.amount, self.unbonding_positions))
 
 
+@dataclass
+class ContractQueryResult:
+    """Result of one query of a batch of contract queries."""
+
+    address: str
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Check if the query succeeded."""
+        return self.error is None
+
+
 @dataclass
 class Block:
     """Block."""
@@ -220,6 +259,142 @@ class Block:
         )
 
 
+class CompactBlock:
+    """Block keeping its raw transactions, for holding large windows of blocks.
+
+    The transactions are packed into a single buffer and exposed as memoryviews of
+    it. The block time and the transaction hashes are only computed on first access,
+    the hashes of all the transactions in one pass. No reference to the protobuf
+    message is kept.
+    """
+
+    __slots__ = (
+        "height",
+        "chain_id",
+        "_seconds",
+        "_nanos",
+        "_buffer",
+        "_offsets",
+        "_tx_hashes",
+    )
+
+    def __init__(
+        self,
+        height: int,
+        chain_id: str,
+        timestamp: Timestamp,
+        txs: Sequence[bytes],
+    ):
+        """Init the compact block.
+
+        :param height: block height
+        :param chain_id: chain id
+        :param timestamp: block header timestamp
+        :param txs: raw transactions
+        """
+        self.height = height
+        self.chain_id = chain_id
+        self._seconds = int(timestamp.seconds)
+        self._nanos = int(timestamp.nanos)
+        self._buffer = b"".join(txs)
+        self._offsets = array("L", [0])
+        for tx in txs:
+            self._offsets.append(self._offsets[-1] + len(tx))
+        self._tx_hashes: Optional[List[str]] = None
+
+    @staticmethod
+    def from_proto(block: Any) -> "CompactBlock":
+        """Parse the block.
+
+        :param block: block as Any
+        :return: parsed block as CompactBlock
+        """
+        return CompactBlock(
+            height=int(block.header.height),
+            chain_id=block.header.chain_id,
+            timestamp=block.header.time,
+            txs=block.data.txs,
+        )
+
+    @property
+    def time(self) -> datetime:
+        """Get the block time.
+
+        :return: block time
+        """
+        return Block._parse_timestamp(  # pylint: disable=protected-access
+            Timestamp(seconds=self._seconds, nanos=self._nanos)
+        )
+
+    @property
+    def txs(self) -> List[memoryview]:
+        """Get the raw transactions.
+
+        :return: transactions as views of the block buffer
+        """
+        view = memoryview(self._buffer)
+        offsets = self._offsets
+        return [view[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    @property
+    def num_txs(self) -> int:
+        """Get the number of transactions.
+
+        :return: number of transactions
+        """
+        return len(self._offsets) - 1
+
+    @property
+    def tx_hashes(self) -> List[str]:
+        """Get the transaction hashes.
+
+        :return: transaction hashes
+        """
+        if self._tx_hashes is None:
+            self._tx_hashes = [sha256(tx).hex().upper() for tx in self.txs]
+        return self._tx_hashes
+
+    def to_block(self) -> Block:
+        """Convert to a regular block.
+
+        :return: block
+        """
+        return Block(
+            height=self.height,
+            time=self.time,
+            chain_id=self.chain_id,
+            tx_hashes=self.tx_hashes,
+        )
+
+
+def _update_block_interval(
+    block_interval: Optional[float],
+    previous: Union[Block, CompactBlock],
+    block: Union[Block, CompactBlock],
+) -> Optional[float]:
+    elapsed = (block.time - previous.time).total_seconds()
+    if elapsed <= 0:
+        return block_interval
+    if block_interval is None:
+        return elapsed
+    # exponential moving average, smoothing out the odd slow block
+    return block_interval + BLOCK_INTERVAL_SMOOTHING * (elapsed - block_interval)
+
+
+def _next_block_delay(
+    last_block: Optional[Union[Block, CompactBlock]],
+    block_interval: Optional[float],
+    default_interval: float,
+) -> float:
+    if last_block is None or block_interval is None:
+        return default_interval
+
+    # wait until the next block is expected, then poll at a fraction of the interval
+    expected = last_block.time + timedelta(seconds=block_interval)
+    delay = (expected - datetime.now(timezone.utc)).total_seconds()
+    return max(delay, block_interval * MIN_BLOCK_POLL_FRACTION)
+
+
 class LedgerClient:
     """Ledger client."""
 
@@ -261,6 +436,7 @@ class LedgerClient:
             self.staking = StakingGrpcClient(grpc_client)
             self.distribution = DistributionGrpcClient(grpc_client)
             self.params = QueryParamsGrpcClient(grpc_client)
+            self.slashing = SlashingGrpcClient(grpc_client)
             self.tendermint = TendermintQueryGrpcClient(grpc_client)
         else:
             rest_client = RestClient(parsed_url.rest_url)
@@ -272,6 +448,7 @@ class LedgerClient:
             self.staking = StakingRestClient(rest_client)  # type: ignore
             self.distribution = DistributionRestClient(rest_client)  # type: ignore
             self.params = ParamsRestClient(rest_client)  # type: ignore
+            self.slashing = SlashingRestClient(rest_client)  # type: ignore
             self.tendermint = TendermintRestClient(rest_client)  # type: ignore
 
     @property
@@ -333,6 +510,66 @@ class LedgerClient:
         resp = self.params.Params(req)
         return json.loads(resp.param.value)
 
+    def query_contract(
+        self,
+        address: Union[Address, str],
+        msg: Any,
+        height: Optional[int] = None,
+    ) -> Any:
+        """Query a smart contract.
+
+        :param address: contract address
+        :param msg: query message
+        :param height: block height to query at, defaults to the latest block
+        :return: query result
+        """
+        req = QuerySmartContractStateRequest(
+            address=str(address), query_data=json_encode(msg).encode("UTF8")
+        )
+        metadata = (
+            [(BLOCK_HEIGHT_METADATA_KEY, str(height))] if height is not None else None
+        )
+        # the REST transport already returns decoded JSON, skip the protobuf round trip
+        if isinstance(self.wasm, CosmWasmRestClient):
+            return self.wasm.smart_contract_state_json(req, metadata=metadata)
+        resp = self.wasm.SmartContractState(req, metadata=metadata)
+        return json.loads(resp.data)
+
+    def query_contracts_batch(
+        self,
+        queries: Sequence[Tuple[Union[Address, str], Any]],
+        max_workers: int = DEFAULT_QUERY_MAX_WORKERS,
+        height: Optional[int] = None,
+    ) -> List[ContractQueryResult]:
+        """Query many smart contracts concurrently.
+
+        A failing query does not abort the batch: its error is reported in its result.
+
+        :param queries: sequence of (contract address, query message) pairs
+        :param max_workers: maximum number of queries in flight
+        :param height: block height to query at, defaults to the latest block.
+            Pinning a height gives all the queries a consistent view of the chain.
+        :return: query results in the order of the queries
+        """
+
+        def _query(query: Tuple[Union[Address, str], Any]) -> ContractQueryResult:
+            address, msg = query
+            try:
+                return ContractQueryResult(
+                    address=str(address),
+                    result=self.query_contract(address, msg, height=height),
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                return ContractQueryResult(address=str(address), error=error)
+
+        if len(queries) == 0:
+            return []
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(queries)))
+        ) as executor:
+            return list(executor.map(_query, queries))
+
     def query_bank_balance(self, address: Address, denom: Optional[str] = None) -> int:
         """Query bank balance.
 
@@ -350,7 +587,37 @@ class LedgerClient:
         resp = self.bank.Balance(req)
         assert resp.balance.denom == denom  # sanity check
 
-        return int(float(resp.balance.amount))
+        # amounts are integers, a float loses precision on large balances
+        return int(resp.balance.amount)
+
+    def query_balances_bulk(
+        self,
+        addresses: Optional[Sequence[Union[Address, str]]] = None,
+        denom: Optional[str] = None,
+        height: Optional[int] = None,
+        max_workers: int = DEFAULT_QUERY_MAX_WORKERS,
+        retries: int = DEFAULT_BALANCE_RETRIES,
+    ) -> BalanceTable:
+        """Query the balances of many accounts as one consistent snapshot.
+
+        All the balances are read at the same block height. The accounts are queried
+        concurrently and transient failures are retried. When no addresses are given,
+        all the holders of the denomination are listed page by page instead.
+
+        :param addresses: account addresses, defaults to all the holders of the denom
+        :param denom: denom, defaults to the fee denomination
+        :param height: block height to read the balances at, defaults to the latest
+        :param max_workers: maximum number of queries in flight
+        :param retries: maximum number of retries of each query
+        :return: balances, in the order of the addresses when given
+        """
+        denom = denom or self.network_config.fee_denomination
+        if height is None:
+            height = self.query_height()
+
+        if addresses is None:
+            return query_denom_owners(self, denom, height, retries=retries)
+        return query_balances(self, addresses, denom, height, max_workers, retries)
 
     def query_bank_all_balances(self, address: Address) -> List[Coin]:
         """Query bank all balances.
@@ -406,18 +673,20 @@ class LedgerClient:
         if filtered_status != ValidatorStatus.UNSPECIFIED:
             req.status = filtered_status.value
 
-        resp = self.staking.Validators(req)
-
         validators: List[Validator] = []
-        for validator in resp.validators:
-            validators.append(
-                Validator(
-                    address=Address(validator.operator_address),
-                    tokens=int(float(validator.tokens)),
-                    moniker=str(validator.description.moniker),
-                    status=ValidatorStatus.from_proto(validator.status),
+        for resp in get_paginated(
+            req, self.staking.Validators, per_page_limit=DEFAULT_STAKING_PAGE_LIMIT
+        ):
+            for validator in resp.validators:
+                validators.append(
+                    Validator(
+                        address=Address(validator.operator_address),
+                        # tokens are integers, a float loses precision on large stakes
+                        tokens=int(validator.tokens),
+                        moniker=str(validator.description.moniker),
+                        status=ValidatorStatus.from_proto(validator.status),
+                    )
                 )
-            )
         return validators
 
     def query_staking_summary(self, address: Address) -> StakingSummary:
@@ -426,48 +695,56 @@ class LedgerClient:
         :param address: address
         :return: staking summary
         """
-        current_positions: List[StakingPosition] = []
-
-        req = QueryDelegatorDelegationsRequest(delegator_addr=str(address))
-
-        for resp in get_paginated(
-            req, self.staking.DelegatorDelegations, per_page_limit=1
-        ):
-            for item in resp.delegation_responses:
-                req = QueryDelegationRewardsRequest(
-                    delegator_address=str(address),
-                    validator_address=str(item.delegation.validator_address),
-                )
-                rewards_resp = self.distribution.DelegationRewards(req)
+        # the delegations, their rewards and the unbondings are queried concurrently
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            delegations = executor.submit(
+                get_paginated,
+                QueryDelegatorDelegationsRequest(delegator_addr=str(address)),
+                self.staking.DelegatorDelegations,
+                per_page_limit=DEFAULT_STAKING_PAGE_LIMIT,
+            )
+            rewards = executor.submit(
+                self.distribution.DelegationTotalRewards,
+                QueryDelegationTotalRewardsRequest(delegator_address=str(address)),
+            )
+            unbondings = executor.submit(
+                get_paginated,
+                QueryDelegatorUnbondingDelegationsRequest(delegator_addr=str(address)),
+                self.staking.DelegatorUnbondingDelegations,
+                per_page_limit=DEFAULT_STAKING_PAGE_LIMIT,
+            )
 
-                stake_reward = 0
-                for reward in rewards_resp.rewards:
+            stake_rewards: Dict[str, int] = {}
+            for item in rewards.result().rewards:
+                for reward in item.reward:
                     if reward.denom == self.network_config.staking_denomination:
-                        stake_reward = (
-                            int(float(reward.amount)) // COSMOS_SDK_DEC_COIN_PRECISION
+                        stake_rewards[str(item.validator_address)] = dec_to_int(
+                            reward.amount
                         )
                         break
 
-                current_positions.append(
-                    StakingPosition(
-                        validator=Address(item.delegation.validator_address),
-                        amount=int(float(item.balance.amount)),
-                        reward=stake_reward,
+            current_positions: List[StakingPosition] = []
+            for resp in delegations.result():
+                for item in resp.delegation_responses:
+                    validator = str(item.delegation.validator_address)
+                    current_positions.append(
+                        StakingPosition(
+                            validator=Address(validator),
+                            amount=int(item.balance.amount),
+                            reward=stake_rewards.get(validator, 0),
+                        )
                     )
-                )
-
-        unbonding_summary: Dict[str, int] = {}
-        req = QueryDelegatorUnbondingDelegationsRequest(delegator_addr=str(address))
 
-        for resp in get_paginated(req, self.staking.DelegatorUnbondingDelegations):
-            for item in resp.unbonding_responses:
-                validator = str(item.validator_address)
-                total_unbonding = unbonding_summary.get(validator, 0)
+            unbonding_summary: Dict[str, int] = {}
+            for resp in unbondings.result():
+                for item in resp.unbonding_responses:
+                    validator = str(item.validator_address)
+                    total_unbonding = unbonding_summary.get(validator, 0)
 
-                for entry in item.entries:
-                    total_unbonding += int(float(entry.balance))
+                    for entry in item.entries:
+                        total_unbonding += int(entry.balance)
 
-                unbonding_summary[validator] = total_unbonding
+                    unbonding_summary[validator] = total_unbonding
 
         # build the final list of unbonding positions
         unbonding_positions: List[UnbondingPositions] = []
@@ -483,6 +760,25 @@ class LedgerClient:
             current_positions=current_positions, unbonding_positions=unbonding_positions
         )
 
+    def query_staking_summaries(
+        self,
+        addresses: Sequence[Address],
+        max_workers: int = DEFAULT_QUERY_MAX_WORKERS,
+    ) -> List[StakingSummary]:
+        """Query the staking summaries of many delegators concurrently.
+
+        :param addresses: delegator addresses
+        :param max_workers: maximum number of delegators queried at once
+        :return: staking summaries in the order of the addresses
+        """
+        if len(addresses) == 0:
+            return []
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(addresses)))
+        ) as executor:
+            return list(executor.map(self.query_staking_summary, addresses))
+
     def delegate_tokens(
         self,
         validator: Address,
@@ -692,43 +988,64 @@ class LedgerClient:
 
         return self._parse_tx_response(resp.tx_response)
 
-    @staticmethod
-    def _parse_tx_response(tx_response: Any) -> TxResponse:
-        # parse the transaction logs
-        logs = []
-        for log_data in tx_response.logs:
-            events = {}
-            for event in log_data.events:
-                events[event.type] = {a.key: a.value for a in event.attributes}
-            logs.append(
-                MessageLog(
-                    index=int(log_data.msg_index), log=log_data.msg_index, events=events
-                )
+    def search_txs(
+        self,
+        events: Sequence[str],
+        from_height: Optional[int] = None,
+        to_height: Optional[int] = None,
+        height_chunk: Optional[int] = None,
+        page_limit: int = DEFAULT_SEARCH_PAGE_LIMIT,
+        concurrency: int = DEFAULT_SEARCH_CONCURRENCY,
+        offset_pagination: bool = False,
+    ) -> Iterator[TxResponse]:
+        """Search transactions by events, streaming every page of the results.
+
+        Pages are requested concurrently ahead of the caller and yielded in chain
+        order; a transaction returned twice, e.g. when results shift between pages,
+        is only yielded once. With ``height_chunk`` the height range is split into
+        chunks searched separately, the first pages of the following chunks being
+        requested while the current one is consumed.
+
+        :param events: event queries, e.g. ["message.sender='kii1...'"]
+        :param from_height: lowest block height, inclusive, defaults to None
+        :param to_height: highest block height, inclusive, defaults to None
+        :param height_chunk: number of heights searched per chunk, defaults to None
+        :param page_limit: number of transactions per page
+        :param concurrency: maximum number of pages requested at once
+        :param offset_pagination: paginate with offsets instead of page numbers
+        :yield: transaction responses in chain order
+        """
+        if height_chunk is not None:
+            if to_height is None:
+                to_height = self.query_height()
+            ranges: List[Tuple[Optional[int], Optional[int]]] = list(
+                height_ranges(from_height or 1, to_height, height_chunk)
             )
+        else:
+            ranges = [(from_height, to_height)]
+
+        searches = []
+        for low, high in ranges:
+            search = list(events)
+            if low is not None:
+                search.append(f"tx.height>={low}")
+            if high is not None:
+                search.append(f"tx.height<={high}")
+            searches.append(search)
+
+        seen = set()
+        for page in iter_txs_event_pages(
+            self.txs, searches, page_limit, concurrency, offset_pagination
+        ):
+            for tx_response in page.tx_responses:
+                if tx_response.txhash in seen:
+                    continue
+                seen.add(tx_response.txhash)
+                yield self._parse_tx_response(tx_response)
 
-        # parse the transaction events
-        events = {}
-        for event in tx_response.events:
-            event_data = events.get(event.type, {})
-            for attribute in event.attributes:
-                event_data[attribute.key] = attribute.value
-            events[event.type] = event_data
-
-        timestamp = None
-        if tx_response.timestamp:
-            timestamp = isoparse(tx_response.timestamp)
-
-        return TxResponse(
-            hash=str(tx_response.txhash),
-            height=int(tx_response.height),
-            code=int(tx_response.code),
-            gas_wanted=int(tx_response.gas_wanted),
-            gas_used=int(tx_response.gas_used),
-            raw_log=str(tx_response.raw_log),
-            logs=logs,
-            events=events,
-            timestamp=timestamp,
-        )
+    @staticmethod
+    def _parse_tx_response(tx_response: Any) -> TxResponse:
+        return TxResponse.from_proto(tx_response)
 
     def simulate_tx(self, tx: Transaction) -> int:
         """simulate transaction.
@@ -785,16 +1102,95 @@ class LedgerClient:
         resp = self.tendermint.GetBlockByHeight(req)
         return Block.from_proto(resp.block)
 
+    def query_compact_block(self, height: int) -> CompactBlock:
+        """Query the block, keeping its transactions raw and hashing them lazily.
+
+        :param height: block height
+        :return: compact block
+        """
+        req = GetBlockByHeightRequest(height=height)
+        resp = self.tendermint.GetBlockByHeight(req)
+        return CompactBlock.from_proto(resp.block)
+
+    def iter_blocks(
+        self,
+        start: int,
+        end: Optional[int] = None,
+        concurrency: int = DEFAULT_BLOCK_FETCH_CONCURRENCY,
+        follow: bool = False,
+        compact: bool = False,
+    ) -> Iterator[Union[Block, CompactBlock]]:
+        """Iterate over a range of blocks, fetching them concurrently.
+
+        Up to ``concurrency`` blocks are requested ahead of the caller and yielded in
+        height order, so the reorder buffer never holds more than ``concurrency``
+        blocks. Without ``follow`` the range stops at the chain head at the time of
+        the call. With ``follow`` the iterator tails the chain head, waiting for each
+        new block according to the block interval observed so far rather than a fixed
+        poll period.
+
+        :param start: first block height
+        :param end: last block height, inclusive, defaults to None
+        :param concurrency: maximum number of blocks requested at once
+        :param follow: keep waiting for new blocks past the chain head
+        :param compact: yield compact blocks, hashing their transactions lazily
+        :yield: blocks in height order
+        """
+        head = self.query_height()
+        if end is None and not follow:
+            end = head
+
+        query_block = self.query_compact_block if compact else self.query_block
+        pending: Deque[Future] = deque()
+        next_height = start
+        last_block: Optional[Union[Block, CompactBlock]] = None
+        block_interval: Optional[float] = None
+
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        try:
+            while end is None or next_height <= end or pending:
+                limit = head if end is None else min(head, end)
+                while len(pending) < concurrency and next_height <= limit:
+                    pending.append(executor.submit(query_block, next_height))
+                    next_height += 1
+
+                if pending:
+                    block = pending.popleft().result()
+                    if last_block is not None and block.height == last_block.height + 1:
+                        block_interval = _update_block_interval(
+                            block_interval, last_block, block
+                        )
+                    last_block = block
+                    yield block
+                    continue
+
+                if not follow:
+                    break
+
+                time.sleep(
+                    _next_block_delay(
+                        last_block, block_interval, self._query_interval_secs
+                    )
+                )
+                head = self.query_height()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     def query_height(self) -> int:
         """Query the latest block height.
 
         :return: latest block height
         """
-        return self.query_latest_block().height
+        # read the header only, parsing the whole block is not needed
+        resp = self.tendermint.GetLatestBlock(GetLatestBlockRequest())
+        return int(resp.block.header.height)
 
     def query_chain_id(self) -> str:
         """Query the chain id.
 
         :return: chain id
         """
-        return self.query_latest_block().chain_id
+        resp = self.tendermint.GetLatestBlock(GetLatestBlockRequest())
+        return str(resp.block.header.chain_id)
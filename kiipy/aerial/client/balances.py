@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""Columnar balance snapshots of many accounts."""
+
+import re
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import bech32
+import grpc
+import requests
+
+from kiipy.aerial.client.utils import BLOCK_HEIGHT_METADATA_KEY, get_paginated
+from kiipy.crypto.address import Address, DEFAULT_PREFIX
+from kiipy.protos.cosmos.bank.v1beta1.query_pb2 import (
+    QueryBalanceRequest,
+    QueryDenomOwnersRequest,
+)
+
+
+DEFAULT_BALANCE_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_SECS = 0.25
+DEFAULT_DENOM_OWNERS_PAGE_LIMIT = 1000
+
+_TRANSIENT_GRPC_CODES = frozenset(
+    {
+        grpc.StatusCode.UNAVAILABLE,
+        grpc.StatusCode.DEADLINE_EXCEEDED,
+        grpc.StatusCode.RESOURCE_EXHAUSTED,
+        grpc.StatusCode.ABORTED,
+    }
+)
+# the REST client reports the status code of failed requests in the error message
+_TRANSIENT_HTTP_STATUS = re.compile(r"Response: (429|502|503|504)\b")
+
+T = TypeVar("T")
+
+
+def _address_bytes(address: Union[Address, str]) -> bytes:
+    if isinstance(address, Address):
+        return bytes(address)
+    return bytes(Address(address))
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Check if a failed query is worth retrying.
+
+    :param error: error raised by the query
+    :return: True for overloaded or unreachable nodes and timeouts
+    """
+    if isinstance(error, grpc.RpcError):
+        return error.code() in _TRANSIENT_GRPC_CODES  # type: ignore
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, RuntimeError):
+        return _TRANSIENT_HTTP_STATUS.search(str(error)) is not None
+    return False
+
+
+def call_with_retries(
+    query: Callable[[], T],
+    retries: int = DEFAULT_BALANCE_RETRIES,
+    backoff_secs: float = DEFAULT_RETRY_BACKOFF_SECS,
+) -> T:
+    """Run a query, retrying transient failures with exponential backoff.
+
+    :param query: query to run
+    :param retries: maximum number of retries
+    :param backoff_secs: delay before the first retry, doubled on each retry
+    :raises Exception: the last error, once permanent or out of retries
+    :return: query result
+    """
+    attempt = 0
+    while True:
+        try:
+            return query()
+        except Exception as error:  # pylint: disable=broad-except
+            if attempt >= retries or not is_transient_error(error):
+                raise
+        time.sleep(backoff_secs * (2**attempt))
+        attempt += 1
+
+
+class BalanceTable:
+    """Balances of one denomination held by many accounts at one block height.
+
+    The balances are stored as columns: the raw account addresses are packed into a
+    single buffer and the amounts are kept as exact integers in a parallel list. Rows
+    are in the order the accounts were queried. Looking up an account by address
+    builds an index on first use.
+    """
+
+    __slots__ = ("denom", "height", "amounts", "_buffer", "_offsets", "_index")
+
+    def __init__(
+        self,
+        denom: str,
+        height: int,
+        addresses: Sequence[bytes],
+        amounts: Sequence[int],
+    ):
+        """Init the balance table.
+
+        :param denom: denomination
+        :param height: block height the balances were read at
+        :param addresses: raw account addresses
+        :param amounts: balance of each account
+        :raises RuntimeError: if the columns have different lengths
+        """
+        if len(addresses) != len(amounts):
+            raise RuntimeError("Addresses and amounts have different lengths")
+
+        self.denom = denom
+        self.height = height
+        self.amounts = list(amounts)
+        self._buffer = b"".join(addresses)
+        self._offsets = array("L", [0])
+        for address in addresses:
+            self._offsets.append(self._offsets[-1] + len(address))
+        self._index: Optional[Dict[bytes, int]] = None
+
+    def __len__(self) -> int:
+        """Get the number of accounts.
+
+        :return: number of accounts
+        """
+        return len(self.amounts)
+
+    @property
+    def raw_addresses(self) -> Sequence[bytes]:
+        """Get the raw account addresses.
+
+        :return: addresses in row order
+        """
+        buffer = self._buffer
+        offsets = self._offsets
+        return [buffer[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    @property
+    def total(self) -> int:
+        """Get the sum of the balances.
+
+        :return: total amount
+        """
+        return sum(self.amounts)
+
+    def address(self, row: int, prefix: Optional[str] = None) -> Address:
+        """Get the account address of a row.
+
+        :param row: row index
+        :param prefix: address prefix, defaults to None
+        :return: account address
+        """
+        start, end = self._offsets[row], self._offsets[row + 1]
+        raw = self._buffer[start:end]
+        if len(raw) == 20:
+            return Address(raw, prefix)
+        # contract and module accounts may have longer addresses
+        return Address(
+            bech32.bech32_encode(
+                prefix or DEFAULT_PREFIX, bech32.convertbits(raw, 8, 5, True)  # type: ignore
+            )
+        )
+
+    def get(
+        self, address: Union[Address, str], default: Optional[int] = None
+    ) -> Optional[int]:
+        """Get the balance of an account.
+
+        :param address: account address
+        :param default: value returned for accounts not in the table
+        :return: balance of the account
+        """
+        if self._index is None:
+            self._index = {raw: row for row, raw in enumerate(self.raw_addresses)}
+        row = self._index.get(_address_bytes(address))
+        return default if row is None else self.amounts[row]
+
+    def items(self, prefix: Optional[str] = None) -> Iterator[Tuple[Address, int]]:
+        """Iterate over the rows.
+
+        :param prefix: address prefix, defaults to None
+        :yield: account address and balance of each row
+        """
+        for row, amount in enumerate(self.amounts):
+            yield self.address(row, prefix), amount
+
+
+def query_balances(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    addresses: Sequence[Union[Address, str]],
+    denom: str,
+    height: int,
+    max_workers: int,
+    retries: int = DEFAULT_BALANCE_RETRIES,
+) -> BalanceTable:
+    """Query the balances of many accounts concurrently, all at the same height.
+
+    :param client: Ledger client
+    :param addresses: account addresses
+    :param denom: denomination
+    :param height: block height to read the balances at
+    :param max_workers: maximum number of queries in flight
+    :param retries: maximum number of retries of each query
+    :raises RuntimeError: if some addresses are invalid, before any query is sent
+    :return: balances in the order of the addresses
+    """
+    # a malformed address would fail its query for good and discard all the others
+    raw_addresses: List[bytes] = []
+    invalid: List[str] = []
+    for address in addresses:
+        try:
+            raw_addresses.append(_address_bytes(address))
+        except RuntimeError:
+            invalid.append(str(address))
+    if invalid:
+        raise RuntimeError(f"Invalid addresses: {', '.join(invalid)}")
+
+    metadata = [(BLOCK_HEIGHT_METADATA_KEY, str(height))]
+
+    def query(address: Union[Address, str]) -> int:
+        req = QueryBalanceRequest(address=str(address), denom=denom)
+        resp = call_with_retries(
+            lambda: client.bank.Balance(req, metadata=metadata), retries
+        )
+        return int(resp.balance.amount or 0)
+
+    amounts: List[int] = []
+    if len(addresses) > 0:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(addresses)))
+        ) as executor:
+            amounts = list(executor.map(query, addresses))
+
+    return BalanceTable(denom, height, raw_addresses, amounts)
+
+
+def query_denom_owners(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    denom: str,
+    height: int,
+    page_limit: int = DEFAULT_DENOM_OWNERS_PAGE_LIMIT,
+    retries: int = DEFAULT_BALANCE_RETRIES,
+) -> BalanceTable:
+    """Query the balances of all the holders of a denomination at one height.
+
+    :param client: Ledger client
+    :param denom: denomination
+    :param height: block height to read the balances at
+    :param page_limit: number of holders requested per page
+    :param retries: maximum number of retries of each page
+    :return: balances of the holders, in the order returned by the chain
+    """
+    pages = get_paginated(
+        QueryDenomOwnersRequest(denom=denom),
+        lambda req, metadata: call_with_retries(
+            lambda: client.bank.DenomOwners(req, metadata=metadata), retries
+        ),
+        per_page_limit=page_limit,
+        metadata=[(BLOCK_HEIGHT_METADATA_KEY, str(height))],
+    )
+
+    addresses: List[bytes] = []
+    amounts: List[int] = []
+    for resp in pages:
+        for owner in resp.denom_owners:
+            addresses.append(_address_bytes(owner.address))
+            amounts.append(int(owner.balance.amount or 0))
+    return BalanceTable(denom, height, addresses, amounts)
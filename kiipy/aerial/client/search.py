@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Paginated transaction search."""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterator, List, Optional, Sequence, Tuple
+
+from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageRequest
+from kiipy.protos.cosmos.tx.v1beta1.service_pb2 import (
+    GetTxsEventRequest,
+    GetTxsEventResponse,
+    OrderBy,
+)
+
+
+DEFAULT_SEARCH_PAGE_LIMIT = 100
+DEFAULT_SEARCH_CONCURRENCY = 4
+
+
+def height_ranges(
+    from_height: int, to_height: int, chunk_size: int
+) -> List[Tuple[int, int]]:
+    """Split a height range into consecutive chunks.
+
+    :param from_height: lowest block height, inclusive
+    :param to_height: highest block height, inclusive
+    :param chunk_size: number of heights per chunk
+    :raises ValueError: if the chunk size is not positive
+    :return: inclusive height ranges in ascending order
+    """
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be positive")
+    return [
+        (start, min(start + chunk_size - 1, to_height))
+        for start in range(from_height, to_height + 1, chunk_size)
+    ]
+
+
+def _txs_event_request(
+    events: Sequence[str], page: int, limit: int, offset_pagination: bool
+) -> GetTxsEventRequest:
+    if offset_pagination:
+        return GetTxsEventRequest(
+            events=list(events),
+            order_by=OrderBy.ORDER_BY_ASC,
+            pagination=PageRequest(
+                offset=(page - 1) * limit, limit=limit, count_total=page == 1
+            ),
+        )
+    return GetTxsEventRequest(
+        events=list(events), order_by=OrderBy.ORDER_BY_ASC, page=page, limit=limit
+    )
+
+
+def _response_total(resp: GetTxsEventResponse) -> int:
+    return int(resp.total or resp.pagination.total)
+
+
+class _Search:
+    """Pages of one search, the pages after the first known once it is received."""
+
+    def __init__(self, events: Sequence[str]):
+        self.events = events
+        self.next_page = 2
+        # None until the first page is received, or while the total is not reported
+        self.last_page: Optional[int] = None
+        self.done = False
+
+
+def iter_txs_event_pages(
+    txs: "TxInterface",  # type: ignore # noqa: F821
+    searches: Sequence[Sequence[str]],
+    page_limit: int = DEFAULT_SEARCH_PAGE_LIMIT,
+    concurrency: int = DEFAULT_SEARCH_CONCURRENCY,
+    offset_pagination: bool = False,
+) -> Iterator[GetTxsEventResponse]:
+    """Fetch the pages of a sequence of event searches concurrently, in order.
+
+    The first page of a search gives the total number of results, after which its
+    remaining pages are requested concurrently. The first pages of the following
+    searches are requested ahead whenever fewer than ``concurrency`` pages of the
+    current search are pending. When a node does not report the total, the pages of
+    the search are requested one at a time until a short page is received.
+
+    :param txs: Tx client
+    :param searches: event queries, each searched separately
+    :param page_limit: number of transactions per page
+    :param concurrency: maximum number of pages requested at once
+    :param offset_pagination: paginate with offsets instead of page numbers
+    :yield: pages in order
+    """
+
+    def fetch(events: Sequence[str], page: int) -> GetTxsEventResponse:
+        return txs.GetTxsEvent(
+            _txs_event_request(events, page, page_limit, offset_pagination)
+        )
+
+    concurrency = max(1, concurrency)
+    upcoming = iter(searches)
+    current: Optional[_Search] = None
+    # pages of the current search, then the first pages of the following searches
+    pages: Deque[Future] = deque()
+    first_pages: Deque[Tuple[_Search, Future]] = deque()
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while True:
+            while len(pages) + len(first_pages) < concurrency:
+                if (
+                    current is not None
+                    and not current.done
+                    and current.last_page is not None
+                    and current.next_page <= current.last_page
+                ):
+                    pages.append(
+                        executor.submit(fetch, current.events, current.next_page)
+                    )
+                    current.next_page += 1
+                    continue
+                events = next(upcoming, None)
+                if events is None:
+                    break
+                search = _Search(events)
+                first_pages.append((search, executor.submit(fetch, events, 1)))
+
+            if pages:
+                resp = pages.popleft().result()
+            elif current is not None and not current.done and current.last_page is None:
+                # total unknown, keep going one page at a time
+                resp = fetch(current.events, current.next_page)
+                current.next_page += 1
+            elif first_pages:
+                current, future = first_pages.popleft()
+                resp = future.result()
+                total = _response_total(resp)
+                if total:
+                    current.last_page = (total + page_limit - 1) // page_limit
+            else:
+                return
+
+            if len(resp.tx_responses) < page_limit:
+                current.done = True  # type: ignore
+            yield resp
+    finally:
+        for future in pages:
+            future.cancel()
+        for _, future in first_pages:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -17,10 +17,12 @@
 #
 # ------------------------------------------------------------------------------
 """Helper functions."""
+import dataclasses
 from datetime import timedelta
-from typing import Any, Callable, List, Optional, Union
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
 
-from kiipy.aerial.tx import SigningCfg
+from kiipy.aerial.exceptions import MessageSimulationError
+from kiipy.aerial.tx import SigningCfg, Transaction
 from kiipy.aerial.tx_helpers import SubmittedTx
 from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageRequest
 
@@ -78,6 +80,107 @@ def prepare_and_broadcast_basic_transaction(
     return client.broadcast_tx(tx)
 
 
+def estimate_gas_for_msgs(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    msgs: Sequence[Any],
+    sender: "Wallet",  # type: ignore # noqa: F821
+    account: "Account",  # type: ignore # noqa: F821
+    memo: Optional[str] = None,
+) -> int:
+    """Estimate the gas of a transaction holding messages, without broadcasting it.
+
+    :param client: Ledger client
+    :param msgs: messages of the transaction
+    :param sender: The transaction sender
+    :param account: The account
+    :param memo: Transaction memo, defaults to None
+
+    :return: estimated gas
+    """
+    tx = Transaction()
+    for msg in msgs:
+        tx.add_message(msg)
+    tx.seal(
+        SigningCfg.direct(sender.public_key(), account.sequence),
+        fee="",
+        gas_limit=0,
+        memo=memo,
+    )
+    tx.sign(sender.signer(), client.network_config.chain_id, account.number)
+    tx.complete()
+    return client.estimate_gas_for_tx(tx)
+
+
+def pack_and_broadcast_messages(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    msgs: Sequence[Any],
+    sender: "Wallet",  # type: ignore # noqa: F821
+    account: Optional["Account"] = None,  # type: ignore # noqa: F821
+    memo: Optional[str] = None,
+) -> List[Tuple[SubmittedTx, List[int]]]:
+    """Pack messages, in order, into as few transactions as fit in a block and broadcast them.
+
+    The messages are simulated as a single transaction first; any chunk whose gas
+    estimate reaches the block gas limit is halved until it fits. The gas strategies
+    clip their estimates to the block gas limit, so reaching it means the chunk may be
+    too large. A chunk whose simulation fails is halved as well, down to the failing
+    message. Nothing is broadcast until every chunk has been simulated. The
+    transactions are signed with consecutive sequence numbers and reuse their
+    simulated gas limits.
+
+    :param client: Ledger client
+    :param msgs: messages to broadcast
+    :param sender: The transaction sender
+    :param account: The account, defaults to querying it
+    :param memo: Transaction memo, defaults to None
+    :raises MessageSimulationError: with the index of a message failing on its own
+
+    :return: broadcast transactions with the indices of the messages they hold
+    """
+    if not msgs:
+        return []
+
+    if account is None:
+        account = client.query_account(sender.address())
+
+    block_gas_limit = client.gas_strategy.block_gas_limit()
+
+    packed: List[Tuple[List[int], int]] = []
+    pending = [list(range(len(msgs)))]
+    while pending:
+        indices = pending.pop(0)
+        gas_limit: Optional[int] = None
+        try:
+            gas_limit = estimate_gas_for_msgs(
+                client, [msgs[i] for i in indices], sender, account, memo=memo
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            if len(indices) == 1:
+                raise MessageSimulationError(indices[0], error) from error
+        if gas_limit is None or (0 < block_gas_limit <= gas_limit and len(indices) > 1):
+            middle = len(indices) // 2
+            pending[:0] = [indices[:middle], indices[middle:]]
+            continue
+        packed.append((indices, gas_limit))
+
+    submitted: List[Tuple[SubmittedTx, List[int]]] = []
+    for offset, (indices, gas_limit) in enumerate(packed):
+        tx = Transaction()
+        for index in indices:
+            tx.add_message(msgs[index])
+        submitted_tx = prepare_and_broadcast_basic_transaction(
+            client,
+            tx,
+            sender,
+            account=dataclasses.replace(account, sequence=account.sequence + offset),
+            gas_limit=gas_limit,
+            memo=memo,
+        )
+        submitted.append((submitted_tx, indices))
+
+    return submitted
+
+
 def ensure_timedelta(interval: Union[int, float, timedelta]) -> timedelta:
     """
     Return timedelta for interval.
@@ -90,6 +193,10 @@ def ensure_timedelta(interval: Union[int, float, timedelta]) -> timedelta:
 
 
 DEFAULT_PER_PAGE_LIMIT = None
+COSMOS_SDK_DEC_COIN_PRECISION = (
+    10**18
+)  # TODO: Revisit this, based on discussion with Matt, this should be 10^6
+BLOCK_HEIGHT_METADATA_KEY = "x-cosmos-block-height"
 
 
 def get_paginated(
@@ -97,6 +204,7 @@ def get_paginated(
     request_method: Callable,
     pages_limit: int = 0,
     per_page_limit: Optional[int] = DEFAULT_PER_PAGE_LIMIT,
+    metadata: Optional[Sequence[Tuple[str, str]]] = None,
 ) -> List[Any]:
     """
     Get pages for specific request.
@@ -105,6 +213,7 @@ def get_paginated(
     :param request_method: function to perform request
     :param pages_limit: max number of pages to return. default - 0 unlimited
     :param per_page_limit: Optional int: amount of records per one page. default is None, determined by server
+    :param metadata: call metadata sent with every page, e.g. the block height to query at
 
     :return: List of responses
     """
@@ -116,7 +225,11 @@ def get_paginated(
         request.CopyFrom(initial_request)
         request.pagination.CopyFrom(pagination)
 
-        resp = request_method(request)
+        resp = (
+            request_method(request)
+            if metadata is None
+            else request_method(request, metadata=metadata)
+        )
 
         pages.append(resp)
 
@@ -125,3 +238,32 @@ def get_paginated(
         if resp.pagination.next_key:
             pagination = PageRequest(limit=per_page_limit, key=resp.pagination.next_key)
     return pages
+
+
+def dec_to_float(value: str) -> float:
+    """Convert a cosmos sdk decimal to a float.
+
+    gRPC responses encode decimals as integers scaled by 10^18, while REST responses
+    encode them with a decimal point.
+
+    :param value: decimal string
+    :return: decimal value
+    """
+    if not value:
+        return 0.0
+    if "." in value:
+        return float(value)
+    return int(value) / COSMOS_SDK_DEC_COIN_PRECISION
+
+
+def dec_to_int(value: str) -> int:
+    """Convert a cosmos sdk decimal to an integer, rounding down.
+
+    :param value: decimal string, scaled by 10^18 or with a decimal point
+    :return: integer part of the decimal
+    """
+    if not value:
+        return 0
+    if "." in value:
+        return int(value.split(".", 1)[0])
+    return int(value) // COSMOS_SDK_DEC_COIN_PRECISION
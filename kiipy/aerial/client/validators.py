@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Cached snapshot of the validator set."""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from kiipy.aerial.client.staking import ValidatorStatus
+from kiipy.aerial.client.utils import (
+    BLOCK_HEIGHT_METADATA_KEY,
+    dec_to_float,
+    get_paginated,
+)
+from kiipy.aerial.tx import unpack_any
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.staking.v1beta1.query_pb2 import QueryValidatorsRequest
+
+
+DEFAULT_VALIDATORS_PAGE_LIMIT = 500
+
+
+@dataclass(frozen=True)
+class ValidatorState:
+    """State of a validator in a validator set snapshot."""
+
+    address: Address
+    consensus_pubkey: bytes
+    tokens: int
+    moniker: str
+    status: ValidatorStatus
+    jailed: bool
+    commission_rate: float = 0.0
+
+
+@dataclass
+class ValidatorSetDiff:
+    """Changes of the validator set between two snapshots."""
+
+    height: int
+    joined: List[ValidatorState] = field(default_factory=list)
+    left: List[ValidatorState] = field(default_factory=list)
+    # (previous, current) states of the validators that changed
+    status_changes: List[Tuple[ValidatorState, ValidatorState]] = field(
+        default_factory=list
+    )
+    power_changes: List[Tuple[ValidatorState, ValidatorState]] = field(
+        default_factory=list
+    )
+
+    @property
+    def empty(self) -> bool:
+        """Check if the validator set is unchanged.
+
+        :return: True if nothing changed
+        """
+        return not (
+            self.joined or self.left or self.status_changes or self.power_changes
+        )
+
+
+def _consensus_key(validator) -> bytes:
+    public_key = unpack_any(validator.consensus_pubkey)
+    key = getattr(public_key, "key", None)
+    return bytes(key) if isinstance(key, bytes) else bytes(public_key.value)
+
+
+class ValidatorSetCache:
+    """Indexed snapshot of the validator set, refreshed on new blocks.
+
+    The validators of every status are paged through and indexed by operator address
+    and consensus public key, with exact token amounts. A refresh only happens once
+    the chain has moved to a new height; validators whose encoded state did not
+    change keep their previous entry, so only the changed ones are parsed again, and
+    the differences with the previous snapshot are returned.
+    """
+
+    def __init__(
+        self,
+        client: "LedgerClient",  # type: ignore # noqa: F821
+        page_limit: int = DEFAULT_VALIDATORS_PAGE_LIMIT,
+    ):
+        """Init the validator set cache.
+
+        :param client: Ledger client
+        :param page_limit: number of validators requested per page
+        """
+        self._client = client
+        self._page_limit = page_limit
+        self._lock = threading.Lock()
+        self._height = 0
+        self._raw: Dict[str, bytes] = {}
+        self._by_operator: Dict[str, ValidatorState] = {}
+        self._by_consensus_key: Dict[bytes, ValidatorState] = {}
+
+    @property
+    def height(self) -> int:
+        """Get the height of the last refresh.
+
+        :return: block height, 0 if the cache was never refreshed
+        """
+        return self._height
+
+    def __len__(self) -> int:
+        """Get the number of validators in the snapshot.
+
+        :return: number of validators
+        """
+        return len(self._by_operator)
+
+    def get(self, operator_address: str) -> Optional[ValidatorState]:
+        """Get a validator by operator address.
+
+        :param operator_address: validator operator address
+        :return: validator state, None if not in the snapshot
+        """
+        return self._by_operator.get(str(operator_address))
+
+    def by_consensus_pubkey(self, consensus_pubkey: bytes) -> Optional[ValidatorState]:
+        """Get a validator by consensus public key.
+
+        :param consensus_pubkey: consensus public key bytes
+        :return: validator state, None if not in the snapshot
+        """
+        return self._by_consensus_key.get(bytes(consensus_pubkey))
+
+    def validators(
+        self, status: Optional[ValidatorStatus] = None
+    ) -> List[ValidatorState]:
+        """Get the validators of the snapshot, by decreasing tokens.
+
+        :param status: only the validators with this status, defaults to all
+        :return: validator states
+        """
+        states = [
+            state
+            for state in self._by_operator.values()
+            if status is None or state.status == status
+        ]
+        return sorted(states, key=lambda state: state.tokens, reverse=True)
+
+    def refresh(self, height: Optional[int] = None) -> ValidatorSetDiff:
+        """Refresh the snapshot if the chain has moved to a new height.
+
+        Every page is queried at the same height.
+
+        :param height: latest block height, queried if not provided
+        :return: changes since the previous snapshot
+        """
+        if height is None:
+            height = self._client.query_height()
+
+        with self._lock:
+            if height <= self._height:
+                return ValidatorSetDiff(height=self._height)
+
+            pages = get_paginated(
+                QueryValidatorsRequest(),
+                self._client.staking.Validators,
+                per_page_limit=self._page_limit,
+                metadata=[(BLOCK_HEIGHT_METADATA_KEY, str(height))],
+            )
+
+            diff = ValidatorSetDiff(height=height)
+            raw: Dict[str, bytes] = {}
+            by_operator: Dict[str, ValidatorState] = {}
+            for resp in pages:
+                for validator in resp.validators:
+                    operator = str(validator.operator_address)
+                    encoded = validator.SerializeToString(deterministic=True)
+                    raw[operator] = encoded
+
+                    previous = self._by_operator.get(operator)
+                    if previous is not None and self._raw.get(operator) == encoded:
+                        by_operator[operator] = previous
+                        continue
+
+                    state = ValidatorState(
+                        address=(
+                            previous.address
+                            if previous is not None
+                            else Address(operator)
+                        ),
+                        consensus_pubkey=_consensus_key(validator),
+                        tokens=int(validator.tokens),
+                        moniker=str(validator.description.moniker),
+                        status=ValidatorStatus.from_proto(validator.status),
+                        jailed=bool(validator.jailed),
+                        commission_rate=dec_to_float(
+                            validator.commission.commission_rates.rate
+                        ),
+                    )
+                    by_operator[operator] = state
+
+                    if previous is None:
+                        diff.joined.append(state)
+                        continue
+                    if (previous.status, previous.jailed) != (
+                        state.status,
+                        state.jailed,
+                    ):
+                        diff.status_changes.append((previous, state))
+                    if previous.tokens != state.tokens:
+                        diff.power_changes.append((previous, state))
+
+            diff.left = [
+                state
+                for operator, state in self._by_operator.items()
+                if operator not in by_operator
+            ]
+
+            self._height = height
+            self._raw = raw
+            self._by_operator = by_operator
+            self._by_consensus_key = {
+                state.consensus_pubkey: state for state in by_operator.values()
+            }
+            return diff
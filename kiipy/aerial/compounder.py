@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Auto-compounding scheduler for many delegators."""
+
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.protobuf.any_pb2 import Any as ProtoAny
+
+from kiipy.aerial.client.distribution import create_withdraw_delegator_reward
+from kiipy.aerial.client.staking import create_delegate_msg
+from kiipy.aerial.client.utils import (
+    estimate_gas_for_msgs,
+    pack_and_broadcast_messages,
+    prepare_and_broadcast_basic_transaction,
+)
+from kiipy.aerial.coins import parse_coins
+from kiipy.aerial.exceptions import MessageSimulationError
+from kiipy.aerial.staking_optimizer import optimal_compounding_period
+from kiipy.aerial.tx import Transaction
+from kiipy.aerial.wallet import Wallet
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.authz.v1beta1.tx_pb2 import MsgExec
+
+
+DEFAULT_COMPOUND_MAX_WORKERS = 8
+DEFAULT_COMPOUND_PERIOD_SECS = 3600.0
+DEFAULT_MIN_COMPOUND_PERIOD_SECS = 60.0
+DEFAULT_MAX_COMPOUND_PERIOD_SECS = 30 * 24 * 3600.0
+DEFAULT_COMPOUND_HORIZON_SECS = 365 * 24 * 3600
+
+
+@dataclass
+class CompoundJob:
+    """Compounding state of a delegator."""
+
+    delegator: Address
+    # signs for itself, None for the delegators compounded through an authz grant
+    wallet: Optional[Wallet]
+    next_time: float
+    last_time: Optional[float] = None
+    fee: int = 0
+
+
+@dataclass
+class CompoundResult:
+    """Outcome of a compounding run of a delegator."""
+
+    delegator: Address
+    compounded: int = 0
+    tx_hash: Optional[str] = None
+    next_time: Optional[float] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Check if the run succeeded.
+
+        :return: True if the run did not fail
+        """
+        return self.error is None
+
+
+def _pack_any(msg: Any) -> ProtoAny:
+    packed = ProtoAny()
+    packed.Pack(msg, type_url_prefix="/")
+    return packed
+
+
+class CompoundScheduler:
+    """Scheduler compounding the staking rewards of many delegators.
+
+    Delegators are kept in a priority queue ordered by their next compounding time.
+    Each run withdraws the rewards of all the validators of a delegator and delegates
+    them back, in a single transaction. Delegators holding their own wallet are run
+    concurrently, each signing its own transaction with the fee taken out of the
+    delegated rewards. Delegators who granted the scheduler wallet authz permissions
+    are compounded with ``MsgExec`` messages, all the due ones packed together into as
+    few transactions as possible, the grantee paying the fees. When the simulation
+    of a message fails, e.g. on a revoked or expired grant, only its delegator is
+    reported as failed and the others are packed and broadcast again.
+
+    After each run the next time is computed from the reward rate observed since the
+    previous run, as the compounding period maximising the final stake for the fee
+    paid.
+    """
+
+    def __init__(
+        self,
+        client: "LedgerClient",  # type: ignore # noqa: F821
+        grantee: Optional[Wallet] = None,
+        max_workers: int = DEFAULT_COMPOUND_MAX_WORKERS,
+        default_period_secs: float = DEFAULT_COMPOUND_PERIOD_SECS,
+        min_period_secs: float = DEFAULT_MIN_COMPOUND_PERIOD_SECS,
+        max_period_secs: float = DEFAULT_MAX_COMPOUND_PERIOD_SECS,
+        horizon_secs: int = DEFAULT_COMPOUND_HORIZON_SECS,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Init the compounding scheduler.
+
+        :param client: Ledger client
+        :param grantee: wallet executing the authz grants, defaults to None
+        :param max_workers: maximum number of delegators compounded at once
+        :param default_period_secs: period used until a reward rate is observed
+        :param min_period_secs: minimum compounding period
+        :param max_period_secs: maximum compounding period
+        :param horizon_secs: staking horizon the compounding period is optimised for
+        :param clock: time source, in seconds
+        """
+        self._client = client
+        self._grantee = grantee
+        self._max_workers = max_workers
+        self._default_period_secs = default_period_secs
+        self._min_period_secs = min_period_secs
+        self._max_period_secs = max_period_secs
+        self._horizon_secs = horizon_secs
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, CompoundJob] = {}
+        # (next time, insertion order, delegator), stale entries are skipped
+        self._queue: List[Tuple[float, int, str]] = []
+        self._counter = 0
+
+    def __len__(self) -> int:
+        """Get the number of scheduled delegators.
+
+        :return: number of delegators
+        """
+        return len(self._jobs)
+
+    def add(self, wallet: Wallet, first_time: Optional[float] = None):
+        """Schedule a delegator signing its own transactions.
+
+        :param wallet: delegator wallet
+        :param first_time: first compounding time, defaults to now
+        """
+        self._schedule(
+            CompoundJob(wallet.address(), wallet, self._first_time(first_time))
+        )
+
+    def add_grant(self, delegator: Address, first_time: Optional[float] = None):
+        """Schedule a delegator who granted the grantee wallet authz permissions.
+
+        The delegator must have granted the grantee the permissions to execute
+        ``MsgWithdrawDelegatorReward`` and ``MsgDelegate`` on its behalf.
+
+        :param delegator: delegator address
+        :param first_time: first compounding time, defaults to now
+        :raises RuntimeError: if the scheduler has no grantee wallet
+        """
+        if self._grantee is None:
+            raise RuntimeError("Scheduler has no grantee wallet")
+        self._schedule(CompoundJob(delegator, None, self._first_time(first_time)))
+
+    def remove(self, delegator: Address):
+        """Stop compounding for a delegator.
+
+        :param delegator: delegator address
+        """
+        with self._lock:
+            self._jobs.pop(str(delegator), None)
+
+    def job(self, delegator: Address) -> Optional[CompoundJob]:
+        """Get the compounding state of a delegator.
+
+        :param delegator: delegator address
+        :return: job, None if the delegator is not scheduled
+        """
+        return self._jobs.get(str(delegator))
+
+    def next_due(self) -> Optional[float]:
+        """Get the earliest compounding time.
+
+        :return: time, None if no delegator is scheduled
+        """
+        with self._lock:
+            self._drop_stale()
+            return self._queue[0][0] if self._queue else None
+
+    def run_pending(self) -> List[CompoundResult]:
+        """Compound for every delegator whose time has come.
+
+        :return: results of the runs
+        """
+        now = self._clock()
+        due: List[CompoundJob] = []
+        with self._lock:
+            self._drop_stale()
+            while self._queue and self._queue[0][0] <= now:
+                _, _, key = heapq.heappop(self._queue)
+                due.append(self._jobs[key])
+
+        own = [job for job in due if job.wallet is not None]
+        granted = [job for job in due if job.wallet is None]
+
+        results: List[CompoundResult] = []
+        if own:
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(self._max_workers, len(own)))
+            ) as executor:
+                results.extend(executor.map(self._run_own, own))
+        if granted:
+            results.extend(self._run_granted(granted))
+
+        for job, result in zip(own + granted, results):
+            # delegators removed or added again meanwhile are left as they are
+            if self._jobs.get(str(job.delegator)) is job:
+                job.next_time = result.next_time  # type: ignore
+                self._schedule(job)
+        return results
+
+    def run_forever(self, stop: threading.Event, idle_secs: float = 60.0):
+        """Run the scheduler until stopped.
+
+        :param stop: event stopping the scheduler
+        :param idle_secs: wait when no delegator is scheduled
+        """
+        while not stop.is_set():
+            self.run_pending()
+            next_time = self.next_due()
+            delay = idle_secs if next_time is None else next_time - self._clock()
+            stop.wait(max(0.0, delay))
+
+    def _first_time(self, first_time: Optional[float]) -> float:
+        return self._clock() if first_time is None else first_time
+
+    def _schedule(self, job: CompoundJob):
+        key = str(job.delegator)
+        with self._lock:
+            self._jobs[key] = job
+            self._counter += 1
+            heapq.heappush(self._queue, (job.next_time, self._counter, key))
+
+    def _drop_stale(self):
+        # entries of removed or rescheduled delegators are left in the heap
+        while self._queue:
+            next_time, _, key = self._queue[0]
+            job = self._jobs.get(key)
+            if job is not None and job.next_time == next_time:
+                return
+            heapq.heappop(self._queue)
+
+    def _rewards(self, delegator: Address) -> Tuple[int, List[Tuple[Address, int]]]:
+        summary = self._client.query_staking_summary(delegator)
+        rewards = [(p.validator, p.reward) for p in summary.current_positions]
+        return summary.total_staked, rewards
+
+    def _fee_amount(self, gas: int) -> int:
+        # only the part of the fee paid in the staking denomination is taken out
+        denom = self._client.network_config.staking_denomination
+        return sum(
+            int(coin.amount)
+            for coin in parse_coins(self._client.estimate_fee_from_gas(gas))
+            if coin.denom == denom
+        )
+
+    def _compound_msgs(
+        self, delegator: Address, rewards: List[Tuple[Address, int]], fee: int
+    ) -> Tuple[List[Any], int]:
+        denom = self._client.network_config.staking_denomination
+        msgs: List[Any] = [
+            create_withdraw_delegator_reward(delegator, validator)
+            for validator, _ in rewards
+        ]
+
+        # the fee is taken out of the largest rewards first
+        amounts = dict(rewards)
+        for validator, _ in sorted(rewards, key=lambda r: r[1], reverse=True):
+            taken = min(fee, amounts[validator])
+            amounts[validator] -= taken
+            fee -= taken
+
+        for validator, amount in amounts.items():
+            if amount > 0:
+                msgs.append(create_delegate_msg(delegator, validator, amount, denom))
+        return msgs, sum(amounts.values())
+
+    def _next_time(
+        self, job: CompoundJob, now: float, stake: int, rewards: int
+    ) -> float:
+        period = self._default_period_secs
+        if job.last_time is not None and now > job.last_time and stake and rewards:
+            rate = rewards / stake / (now - job.last_time)
+            period = optimal_compounding_period(
+                job.fee, stake, rate, self._horizon_secs
+            )
+        period = min(max(period, self._min_period_secs), self._max_period_secs)
+        return now + period
+
+    def _run_own(self, job: CompoundJob) -> CompoundResult:
+        now = self._clock()
+        try:
+            stake, rewards = self._rewards(job.delegator)
+            rewards = [(validator, reward) for validator, reward in rewards if reward]
+            total = sum(reward for _, reward in rewards)
+            result = CompoundResult(job.delegator)
+            if rewards:
+                wallet: Wallet = job.wallet  # type: ignore
+                account = self._client.query_account(job.delegator)
+
+                # simulate with the full rewards to find the fee, then take it out
+                msgs, _ = self._compound_msgs(job.delegator, rewards, 0)
+                gas = estimate_gas_for_msgs(self._client, msgs, wallet, account)
+                job.fee = self._fee_amount(gas)
+                msgs, compounded = self._compound_msgs(job.delegator, rewards, job.fee)
+
+                if compounded > 0:
+                    tx = Transaction()
+                    for msg in msgs:
+                        tx.add_message(msg)
+                    submitted = prepare_and_broadcast_basic_transaction(
+                        self._client, tx, wallet, account=account, gas_limit=gas
+                    ).wait_to_complete()
+                    result.tx_hash = submitted.tx_hash
+                    result.compounded = compounded
+
+            if result.compounded:
+                result.next_time = self._next_time(job, now, stake, total)
+                job.last_time = now
+            else:
+                # not worth the fee yet, try again once more rewards accrued
+                result.next_time = self._next_time(job, now, 0, 0)
+            return result
+        except Exception as error:  # pylint: disable=broad-except
+            return CompoundResult(
+                job.delegator, error=error, next_time=self._next_time(job, now, 0, 0)
+            )
+
+    def _run_granted(self, jobs: List[CompoundJob]) -> List[CompoundResult]:
+        now = self._clock()
+        grantee: Wallet = self._grantee  # type: ignore
+
+        results = [CompoundResult(job.delegator) for job in jobs]
+        stakes = [0] * len(jobs)
+        totals = [0] * len(jobs)
+        execs: List[MsgExec] = []
+        exec_jobs: List[int] = []
+        for index, job in enumerate(jobs):
+            try:
+                stake, rewards = self._rewards(job.delegator)
+            except Exception as error:  # pylint: disable=broad-except
+                results[index].error = error
+                continue
+            rewards = [(validator, reward) for validator, reward in rewards if reward]
+            if not rewards:
+                continue
+            msgs, compounded = self._compound_msgs(job.delegator, rewards, 0)
+            stakes[index], totals[index] = stake, compounded
+            results[index].compounded = compounded
+            execs.append(
+                MsgExec(
+                    grantee=str(grantee.address()),
+                    msgs=[_pack_any(msg) for msg in msgs],
+                )
+            )
+            exec_jobs.append(index)
+
+        for msg_index, (tx_hash, fee, error) in enumerate(
+            self._broadcast_execs(execs, grantee)
+        ):
+            index = exec_jobs[msg_index]
+            if error is not None:
+                results[index].error = error
+                results[index].compounded = 0
+            else:
+                results[index].tx_hash = tx_hash
+                jobs[index].fee = fee
+
+        for index, job in enumerate(jobs):
+            result = results[index]
+            if result.ok and result.compounded:
+                result.next_time = self._next_time(
+                    job, now, stakes[index], totals[index]
+                )
+                job.last_time = now
+            else:
+                result.next_time = self._next_time(job, now, 0, 0)
+        return results
+
+    def _broadcast_execs(
+        self, execs: List[MsgExec], grantee: Wallet
+    ) -> List[Tuple[Optional[str], int, Optional[Exception]]]:
+        # (tx hash, fee share, error) of each message
+        outcomes: List[Tuple[Optional[str], int, Optional[Exception]]] = [
+            (None, 0, None)
+        ] * len(execs)
+        valid = list(range(len(execs)))
+        while True:
+            try:
+                batches = [
+                    (submitted, [valid[i] for i in indices])
+                    for submitted, indices in pack_and_broadcast_messages(
+                        self._client, [execs[index] for index in valid], grantee
+                    )
+                ]
+                break
+            except MessageSimulationError as error:
+                # a revoked or expired grant, leave its delegator out and pack again
+                outcomes[valid.pop(error.index)] = (None, 0, error)
+            except Exception as error:  # pylint: disable=broad-except
+                for index in valid:
+                    outcomes[index] = (None, 0, error)
+                return outcomes
+
+        for submitted, indices in batches:
+            try:
+                submitted.wait_to_complete()
+            except Exception as error:  # pylint: disable=broad-except
+                for index in indices:
+                    outcomes[index] = (None, 0, error)
+                continue
+            gas = submitted.response.gas_wanted  # type: ignore
+            fee_share = -(-self._fee_amount(gas) // len(indices))
+            for index in indices:
+                outcomes[index] = (submitted.tx_hash, fee_share, None)
+        return outcomes
@@ -22,6 +22,8 @@
 from dataclasses import dataclass
 from typing import Optional, Union
 
+from kiipy.crypto.address import DEFAULT_PREFIX
+
 
 class NetworkConfigError(RuntimeError):
     """Network config error.
@@ -52,6 +54,7 @@ class NetworkConfig:
     staking_denomination: str
     url: str
     faucet_url: Optional[str] = None
+    address_prefix: str = DEFAULT_PREFIX
 
     def validate(self):
         """Validate the network configuration.
@@ -19,15 +19,20 @@
 
 """cosmwasm contract functionality."""
 
-import json
-import os
 from collections import UserString
-from datetime import datetime
-from typing import Any, Dict, Optional
-
-from jsonschema import validate
-
-from kiipy.aerial.client import LedgerClient, prepare_and_broadcast_basic_transaction
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Union, cast
+
+from kiipy.aerial.client import (
+    ContractQueryResult,
+    DEFAULT_QUERY_MAX_WORKERS,
+    LedgerClient,
+    prepare_and_broadcast_basic_transaction,
+)
+from kiipy.aerial.client.utils import pack_and_broadcast_messages
+from kiipy.aerial.contract.artifacts import DEFAULT_COMPRESSION_LEVEL, WasmArtifactCache
+from kiipy.aerial.contract.code_index import CodeIndex
 from kiipy.aerial.contract.cosmwasm import (
     create_cosmwasm_clear_admin_msg,
     create_cosmwasm_execute_msg,
@@ -36,22 +41,29 @@ from kiipy.aerial.contract.cosmwasm import (
     create_cosmwasm_store_code_msg,
     create_cosmwasm_update_admin_msg,
 )
+from kiipy.aerial.contract.query_cache import ContractQueryCache
+from kiipy.aerial.contract.schema import (
+    ContractSchema,
+    SchemaValidation,
+    load_contract_schema,
+)
+from kiipy.aerial.contract.state_export import (
+    DEFAULT_STATE_PAGE_LIMIT,
+    dump_raw_state,
+    iter_raw_state,
+)
 from kiipy.aerial.tx import Transaction
-from kiipy.aerial.tx_helpers import SubmittedTx
+from kiipy.aerial.tx_helpers import MessageLog, SubmittedTx
 from kiipy.aerial.wallet import Wallet
-from kiipy.common.utils import json_encode
 from kiipy.crypto.address import Address
-from kiipy.crypto.hashfuncs import sha256
+from kiipy.crypto.hashfuncs import sha256_file
 from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageRequest
-from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import (
-    QueryCodesRequest,
-    QuerySmartContractStateRequest,
-)
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import QueryCodesRequest
+from kiipy.protos.cosmwasm.wasm.v1.types_pb2 import Model
 
 
 def _compute_digest(path: str) -> bytes:
-    with open(path, "rb") as input_file:
-        return sha256(input_file.read())
+    return sha256_file(path)
 
 
 def _generate_label(digest: bytes) -> str:
@@ -59,21 +71,6 @@ def _generate_label(digest: bytes) -> str:
     return f"{digest.hex()[:14]}-{now.strftime('%Y%m%d%H%M%S')}"
 
 
-def _load_contract_schema(schema_path: str) -> Optional[Dict[Any, Any]]:
-    if not os.path.isdir(schema_path):
-        return None
-
-    schema = {}
-    for filename in os.listdir(schema_path):
-        if filename.endswith(".json"):
-            msg_name = os.path.splitext(os.path.basename(filename))[0]
-            full_path = os.path.join(schema_path, filename)
-            with open(full_path, "r", encoding="utf-8") as msg_schema_file:
-                msg_schema = json.load(msg_schema_file)
-            schema[msg_name] = msg_schema
-    return schema
-
-
 class LedgerContract(UserString):
     """Ledger contract."""
 
@@ -85,6 +82,12 @@ class LedgerContract(UserString):
         digest: Optional[bytes] = None,
         schema_path: Optional[str] = None,
         code_id: Optional[int] = None,
+        artifact_cache: Optional[WasmArtifactCache] = None,
+        code_index: Optional[CodeIndex] = None,
+        schema_validation: SchemaValidation = SchemaValidation.Strict,
+        schema_sample_rate: float = 1.0,
+        query_cache: Optional[ContractQueryCache] = None,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
     ):
         """Initialize the Ledger contract.
 
@@ -94,11 +97,23 @@ class LedgerContract(UserString):
         :param digest: digest, defaults to None
         :param schema_path: path to contract schema, defaults to None
         :param code_id: optional int. code id of the contract stored
+        :param artifact_cache: cache of compressed wasm artifacts, defaults to None
+        :param code_index: local index used to look up the code id, defaults to None
+        :param schema_validation: schema validation mode, defaults to strict
+        :param schema_sample_rate: fraction of the messages validated in sampled mode
+        :param query_cache: cache of query results, defaults to None
+        :param compression_level: gzip compression level, ignored with an artifact cache
         """
         # pylint: disable=super-init-not-called
         self._path = path
         self._client = client
         self._address = address
+        self._artifact_cache = artifact_cache
+        self._compression_level = compression_level
+        self._code_index = code_index
+        self._schema_validation = schema_validation
+        self._schema_sample_rate = schema_sample_rate
+        self._query_cache = query_cache
 
         # load contract schema if path is provided
         self._load_schema(schema_path)
@@ -109,9 +124,9 @@ class LedgerContract(UserString):
         if path is not None:
             self._digest = _compute_digest(str(self._path))
 
-        # attempt to look up the code id from the network by digest
+        # attempt to look up the code id by digest, from the local index if available
         if not code_id and self._digest is not None:
-            self._code_id = self._find_contract_id_by_digest(self._digest)
+            self._code_id = self._lookup_code_id(self._digest)
         else:
             self._code_id = code_id
 
@@ -147,6 +162,61 @@ class LedgerContract(UserString):
         """
         return self._address
 
+    @property
+    def artifact_cache(self) -> Optional[WasmArtifactCache]:
+        """Get the cache of compressed wasm artifacts.
+
+        :return: artifact cache
+        """
+        return self._artifact_cache
+
+    @property
+    def compression_level(self) -> int:
+        """Get the gzip compression level of the stored code.
+
+        :return: compression level
+        """
+        return self._compression_level
+
+    def default_label(self) -> str:
+        """Generate a label from the contract digest, or its code id without one.
+
+        :raises RuntimeError: if the contract has neither a digest nor a code id
+        :return: label
+        """
+        if self._digest:
+            return _generate_label(bytes(self._digest))
+        if self._code_id:
+            return _generate_label(bytes(f"{self._code_id}", encoding="utf-8"))
+        raise RuntimeError("Failed to get label. No code_id or digest provided.")
+
+    def record_code_id(self, code_id: Optional[int]) -> int:
+        """Record the code id the contract was stored under.
+
+        Without a code id, it is looked up by digest, from the local index if available.
+
+        :param code_id: code id reported by the store transaction, or None
+        :raises RuntimeError: if the code id can not be found
+        :return: code id
+        """
+        if code_id is not None:
+            self._code_id = int(code_id)
+            if self._code_index is not None and self._digest is not None:
+                self._code_index.add(self._code_id, self._digest)
+        elif self._digest is not None:
+            self._code_id = self._lookup_code_id(self._digest)
+
+        if self._code_id is None:
+            raise RuntimeError("Unable to extract contract code id")
+        return self._code_id
+
+    def record_address(self, address: Address):
+        """Record the address the contract was instantiated at.
+
+        :param address: contract address
+        """
+        self._address = address
+
     def store(
         self,
         sender: Wallet,
@@ -166,18 +236,26 @@ class LedgerContract(UserString):
 
         # build up the store transaction
         tx = Transaction()
-        tx.add_message(create_cosmwasm_store_code_msg(self._path, sender.address()))
+        tx.add_message(
+            create_cosmwasm_store_code_msg(
+                self._path,
+                sender.address(),
+                compression_level=self._compression_level,
+                artifact_cache=self._artifact_cache,
+                digest=self._digest,
+            )
+        )
 
         submitted_tx = prepare_and_broadcast_basic_transaction(
             self._client, tx, sender, gas_limit=gas_limit, memo=memo
         ).wait_to_complete()
 
         # extract the code id
-        self._code_id = submitted_tx.contract_code_id
-        if self._code_id is None:
+        code_id = submitted_tx.contract_code_id
+        if code_id is None:
             raise RuntimeError("Unable to extract contract code id")
 
-        return self._code_id
+        return self.record_code_id(code_id)
 
     def instantiate(
         self,
@@ -202,18 +280,10 @@ class LedgerContract(UserString):
         """
         assert self._code_id, RuntimeError("Code id was not set.")
 
-        if self._instantiate_schema is not None:
-            validate(args, self._instantiate_schema)
+        self.validate("instantiate", args)
 
         if label is None:
-            if self._digest:
-                label = _generate_label(bytes(self._digest))
-            elif self._code_id:
-                label = _generate_label(bytes(f"{self._code_id}", encoding="utf-8"))
-            else:
-                raise RuntimeError(
-                    "Failed to get label. No code_id or digest provided."
-                )
+            label = self.default_label()
 
         # build up the store transaction
         instatiate_msg = create_cosmwasm_instantiate_msg(
@@ -256,10 +326,10 @@ class LedgerContract(UserString):
         """
         assert self._address, RuntimeError("Address was not set.")
 
-        if self._migrate_schema is not None:
-            validate(args, self._migrate_schema)
+        self.validate("migrate", args)
 
         self._path = new_path
+        self._digest = _compute_digest(new_path)
         new_code_id = self.store(sender, gas_limit)
 
         return self.migrate(args, sender, new_code_id, gas_limit)
@@ -282,8 +352,7 @@ class LedgerContract(UserString):
         """
         assert self._address, RuntimeError("Address was not set.")
 
-        if self._migrate_schema is not None:
-            validate(args, self._migrate_schema)
+        self.validate("migrate", args)
 
         # build up the migrate transaction
         migrate_msg = create_cosmwasm_migrate_msg(
@@ -393,8 +462,7 @@ class LedgerContract(UserString):
         if self._address is None:
             raise RuntimeError("Contract appears not to be deployed currently")
 
-        if self._execute_schema is not None:
-            validate(args, self._execute_schema)
+        self.validate("execute", args)
 
         # build up the execute transaction
         tx = Transaction()
@@ -418,14 +486,115 @@ class LedgerContract(UserString):
         if self._address is None:
             raise RuntimeError("Contract appears not to be deployed currently")
 
-        if self._query_schema is not None:
-            validate(args, self._query_schema)
+        self.validate("query", args)
+
+        if self._query_cache is not None:
+            return self._query_cache.query(self._address, args)
+
+        return self._client.query_contract(self._address, args)
+
+    def execute_batch(
+        self, sender: Wallet, memo: Optional[str] = None
+    ) -> "ExecuteBatch":
+        """Start a batch of execute messages sent by a wallet.
+
+        :param sender: sender wallet
+        :param memo: transaction memo, defaults to None
+        :return: empty execute batch
+        """
+        return ExecuteBatch(self._client, sender, memo=memo)
+
+    def query_many(
+        self,
+        msgs: Sequence[Any],
+        max_workers: int = DEFAULT_QUERY_MAX_WORKERS,
+        height: Optional[int] = None,
+    ) -> List[ContractQueryResult]:
+        """Run many queries on the contract concurrently.
+
+        Messages failing schema validation are not sent and report the validation
+        error in their result.
+
+        :param msgs: query messages
+        :param max_workers: maximum number of queries in flight
+        :param height: block height to query at, defaults to the latest block
+        :raises RuntimeError: Contract appears not to be deployed currently
+        :return: query results in the order of the messages
+        """
+        if self._address is None:
+            raise RuntimeError("Contract appears not to be deployed currently")
+
+        results: List[Optional[ContractQueryResult]] = [None] * len(msgs)
+        pending: List[int] = []
+        for index, msg in enumerate(msgs):
+            try:
+                self.validate("query", msg)
+                pending.append(index)
+            except Exception as error:  # pylint: disable=broad-except
+                results[index] = ContractQueryResult(
+                    address=str(self._address), error=error
+                )
+
+        batch = self._client.query_contracts_batch(
+            [(self._address, msgs[index]) for index in pending],
+            max_workers=max_workers,
+            height=height,
+        )
+        for index, result in zip(pending, batch):
+            results[index] = result
+
+        return cast(List[ContractQueryResult], results)
+
+    def iter_raw_state(
+        self,
+        prefix: Optional[bytes] = None,
+        start_key: Optional[bytes] = None,
+        page_limit: int = DEFAULT_STATE_PAGE_LIMIT,
+    ) -> Iterator[Model]:
+        """Stream the raw state models of the contract page by page.
+
+        :param prefix: only stream the keys starting with this prefix, defaults to None
+        :param start_key: pagination key to resume from, defaults to the first key
+        :param page_limit: number of models requested per page
+        :raises RuntimeError: Contract appears not to be deployed currently
+        :return: iterator over the raw state models in key order
+        """
+        if self._address is None:
+            raise RuntimeError("Contract appears not to be deployed currently")
+
+        return iter_raw_state(
+            self._client,
+            self._address,
+            prefix=prefix,
+            start_key=start_key,
+            page_limit=page_limit,
+        )
+
+    def dump_raw_state(
+        self,
+        path: str,
+        prefix: Optional[bytes] = None,
+        page_limit: int = DEFAULT_STATE_PAGE_LIMIT,
+    ) -> int:
+        """Dump the raw state of the contract to a file, resuming an interrupted dump.
+
+        :param path: path of the dump file
+        :param prefix: only dump the keys starting with this prefix, defaults to None
+        :param page_limit: number of models requested per page
+        :raises RuntimeError: Contract appears not to be deployed currently
+        :return: number of models written
+        """
+        if self._address is None:
+            raise RuntimeError("Contract appears not to be deployed currently")
 
-        req = QuerySmartContractStateRequest(
-            address=str(self._address), query_data=json_encode(args).encode("UTF8")
+        return dump_raw_state(
+            self._client, self._address, path, prefix=prefix, page_limit=page_limit
         )
-        resp = self._client.wasm.SmartContractState(req)
-        return json.loads(resp.data)
+
+    def _lookup_code_id(self, digest: bytes) -> Optional[int]:
+        if self._code_index is not None:
+            return self._code_index.lookup(digest)
+        return self._find_contract_id_by_digest(digest)
 
     def _find_contract_id_by_digest(self, digest: bytes) -> Optional[int]:
         code_id = None
@@ -453,28 +622,26 @@ class LedgerContract(UserString):
         return code_id
 
     def _load_schema(self, schema_path: Optional[str]):
-        self._schema: Optional[Dict[str, Any]] = None
-        self._instantiate_schema: Optional[Dict[str, Any]] = None
-        self._query_schema: Optional[Dict[str, Any]] = None
-        self._execute_schema: Optional[Dict[str, Any]] = None
-        self._migrate_schema: Optional[Dict[str, Any]] = None
+        self._schema: Optional[ContractSchema] = None
 
         if schema_path is None:
             return
 
-        self._schema = _load_contract_schema(schema_path)
-        if self._schema is None:
-            return
+        self._schema = load_contract_schema(schema_path)
 
-        for msg_type, schema in self._schema.items():
-            if "instantiate" in msg_type:
-                self._instantiate_schema = schema
-            elif "query" in msg_type:
-                self._query_schema = schema
-            elif "execute" in msg_type:
-                self._execute_schema = schema
-            elif "migrate" in msg_type:
-                self._migrate_schema = schema
+    def validate(self, msg_type: str, args: Any):
+        """Validate a message against the contract schema, if any.
+
+        :param msg_type: message type, e.g. instantiate, execute or query
+        :param args: message
+        """
+        if self._schema is not None:
+            self._schema.validate(
+                msg_type,
+                args,
+                mode=self._schema_validation,
+                sample_rate=self._schema_sample_rate,
+            )
 
     @property
     def data(self):
@@ -490,3 +657,140 @@ class LedgerContract(UserString):
         :return: contract details in json
         """
         return str(self)
+
+
+@dataclass
+class ExecuteResult:
+    """Result of one execute message of a batch."""
+
+    tx_hash: str
+    msg_index: int
+    log: Optional[MessageLog] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Check if the message was executed."""
+        return self.error is None
+
+
+class ExecuteBatch:
+    """Batch of contract execute messages packed into as few transactions as possible.
+
+    Messages can target any contract. On broadcast the messages are packed, in order,
+    into transactions whose estimated gas fits in the block gas limit, so that N
+    messages cost one account lookup and a signature and block inclusion per
+    transaction rather than per message (see pack_and_broadcast_messages).
+    """
+
+    def __init__(
+        self,
+        client: LedgerClient,
+        sender: Wallet,
+        memo: Optional[str] = None,
+    ):
+        """Init the execute batch.
+
+        :param client: Ledger client
+        :param sender: sender wallet
+        :param memo: transaction memo, defaults to None
+        """
+        self._client = client
+        self._sender = sender
+        self._memo = memo
+        self._msgs: List[Any] = []
+        # None until broadcast
+        self._txs: Optional[List[Tuple[SubmittedTx, List[int]]]] = None
+
+    def __len__(self) -> int:
+        """Get the number of messages in the batch.
+
+        :return: number of messages
+        """
+        return len(self._msgs)
+
+    def add(
+        self,
+        contract: Union[LedgerContract, Address, str],
+        args: Any,
+        funds: Optional[str] = None,
+    ) -> int:
+        """Add an execute message to the batch.
+
+        :param contract: contract, or contract address
+        :param args: execute message
+        :param funds: funds, defaults to None
+        :raises RuntimeError: Contract appears not to be deployed currently
+        :return: index of the message in the batch
+        """
+        if isinstance(contract, LedgerContract):
+            if contract.address is None:
+                raise RuntimeError("Contract appears not to be deployed currently")
+            contract.validate("execute", args)
+            address = contract.address
+        else:
+            address = Address(contract)
+
+        self._msgs.append(
+            create_cosmwasm_execute_msg(
+                self._sender.address(), address, args, funds=funds
+            )
+        )
+        return len(self._msgs) - 1
+
+    def broadcast(self) -> List[SubmittedTx]:
+        """Pack the messages into transactions and broadcast them.
+
+        An empty batch broadcasts nothing. When a message fails its simulation on its
+        own, nothing is broadcast and the error holds the index of the message.
+
+        :raises RuntimeError: if the batch has already been broadcast
+        :raises MessageSimulationError: if a message fails its simulation
+        :return: broadcast transactions, in order
+        """  # noqa: DAR402
+        if self._txs is not None:
+            raise RuntimeError("Execute batch already broadcast")
+
+        self._txs = pack_and_broadcast_messages(
+            self._client, self._msgs, self._sender, memo=self._memo
+        )
+        return [submitted for submitted, _ in self._txs]
+
+    def wait_to_complete(
+        self,
+        timeout: Optional[Union[int, float, timedelta]] = None,
+        poll_period: Optional[Union[int, float, timedelta]] = None,
+    ) -> List[ExecuteResult]:
+        """Wait for the broadcast transactions and map their logs back to the messages.
+
+        A transaction is atomic: when it fails, all its messages report its error.
+
+        :param timeout: timeout, defaults to None
+        :param poll_period: poll_period, defaults to None
+        :raises RuntimeError: if the batch has not been broadcast
+        :return: result of each message, in the order they were added
+        """
+        if self._txs is None:
+            raise RuntimeError("Execute batch not broadcast")
+
+        results: List[Optional[ExecuteResult]] = [None] * len(self._msgs)
+        for submitted, indices in self._txs:
+            error: Optional[Exception] = None
+            try:
+                submitted.wait_to_complete(timeout=timeout, poll_period=poll_period)
+            except Exception as ex:  # pylint: disable=broad-except
+                error = ex
+
+            logs = {}
+            if submitted.response is not None:
+                logs = {log.index: log for log in submitted.response.logs}
+
+            for msg_index, index in enumerate(indices):
+                results[index] = ExecuteResult(
+                    tx_hash=submitted.tx_hash,
+                    msg_index=msg_index,
+                    log=logs.get(msg_index),
+                    error=error,
+                )
+
+        return cast(List[ExecuteResult], results)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Compressed wasm artifacts."""
+
+import gzip
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from kiipy.crypto.hashfuncs import sha256_file
+
+
+DEFAULT_COMPRESSION_LEVEL = 9
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def compress_wasm(
+    contract_path: str, compression_level: int = DEFAULT_COMPRESSION_LEVEL
+) -> bytes:
+    """Gzip a wasm file.
+
+    :param contract_path: contract path
+    :param compression_level: gzip compression level
+    :return: gzipped wasm byte code
+    """
+    with open(contract_path, "rb") as contract_file:
+        return gzip.compress(contract_file.read(), compression_level, mtime=0)
+
+
+class WasmArtifactCache:
+    """On-disk cache of gzipped wasm byte code keyed by sha256 digest."""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ):
+        """Init the artifact cache.
+
+        :param cache_dir: directory holding the cached artifacts
+        :param compression_level: gzip compression level
+        """
+        self._cache_dir = cache_dir
+        self._compression_level = compression_level
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def compression_level(self) -> int:
+        """Get the gzip compression level.
+
+        :return: compression level
+        """
+        return self._compression_level
+
+    def artifact_path(self, digest: bytes) -> str:
+        """Get the path of the cached artifact for a digest.
+
+        :param digest: sha256 digest of the wasm file
+        :return: artifact path
+        """
+        return os.path.join(
+            self._cache_dir, f"{digest.hex()}.{self._compression_level}.wasm.gz"
+        )
+
+    def get_compressed(
+        self, contract_path: str, digest: Optional[bytes] = None
+    ) -> bytes:
+        """Get the gzipped byte code of a wasm file, compressing it on a cache miss.
+
+        :param contract_path: contract path
+        :param digest: sha256 digest of the wasm file, computed if not provided
+        :return: gzipped wasm byte code
+        """
+        if digest is None:
+            digest = sha256_file(contract_path)
+
+        artifact_path = self.artifact_path(digest)
+        try:
+            with open(artifact_path, "rb") as artifact_file:
+                return artifact_file.read()
+        except FileNotFoundError:
+            pass
+
+        # stream the compression into a temporary file and publish it atomically so
+        # that concurrent deployments never observe a partial artifact
+        fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                with gzip.GzipFile(
+                    filename="",
+                    fileobj=tmp_file,
+                    mode="wb",
+                    compresslevel=self._compression_level,
+                    mtime=0,
+                ) as gzip_file:
+                    with open(contract_path, "rb") as contract_file:
+                        shutil.copyfileobj(contract_file, gzip_file, _COPY_CHUNK_SIZE)
+            os.replace(tmp_path, artifact_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        with open(artifact_path, "rb") as artifact_file:
+            return artifact_file.read()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Persistent index of stored contract codes."""
+
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional
+
+from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageRequest
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import QueryCodesRequest
+
+
+DEFAULT_CODES_PAGE_LIMIT = 500
+_LOOKUP_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS codes (
+    chain_id TEXT NOT NULL,
+    code_id INTEGER NOT NULL,
+    data_hash BLOB NOT NULL,
+    PRIMARY KEY (chain_id, code_id)
+);
+CREATE INDEX IF NOT EXISTS codes_by_hash ON codes (chain_id, data_hash);
+CREATE TABLE IF NOT EXISTS code_sync (
+    chain_id TEXT PRIMARY KEY,
+    last_code_id INTEGER NOT NULL
+);
+"""
+
+
+class CodeIndex:
+    """Local, persistent index of the codes stored on a chain.
+
+    The index maps the sha256 digest of the wasm byte code to its code id. It is
+    kept per chain id in a SQLite database and synchronised incrementally: each sync
+    only requests the codes stored after the highest code id seen so far.
+    """
+
+    def __init__(
+        self,
+        client: "LedgerClient",  # type: ignore # noqa: F821
+        path: str,
+        page_limit: int = DEFAULT_CODES_PAGE_LIMIT,
+    ):
+        """Init the code index.
+
+        :param client: Ledger client
+        :param path: path of the SQLite database
+        :param page_limit: number of codes requested per page
+        """
+        self._client = client
+        self._chain_id = client.network_config.chain_id
+        self._page_limit = page_limit
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    @property
+    def last_code_id(self) -> int:
+        """Get the highest code id synchronised from the chain.
+
+        :return: code id, 0 if the index has never been synchronised
+        """
+        with self._lock:
+            return self._last_code_id()
+
+    def sync(self) -> int:
+        """Fetch the codes stored since the last synchronisation.
+
+        :return: number of new codes added to the index
+        """
+        with self._lock:
+            last_code_id = self._last_code_id()
+            added = 0
+
+            # code ids are the pagination keys of the codes listing, encoded big endian
+            key = (last_code_id + 1).to_bytes(8, byteorder="big")
+            while True:
+                req = QueryCodesRequest(
+                    pagination=PageRequest(key=key, limit=self._page_limit)
+                )
+                resp = self._client.wasm.Codes(req)
+
+                rows = [
+                    (self._chain_id, int(code_info.code_id), bytes(code_info.data_hash))
+                    for code_info in resp.code_infos
+                    if int(code_info.code_id) > last_code_id
+                ]
+                if rows:
+                    last_code_id = max(row[1] for row in rows)
+                    with self._db:
+                        self._db.executemany(
+                            "INSERT OR REPLACE INTO codes VALUES (?, ?, ?)", rows
+                        )
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO code_sync VALUES (?, ?)",
+                            (self._chain_id, last_code_id),
+                        )
+                    added += len(rows)
+
+                if len(resp.pagination.next_key) == 0:
+                    break
+                key = resp.pagination.next_key
+
+            return added
+
+    def add(self, code_id: int, digest: bytes):
+        """Record a code stored by this process without waiting for the next sync.
+
+        :param code_id: code id
+        :param digest: sha256 digest of the wasm byte code
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO codes VALUES (?, ?, ?)",
+                (self._chain_id, int(code_id), bytes(digest)),
+            )
+
+    def lookup(self, digest: bytes, sync: bool = True) -> Optional[int]:
+        """Look up the code id of a digest.
+
+        :param digest: sha256 digest of the wasm byte code
+        :param sync: synchronise the index when the digest is not known locally
+        :return: lowest code id storing the digest, None if not found
+        """
+        return self.lookup_many([digest], sync=sync)[bytes(digest)]
+
+    def lookup_many(
+        self, digests: Iterable[bytes], sync: bool = True
+    ) -> Dict[bytes, Optional[int]]:
+        """Look up the code ids of many digests in one pass.
+
+        The index is synchronised at most once, and only if a digest is missing.
+
+        :param digests: sha256 digests of the wasm byte codes
+        :param sync: synchronise the index when a digest is not known locally
+        :return: lowest code id storing each digest, None for those not found
+        """
+        results: Dict[bytes, Optional[int]] = {bytes(d): None for d in digests}
+        self._fill(results)
+        if sync and None in results.values():
+            self.sync()
+            self._fill(results)
+        return results
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def _last_code_id(self) -> int:
+        row = self._db.execute(
+            "SELECT last_code_id FROM code_sync WHERE chain_id = ?", (self._chain_id,)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def _fill(self, results: Dict[bytes, Optional[int]]):
+        missing = [digest for digest, code_id in results.items() if code_id is None]
+
+        # keep well below the SQLite limit of bound parameters per statement
+        for start in range(0, len(missing), _LOOKUP_CHUNK_SIZE):
+            chunk = missing[start : start + _LOOKUP_CHUNK_SIZE]  # noqa: E203
+            placeholders = ", ".join("?" * len(chunk))
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT data_hash, MIN(code_id) FROM codes "  # nosec
+                    f"WHERE chain_id = ? AND data_hash IN ({placeholders}) "
+                    "GROUP BY data_hash",
+                    (self._chain_id, *chunk),
+                ).fetchall()
+            for data_hash, code_id in rows:
+                results[bytes(data_hash)] = int(code_id)
@@ -19,10 +19,14 @@
 
 """Cosmwasm contract store, instantiate, execute messages."""
 
-import gzip
 from typing import Any, Optional
 
 from kiipy.aerial.coins import parse_coins
+from kiipy.aerial.contract.artifacts import (
+    DEFAULT_COMPRESSION_LEVEL,
+    WasmArtifactCache,
+    compress_wasm,
+)
 from kiipy.common.utils import json_encode
 from kiipy.crypto.address import Address
 from kiipy.protos.cosmwasm.wasm.v1.tx_pb2 import (
@@ -36,16 +40,25 @@ from kiipy.protos.cosmwasm.wasm.v1.tx_pb2 import (
 
 
 def create_cosmwasm_store_code_msg(
-    contract_path: str, sender_address: Address
+    contract_path: str,
+    sender_address: Address,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    artifact_cache: Optional[WasmArtifactCache] = None,
+    digest: Optional[bytes] = None,
 ) -> MsgStoreCode:
     """Create cosmwasm store code message.
 
     :param contract_path: contract path
     :param sender_address: sender address
+    :param compression_level: gzip compression level, ignored when a cache is used
+    :param artifact_cache: cache of compressed artifacts, defaults to None
+    :param digest: sha256 digest of the contract, used as the cache key
     :return: cosmwasm store code message
     """
-    with open(contract_path, "rb") as contract_file:
-        wasm_byte_code = gzip.compress(contract_file.read(), 9)
+    if artifact_cache is not None:
+        wasm_byte_code = artifact_cache.get_compressed(contract_path, digest=digest)
+    else:
+        wasm_byte_code = compress_wasm(contract_path, compression_level)
 
     msg = MsgStoreCode(
         sender=str(sender_address),
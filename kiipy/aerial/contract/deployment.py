@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Deployment of many contracts in a few blocks."""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set, Union
+
+from kiipy.aerial.client import LedgerClient
+from kiipy.aerial.client.utils import pack_and_broadcast_messages
+from kiipy.aerial.contract import LedgerContract
+from kiipy.aerial.contract.cosmwasm import (
+    create_cosmwasm_instantiate_msg,
+    create_cosmwasm_store_code_msg,
+)
+from kiipy.aerial.tx_helpers import SubmittedTx
+from kiipy.aerial.wallet import Wallet
+from kiipy.crypto.address import Address
+
+
+class ContractRef:
+    """Reference to the address of another contract of a deployment plan."""
+
+    def __init__(self, name: str):
+        """Init the contract reference.
+
+        :param name: name of the referenced contract in the plan
+        """
+        self.name = name
+
+    def __repr__(self) -> str:
+        """Get the representation of the reference.
+
+        :return: representation
+        """
+        return f"ContractRef({self.name!r})"
+
+
+@dataclass
+class _PlannedContract:
+    contract: LedgerContract
+    args: Any
+    label: Optional[str]
+    admin_address: Optional[Address]
+    funds: Optional[str]
+    dependencies: Set[str]
+
+
+def _find_refs(args: Any) -> Set[str]:
+    if isinstance(args, ContractRef):
+        return {args.name}
+    if isinstance(args, dict):
+        return set().union(*map(_find_refs, args.values()))
+    if isinstance(args, (list, tuple)):
+        return set().union(*map(_find_refs, args))
+    return set()
+
+
+def _resolve_refs(args: Any, addresses: Dict[str, Address]) -> Any:
+    if isinstance(args, ContractRef):
+        return str(addresses[args.name])
+    if isinstance(args, dict):
+        return {key: _resolve_refs(value, addresses) for key, value in args.items()}
+    if isinstance(args, (list, tuple)):
+        return [_resolve_refs(value, addresses) for value in args]
+    return args
+
+
+def _message_event_value(
+    submitted: SubmittedTx, msg_index: int, event: str, key: str
+) -> Optional[str]:
+    if submitted.response is None:
+        return None
+    return submitted.response.message_events(msg_index).get(event, key)
+
+
+class DeploymentPlan:
+    """Plan deploying a graph of contracts in as few blocks as possible.
+
+    Instantiate args may reference the address of other contracts of the plan with
+    :class:`ContractRef`. The plan stores all the missing codes at once, packed in as
+    few transactions as fit in a block, storing each distinct wasm only once. Codes
+    already on chain are reused through the digest lookup of the contracts. The
+    contracts are then instantiated in waves: each wave instantiates all the contracts
+    whose dependencies are deployed, again packed in as few transactions as possible.
+    """
+
+    def __init__(self, client: LedgerClient, sender: Wallet):
+        """Init the deployment plan.
+
+        :param client: Ledger client
+        :param sender: wallet storing and instantiating the contracts
+        """
+        self._client = client
+        self._sender = sender
+        self._contracts: Dict[str, _PlannedContract] = {}
+
+    def add(
+        self,
+        name: str,
+        contract: LedgerContract,
+        args: Any,
+        label: Optional[str] = None,
+        admin_address: Optional[Address] = None,
+        funds: Optional[str] = None,
+    ):
+        """Add a contract to the plan.
+
+        :param name: name of the contract in the plan
+        :param contract: contract to deploy
+        :param args: instantiate args, may contain ContractRef placeholders
+        :param label: label, defaults to None
+        :param admin_address: admin address, defaults to None
+        :param funds: funds, defaults to None
+        :raises RuntimeError: if the name is already used in the plan
+        """
+        if name in self._contracts:
+            raise RuntimeError(f"Contract {name} already in the deployment plan")
+
+        self._contracts[name] = _PlannedContract(
+            contract=contract,
+            args=args,
+            label=label,
+            admin_address=admin_address,
+            funds=funds,
+            dependencies=_find_refs(args),
+        )
+
+    def waves(self) -> List[List[str]]:
+        """Get the instantiation waves of the contracts still to deploy.
+
+        :raises RuntimeError: if a reference is unknown or the references form a cycle
+        :return: names of the contracts instantiated in each wave
+        """
+        deployed = {
+            name
+            for name, planned in self._contracts.items()
+            if planned.contract.address is not None
+        }
+        remaining = set(self._contracts) - deployed
+        for name in remaining:
+            unknown = self._contracts[name].dependencies - set(self._contracts)
+            if unknown:
+                raise RuntimeError(
+                    f"Contract {name} references unknown contracts: {sorted(unknown)}"
+                )
+
+        waves: List[List[str]] = []
+        while remaining:
+            wave = sorted(
+                name
+                for name in remaining
+                if self._contracts[name].dependencies <= deployed
+            )
+            if not wave:
+                raise RuntimeError(
+                    f"Cyclic contract references between: {sorted(remaining)}"
+                )
+            waves.append(wave)
+            deployed.update(wave)
+            remaining.difference_update(wave)
+        return waves
+
+    def deploy(
+        self,
+        timeout: Optional[Union[int, float, timedelta]] = None,
+        poll_period: Optional[Union[int, float, timedelta]] = None,
+    ) -> Dict[str, Address]:
+        """Deploy the contracts of the plan.
+
+        :param timeout: timeout of each transaction, defaults to None
+        :param poll_period: poll period of each transaction, defaults to None
+        :return: address of each contract of the plan
+        """
+        waves = self.waves()
+        self._store_codes(timeout, poll_period)
+
+        addresses: Dict[str, Address] = {
+            name: planned.contract.address
+            for name, planned in self._contracts.items()
+            if planned.contract.address is not None
+        }
+        for wave in waves:
+            addresses.update(self._instantiate(wave, addresses, timeout, poll_period))
+
+        return addresses
+
+    def _store_codes(
+        self,
+        timeout: Optional[Union[int, float, timedelta]],
+        poll_period: Optional[Union[int, float, timedelta]],
+    ):
+        # contracts sharing the same wasm only need it stored once
+        by_digest: Dict[bytes, List[LedgerContract]] = {}
+        for planned in self._contracts.values():
+            contract = planned.contract
+            if contract.address is None and contract.code_id is None:
+                if contract.path is None or contract.digest is None:
+                    raise RuntimeError("Unable to upload code, no contract provided")
+                by_digest.setdefault(bytes(contract.digest), []).append(contract)
+
+        if not by_digest:
+            return
+
+        digests = list(by_digest)
+        msgs = [
+            create_cosmwasm_store_code_msg(
+                str(by_digest[digest][0].path),
+                self._sender.address(),
+                compression_level=by_digest[digest][0].compression_level,
+                artifact_cache=by_digest[digest][0].artifact_cache,
+                digest=digest,
+            )
+            for digest in digests
+        ]
+
+        for submitted, indices in pack_and_broadcast_messages(
+            self._client, msgs, self._sender
+        ):
+            submitted.wait_to_complete(timeout=timeout, poll_period=poll_period)
+            for msg_index, index in enumerate(indices):
+                code_id = _message_event_value(
+                    submitted, msg_index, "store_code", "code_id"
+                )
+                if code_id is None and len(indices) == 1:
+                    code_id = submitted.contract_code_id
+                for contract in by_digest[digests[index]]:
+                    contract.record_code_id(
+                        int(code_id) if code_id is not None else None
+                    )
+
+    def _instantiate(
+        self,
+        wave: List[str],
+        addresses: Dict[str, Address],
+        timeout: Optional[Union[int, float, timedelta]],
+        poll_period: Optional[Union[int, float, timedelta]],
+    ) -> Dict[str, Address]:
+        msgs = []
+        for name in wave:
+            planned = self._contracts[name]
+            contract = planned.contract
+            args = _resolve_refs(planned.args, addresses)
+            contract.validate("instantiate", args)
+            msgs.append(
+                create_cosmwasm_instantiate_msg(
+                    contract.code_id,
+                    args,
+                    planned.label or contract.default_label(),
+                    self._sender.address(),
+                    admin_address=planned.admin_address,
+                    funds=planned.funds,
+                )
+            )
+
+        deployed: Dict[str, Address] = {}
+        for submitted, indices in pack_and_broadcast_messages(
+            self._client, msgs, self._sender
+        ):
+            submitted.wait_to_complete(timeout=timeout, poll_period=poll_period)
+            for msg_index, index in enumerate(indices):
+                address = _message_event_value(
+                    submitted, msg_index, "instantiate", "_contract_address"
+                )
+                if address is None and len(indices) == 1:
+                    address = submitted.contract_address
+                if address is None:
+                    raise RuntimeError("Unable to extract contract address")
+
+                name = wave[index]
+                contract = self._contracts[name].contract
+                contract.record_address(Address(address))
+                deployed[name] = Address(address)
+
+        return deployed
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Indexer of contract wasm events."""
+
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from kiipy.aerial.client.search import DEFAULT_SEARCH_CONCURRENCY, iter_txs_event_pages
+from kiipy.aerial.tx_helpers import TxEvent, group_event_rows, tx_response_events
+from kiipy.crypto.address import Address
+
+
+DEFAULT_EVENTS_PAGE_LIMIT = 100
+DEFAULT_INDEXER_MAX_WORKERS = 4
+CONTRACT_ADDRESS_ATTRIBUTE = "_contract_address"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    tx_hash TEXT NOT NULL,
+    event_index INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    action TEXT,
+    tx_index INTEGER,
+    PRIMARY KEY (tx_hash, event_index)
+);
+CREATE INDEX IF NOT EXISTS events_by_contract_action_height
+    ON events (contract, action, height);
+CREATE TABLE IF NOT EXISTS attributes (
+    tx_hash TEXT NOT NULL,
+    event_index INTEGER NOT NULL,
+    attribute_index INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, event_index, attribute_index)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    contract TEXT PRIMARY KEY,
+    height INTEGER NOT NULL
+);
+"""
+
+
+@dataclass
+class ContractEvent(TxEvent):
+    """Wasm event emitted by a contract."""
+
+    contract: str
+    height: int
+    tx_hash: str
+    event_index: int
+    action: Optional[str]
+    # position of the transaction in its block, None if unknown
+    tx_index: Optional[int] = None
+
+
+def parse_contract_events(
+    tx_response: Any, contracts: Optional[Iterable[str]] = None
+) -> List[ContractEvent]:
+    """Extract the wasm events of a transaction response, keeping every instance.
+
+    Unlike the event dicts of TxResponse, repeated events and attributes are all kept,
+    in the order they were emitted.
+
+    :param tx_response: transaction response protobuf
+    :param contracts: only keep the events of these contracts, defaults to all
+    :return: wasm events of the transaction
+    """
+    wanted = set(contracts) if contracts is not None else None
+
+    events = []
+    for event_index, event in enumerate(tx_response_events(tx_response)):
+        if event.type != "wasm" and not event.type.startswith("wasm-"):
+            continue
+
+        attributes = [(str(a.key), str(a.value)) for a in event.attributes]
+        contract = next(
+            (v for k, v in attributes if k == CONTRACT_ADDRESS_ATTRIBUTE), None
+        )
+        if contract is None or (wanted is not None and contract not in wanted):
+            continue
+
+        events.append(
+            ContractEvent(
+                contract=contract,
+                height=int(tx_response.height),
+                tx_hash=str(tx_response.txhash),
+                event_index=event_index,
+                type=str(event.type),
+                action=next((v for k, v in attributes if k == "action"), None),
+                attributes=attributes,
+            )
+        )
+    return events
+
+
+class ContractEventIndexer:
+    """Incremental indexer of the wasm events of a set of contracts.
+
+    Events are fetched with GetTxsEvent by contract address, in ascending height
+    order, and stored in a SQLite database indexed by (contract, action, height),
+    together with the position of their transaction in its block.
+    Every page is written together with the per contract checkpoint, so an
+    interrupted sync resumes from the last indexed height; re-indexed events are
+    ignored. Contracts are caught up concurrently, and the blocks giving the
+    positions of the transactions of a page are fetched concurrently.
+    """
+
+    def __init__(
+        self,
+        client: "LedgerClient",  # type: ignore # noqa: F821
+        path: str,
+        contracts: Iterable[Union[Address, str]],
+        page_limit: int = DEFAULT_EVENTS_PAGE_LIMIT,
+        concurrency: int = DEFAULT_SEARCH_CONCURRENCY,
+    ):
+        """Init the event indexer.
+
+        :param client: Ledger client
+        :param path: path of the SQLite database
+        :param contracts: addresses of the contracts to follow
+        :param page_limit: number of transactions requested per page
+        :param concurrency: maximum number of pages of a contract requested at once
+        """
+        self._client = client
+        self._contracts = [str(contract) for contract in contracts]
+        self._page_limit = page_limit
+        self._concurrency = concurrency
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    @property
+    def contracts(self) -> List[str]:
+        """Get the addresses of the followed contracts.
+
+        :return: contract addresses
+        """
+        return list(self._contracts)
+
+    def checkpoint(self, contract: Union[Address, str]) -> int:
+        """Get the highest height indexed for a contract.
+
+        :param contract: contract address
+        :return: block height, 0 if the contract has never been indexed
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT height FROM checkpoints WHERE contract = ?", (str(contract),)
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def sync(self, max_workers: int = DEFAULT_INDEXER_MAX_WORKERS) -> int:
+        """Index the events emitted since the last sync.
+
+        :param max_workers: maximum number of contracts caught up concurrently
+        :return: number of new events indexed
+        """
+        if not self._contracts:
+            return 0
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self._contracts)))
+        ) as executor:
+            return sum(executor.map(self._sync_contract, self._contracts))
+
+    def events(
+        self,
+        contract: Optional[Union[Address, str]] = None,
+        action: Optional[str] = None,
+        from_height: Optional[int] = None,
+        to_height: Optional[int] = None,
+    ) -> List[ContractEvent]:
+        """Get indexed events.
+
+        :param contract: only the events of this contract, defaults to all
+        :param action: only the events with this action, defaults to all
+        :param from_height: lowest block height, inclusive, defaults to None
+        :param to_height: highest block height, inclusive, defaults to None
+        :return: events in chain order
+        """
+        clauses = []
+        params: List[Any] = []
+        for clause, value in (
+            ("e.contract = ?", str(contract) if contract is not None else None),
+            ("e.action = ?", action),
+            ("e.height >= ?", from_height),
+            ("e.height <= ?", to_height),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT e.type, e.contract, e.height, e.tx_hash, e.event_index, "  # nosec
+                "e.action, e.tx_index, a.key, a.value FROM events AS e "
+                "LEFT JOIN attributes AS a USING (tx_hash, event_index) "
+                f"{where} ORDER BY e.height, e.tx_index, e.tx_hash, e.event_index, "
+                "a.attribute_index",
+                params,
+            ).fetchall()
+
+        return group_event_rows(
+            rows,
+            lambda type_, *columns: ContractEvent(type_, [], *columns),
+        )
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def _sync_contract(self, contract: str) -> int:
+        # the last indexed height is fetched again: its transactions may not have
+        # all been indexed, and the events already stored are ignored
+        from_height = self.checkpoint(contract)
+        search = [
+            f"wasm.{CONTRACT_ADDRESS_ATTRIBUTE}='{contract}'",
+            f"tx.height>={from_height}",
+        ]
+        # positions of the transactions in the blocks of the current checkpoint
+        tx_indexes: Dict[int, Dict[str, int]] = {}
+
+        added = 0
+        with ThreadPoolExecutor(max_workers=max(1, self._concurrency)) as executor:
+            for resp in iter_txs_event_pages(
+                self._client.txs, [search], self._page_limit, self._concurrency
+            ):
+                page = [
+                    (tx_response, parse_contract_events(tx_response, [contract]))
+                    for tx_response in resp.tx_responses
+                ]
+                self._fetch_tx_indexes(
+                    executor,
+                    tx_indexes,
+                    {events[0].height for _, events in page if events},
+                )
+
+                events = []
+                height = from_height
+                for tx_response, tx_events in page:
+                    for event in tx_events:
+                        event.tx_index = tx_indexes[event.height].get(
+                            event.tx_hash.upper()
+                        )
+                    events.extend(tx_events)
+                    height = max(height, int(tx_response.height))
+                added += self._store(contract, events, height)
+
+                # only the checkpoint height can appear again in the next pages
+                for indexed_height in [h for h in tx_indexes if h < height]:
+                    del tx_indexes[indexed_height]
+
+        return added
+
+    def _fetch_tx_indexes(
+        self,
+        executor: ThreadPoolExecutor,
+        tx_indexes: Dict[int, Dict[str, int]],
+        heights: Set[int],
+    ):
+        # search results do not report the position of a transaction in its block,
+        # the blocks of a page are fetched concurrently
+        missing = sorted(heights - set(tx_indexes))
+        for height, block in zip(
+            missing, executor.map(self._client.query_compact_block, missing)
+        ):
+            tx_indexes[height] = {
+                tx_hash: index for index, tx_hash in enumerate(block.tx_hashes)
+            }
+
+    def _store(self, contract: str, events: List[ContractEvent], height: int) -> int:
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO events (tx_hash, event_index, contract, height, "
+                "type, action, tx_index) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        e.tx_hash,
+                        e.event_index,
+                        e.contract,
+                        e.height,
+                        e.type,
+                        e.action,
+                        e.tx_index,
+                    )
+                    for e in events
+                ],
+            )
+            added = self._db.total_changes - before
+            self._db.executemany(
+                "INSERT OR IGNORE INTO attributes VALUES (?, ?, ?, ?, ?)",
+                [
+                    (e.tx_hash, e.event_index, index, key, value)
+                    for e in events
+                    for index, (key, value) in enumerate(e.attributes)
+                ],
+            )
+            self._db.execute(
+                "INSERT INTO checkpoints VALUES (?, ?) ON CONFLICT (contract) "
+                "DO UPDATE SET height = MAX(height, excluded.height)",
+                (contract, height),
+            )
+        return added
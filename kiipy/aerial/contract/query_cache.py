@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Height-pinned cache of contract query results."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple, Union
+
+from kiipy.common.utils import json_encode
+from kiipy.crypto.address import Address
+
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_HEIGHT_REFRESH_SECS = 1.0
+
+# (contract address, canonical query, height or None for immutable queries)
+_CacheKey = Tuple[str, str, Optional[int]]
+# (result, kept across blocks)
+_CacheEntry = Tuple[Any, bool]
+
+
+def _msg_type(msg: Any) -> Optional[str]:
+    # cosmwasm query messages are objects with a single key naming the query
+    if isinstance(msg, dict) and len(msg) == 1:
+        return next(iter(msg))
+    return None
+
+
+class ContractQueryCache:
+    """Thread-safe cache of contract query results.
+
+    Results are cached per contract address, canonical JSON query and block height,
+    and each query is pinned to the height it is cached under. Results of queries at
+    the latest height are dropped as soon as a new block is observed. Results of
+    queries at an explicit height never change and are kept across blocks, as are
+    the query types declared immutable (e.g. ``token_info``).
+
+    The latest height is refreshed from the chain at most once per
+    ``height_refresh_secs``; callers that already follow new blocks can report them
+    with :meth:`observe_height` instead. Cached results are shared between callers
+    and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        client: "LedgerClient",  # type: ignore # noqa: F821
+        immutable_queries: Iterable[str] = (),
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        height_refresh_secs: float = DEFAULT_HEIGHT_REFRESH_SECS,
+    ):
+        """Init the query cache.
+
+        :param client: Ledger client
+        :param immutable_queries: query types whose results never change
+        :param max_entries: maximum number of cached results
+        :param height_refresh_secs: minimum interval between latest height queries
+        """
+        self._client = client
+        self._immutable_queries = frozenset(immutable_queries)
+        self._max_entries = max_entries
+        self._height_refresh_secs = height_refresh_secs
+        self._entries: "OrderedDict[_CacheKey, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._height = 0
+        self._height_refreshed_at: Optional[float] = None
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def height(self) -> int:
+        """Get the latest observed block height.
+
+        :return: block height, 0 if no block has been observed yet
+        """
+        return self._height
+
+    @property
+    def hits(self) -> int:
+        """Get the number of queries served from the cache.
+
+        :return: number of hits
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Get the number of queries sent to the chain.
+
+        :return: number of misses
+        """
+        return self._misses
+
+    @property
+    def hit_rate(self) -> float:
+        """Get the fraction of queries served from the cache.
+
+        :return: hit rate, 0.0 if no query has been made
+        """
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        """Get the number of cached results.
+
+        :return: number of cached results
+        """
+        return len(self._entries)
+
+    def observe_height(self, height: int):
+        """Report a new block, dropping the results of earlier heights.
+
+        :param height: block height
+        """
+        with self._lock:
+            self._height_refreshed_at = time.monotonic()
+            if height <= self._height:
+                return
+            self._height = height
+            stale = [
+                key
+                for key, (_, kept) in self._entries.items()
+                if not kept and key[2] is not None and key[2] < height
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def latest_height(self) -> int:
+        """Get the latest block height, refreshing it from the chain when due.
+
+        :return: block height
+        """
+        refreshed_at = self._height_refreshed_at
+        if (
+            refreshed_at is None
+            or time.monotonic() - refreshed_at >= self._height_refresh_secs
+        ):
+            self.observe_height(self._client.query_height())
+        return self._height
+
+    def query(
+        self,
+        address: Union[Address, str],
+        msg: Any,
+        height: Optional[int] = None,
+    ) -> Any:
+        """Query a smart contract through the cache.
+
+        :param address: contract address
+        :param msg: query message
+        :param height: block height to query at, defaults to the latest block
+        :return: query result
+        """
+        immutable = _msg_type(msg) in self._immutable_queries
+        # the result at an explicit height can never change
+        kept = immutable or height is not None
+        if height is None and not immutable:
+            height = self.latest_height()
+
+        key: _CacheKey = (
+            str(address),
+            json_encode(msg, sort_keys=True, separators=(",", ":")),
+            None if immutable else height,
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, entry_kept = entry
+                if kept and not entry_kept:
+                    self._entries[key] = (result, True)
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return result
+            self._misses += 1
+
+        result = self._client.query_contract(address, msg, height=height)
+
+        with self._lock:
+            # a newer block may have been observed while the query was in flight
+            if kept or key[2] >= self._height:  # type: ignore
+                self._entries[key] = (result, kept)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, address: Optional[Union[Address, str]] = None):
+        """Drop cached results, including the immutable ones.
+
+        :param address: only drop the results of this contract, defaults to all
+        """
+        with self._lock:
+            if address is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == str(address)]:
+                del self._entries[key]
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Compiled contract message schemas."""
+
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import unquote
+
+from jsonschema import Draft7Validator
+from jsonschema.validators import validator_for
+
+
+MSG_TYPES = ("instantiate", "query", "execute", "migrate")
+MAX_CACHED_SCHEMAS = 64
+
+# keywords that do not take part in validation, dropped when inlining a reference
+_ANNOTATIONS = frozenset(
+    {"title", "description", "default", "examples", "$comment", "readOnly"}
+)
+
+_SchemaKey = Tuple[Tuple[str, int, int], ...]
+_cache: "OrderedDict[str, Tuple[_SchemaKey, ContractSchema]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class SchemaValidation(Enum):
+    """Schema validation mode.
+
+    :param Enum: Strict, Sampled, Off
+    """
+
+    Strict = 0
+    Sampled = 1
+    Off = 2
+
+
+def _resolve_pointer(root: Any, ref: str) -> Any:
+    node = root
+    for token in ref[2:].split("/") if len(ref) > 2 else []:
+        token = unquote(token).replace("~1", "/").replace("~0", "~")
+        if isinstance(node, list) and token.isdigit() and int(token) < len(node):
+            node = node[int(token)]
+        elif isinstance(node, dict) and token in node:
+            node = node[token]
+        else:
+            return None
+    return node
+
+
+def _inline_refs(
+    node: Any, root: Any, resolving: Tuple[str, ...], resolved: Dict[str, Any]
+) -> Any:
+    if isinstance(node, list):
+        return [_inline_refs(item, root, resolving, resolved) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    ref = node.get("$ref")
+    if (
+        isinstance(ref, str)
+        and (ref == "#" or ref.startswith("#/"))
+        and ref not in resolving
+        and set(node) - {"$ref"} <= _ANNOTATIONS
+    ):
+        if ref not in resolved:
+            target = _resolve_pointer(root, ref)
+            if target is None:
+                return node
+            resolved[ref] = _inline_refs(target, root, resolving + (ref,), resolved)
+        return resolved[ref]
+
+    # references to a definition being resolved are recursive, they are left to
+    # the validator and resolved against the definitions kept in the root
+    return {
+        key: _inline_refs(value, root, resolving, resolved)
+        for key, value in node.items()
+    }
+
+
+def inline_refs(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the local references of a schema by the definitions they point to.
+
+    Recursive references and references with validation keywords next to them are
+    kept, they are resolved by the validator.
+
+    :param schema: schema
+    :return: schema with its references resolved, the schema itself is not modified
+    """
+    return _inline_refs(schema, schema, (), {})
+
+
+def _compile_validator(schema: Dict[str, Any]) -> Any:
+    # cosmwasm schemas are generated as draft 7 unless they declare otherwise
+    validator_cls = validator_for(schema, default=Draft7Validator)
+    validator_cls.check_schema(schema)
+    return validator_cls(inline_refs(schema))
+
+
+class ContractSchema:
+    """Contract message schemas with their validators compiled once."""
+
+    def __init__(self, schemas: Dict[str, Dict[str, Any]]):
+        """Init the contract schema.
+
+        :param schemas: message schemas keyed by schema file name
+        """
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+        self._validators: Dict[str, Any] = {}
+
+        for msg_name, schema in schemas.items():
+            for msg_type in MSG_TYPES:
+                if msg_type in msg_name:
+                    self._schemas[msg_type] = schema
+                    self._validators[msg_type] = _compile_validator(schema)
+                    break
+
+    def schema(self, msg_type: str) -> Optional[Dict[str, Any]]:
+        """Get the schema of a message type.
+
+        :param msg_type: one of instantiate, query, execute or migrate
+        :return: schema, None if the contract has no schema for the message type
+        """
+        return self._schemas.get(msg_type)
+
+    def validate(
+        self,
+        msg_type: str,
+        args: Any,
+        mode: SchemaValidation = SchemaValidation.Strict,
+        sample_rate: float = 1.0,
+    ):
+        """Validate a message against the schema of its type.
+
+        :param msg_type: one of instantiate, query, execute or migrate
+        :param args: message
+        :param mode: validation mode
+        :param sample_rate: fraction of the messages validated in sampled mode
+        :raises ValidationError: if the message is invalid
+        """  # noqa: DAR402
+        if mode == SchemaValidation.Off:
+            return
+        if mode == SchemaValidation.Sampled and random.random() >= sample_rate:  # nosec
+            return
+
+        validator = self._validators.get(msg_type)
+        if validator is None:
+            return
+
+        validator.validate(args)
+
+
+def _schema_files(schema_path: str) -> Optional[_SchemaKey]:
+    try:
+        filenames = sorted(os.listdir(schema_path))
+    except OSError:
+        return None
+
+    files = []
+    for filename in filenames:
+        if filename.endswith(".json"):
+            stat = os.stat(os.path.join(schema_path, filename))
+            files.append((filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(files)
+
+
+def _read_contract_schema(schema_path: str, files: _SchemaKey) -> ContractSchema:
+    schemas = {}
+    for filename, _, _ in files:
+        msg_name = os.path.splitext(os.path.basename(filename))[0]
+        full_path = os.path.join(schema_path, filename)
+        with open(full_path, "r", encoding="utf-8") as msg_schema_file:
+            schemas[msg_name] = json.load(msg_schema_file)
+    return ContractSchema(schemas)
+
+
+def load_contract_schema(schema_path: str) -> Optional[ContractSchema]:
+    """Load and compile the schemas of a contract schema directory.
+
+    Contracts sharing a schema directory share the compiled validators. The schemas
+    are compiled again when a schema file is added, removed or modified.
+
+    :param schema_path: path to the contract schema directory
+    :return: contract schema, None if the directory does not exist
+    """
+    schema_path = os.path.realpath(schema_path)
+    files = _schema_files(schema_path)
+    if files is None:
+        return None
+
+    with _cache_lock:
+        entry = _cache.get(schema_path)
+        if entry is not None and entry[0] == files:
+            _cache.move_to_end(schema_path)
+            return entry[1]
+
+    schema = _read_contract_schema(schema_path, files)
+    with _cache_lock:
+        _cache[schema_path] = (files, schema)
+        _cache.move_to_end(schema_path)
+        while len(_cache) > MAX_CACHED_SCHEMAS:
+            _cache.popitem(last=False)
+    return schema
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Streaming export of contract raw state."""
+
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple, Union
+
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageRequest
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import QueryAllContractStateRequest
+from kiipy.protos.cosmwasm.wasm.v1.types_pb2 import Model
+
+
+DEFAULT_STATE_PAGE_LIMIT = 1000
+STATE_DUMP_MAGIC = b"KIISTATE"
+
+_LENGTH = struct.Struct(">I")
+_CHECKPOINT_SUFFIX = ".checkpoint"
+
+# a page of models and the key of the next page, empty on the last page
+StatePage = Tuple[List[Model], bytes]
+
+
+def _past_prefix(key: bytes, prefix: Optional[bytes]) -> bool:
+    return prefix is not None and not key.startswith(prefix) and key > prefix
+
+
+def iter_raw_state_pages(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    address: Union[Address, str],
+    prefix: Optional[bytes] = None,
+    start_key: Optional[bytes] = None,
+    page_limit: int = DEFAULT_STATE_PAGE_LIMIT,
+) -> Iterator[StatePage]:
+    """Stream the raw state of a contract page by page.
+
+    The next page is requested while the caller processes the current one, so at
+    most two pages are held in memory.
+
+    :param client: Ledger client
+    :param address: contract address
+    :param prefix: only stream the keys starting with this prefix, defaults to None
+    :param start_key: pagination key to resume from, defaults to the first key
+    :param page_limit: number of models requested per page
+    :yield: the models of each page and the key of the next page
+    """
+
+    def _fetch(key: bytes):
+        req = QueryAllContractStateRequest(
+            address=str(address), pagination=PageRequest(key=key, limit=page_limit)
+        )
+        return client.wasm.AllContractState(req)
+
+    # store keys are sorted, so a prefixed export starts at the prefix itself
+    key = start_key or prefix or b""
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(_fetch, key)
+        while future is not None:
+            resp = future.result()
+            next_key = bytes(resp.pagination.next_key)
+
+            models = list(resp.models)
+            if prefix is not None:
+                if models and _past_prefix(models[-1].key, prefix):
+                    next_key = b""
+                models = [m for m in models if m.key.startswith(prefix)]
+
+            future = executor.submit(_fetch, next_key) if next_key else None
+            yield models, next_key
+
+
+def iter_raw_state(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    address: Union[Address, str],
+    prefix: Optional[bytes] = None,
+    start_key: Optional[bytes] = None,
+    page_limit: int = DEFAULT_STATE_PAGE_LIMIT,
+) -> Iterator[Model]:
+    """Stream the raw state models of a contract.
+
+    :param client: Ledger client
+    :param address: contract address
+    :param prefix: only stream the keys starting with this prefix, defaults to None
+    :param start_key: pagination key to resume from, defaults to the first key
+    :param page_limit: number of models requested per page
+    :yield: raw state models in key order
+    """
+    for models, _ in iter_raw_state_pages(
+        client, address, prefix=prefix, start_key=start_key, page_limit=page_limit
+    ):
+        yield from models
+
+
+def dump_raw_state(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    address: Union[Address, str],
+    path: str,
+    prefix: Optional[bytes] = None,
+    page_limit: int = DEFAULT_STATE_PAGE_LIMIT,
+) -> int:
+    """Dump the raw state of a contract to a file.
+
+    The file starts with a magic header followed by length-prefixed key and value
+    pairs. A checkpoint file next to the dump records the offset and pagination key
+    of the last complete page: an interrupted dump is resumed from there when the
+    function is called again, and the checkpoint is removed once the dump completes.
+
+    :param client: Ledger client
+    :param address: contract address
+    :param path: path of the dump file
+    :param prefix: only dump the keys starting with this prefix, defaults to None
+    :param page_limit: number of models requested per page
+    :return: number of models written by this call
+    """
+    checkpoint_path = path + _CHECKPOINT_SUFFIX
+
+    start_key = None
+    offset = 0
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r", encoding="utf-8") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        start_key = bytes.fromhex(checkpoint["next_key"])
+        offset = checkpoint["offset"]
+
+    written = 0
+    with open(path, "r+b" if offset else "wb") as dump_file:
+        if offset:
+            # drop any partial page written after the checkpoint
+            dump_file.truncate(offset)
+            dump_file.seek(offset)
+        else:
+            dump_file.write(STATE_DUMP_MAGIC)
+
+        for models, next_key in iter_raw_state_pages(
+            client, address, prefix=prefix, start_key=start_key, page_limit=page_limit
+        ):
+            for model in models:
+                dump_file.write(_LENGTH.pack(len(model.key)))
+                dump_file.write(model.key)
+                dump_file.write(_LENGTH.pack(len(model.value)))
+                dump_file.write(model.value)
+            written += len(models)
+
+            if next_key:
+                dump_file.flush()
+                os.fsync(dump_file.fileno())
+                _write_checkpoint(checkpoint_path, dump_file.tell(), next_key)
+
+    if os.path.exists(checkpoint_path):
+        os.unlink(checkpoint_path)
+    return written
+
+
+def read_raw_state_dump(path: str) -> Iterator[Tuple[bytes, bytes]]:
+    """Read a raw state dump file.
+
+    :param path: path of the dump file
+    :raises RuntimeError: if the file is not a complete raw state dump
+    :yield: key and value of each model
+    """
+    with open(path, "rb") as dump_file:
+        if dump_file.read(len(STATE_DUMP_MAGIC)) != STATE_DUMP_MAGIC:
+            raise RuntimeError("Invalid raw state dump file")
+
+        while True:
+            header = dump_file.read(_LENGTH.size)
+            if not header:
+                return
+            key = _read_exact(dump_file, _LENGTH.unpack(header)[0])
+            value_length = _LENGTH.unpack(_read_exact(dump_file, _LENGTH.size))[0]
+            yield key, _read_exact(dump_file, value_length)
+
+
+def _read_exact(dump_file, size: int) -> bytes:
+    data = dump_file.read(size)
+    if len(data) != size:
+        raise RuntimeError("Truncated raw state dump file")
+    return data
+
+
+def _write_checkpoint(checkpoint_path: str, offset: int, next_key: bytes):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump({"offset": offset, "next_key": next_key.hex()}, checkpoint_file)
+    os.replace(tmp_path, checkpoint_path)
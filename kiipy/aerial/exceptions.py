@@ -76,3 +76,17 @@ class InsufficientFeesError(BroadcastError):
             tx_hash,
             f"Insufficient Fees (minimum required: {self.minimum_required_fee})",
         )
+
+
+class MessageSimulationError(RuntimeError):
+    """Simulation of a message failed on its own."""
+
+    def __init__(self, index: int, error: Exception):
+        """Init the message simulation error.
+
+        :param index: index of the failing message in the messages to broadcast
+        :param error: error raised by the simulation
+        """
+        super().__init__(f"Simulation of message {index} failed: {error}")
+        self.index = index
+        self.error = error
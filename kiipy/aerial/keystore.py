@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Encrypted keystore holding many wallet keys."""
+
+import hashlib
+import hmac
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+from Crypto.Cipher import AES  # type: ignore
+
+from kiipy.aerial.wallet import LocalWallet
+from kiipy.crypto.address import Address
+from kiipy.crypto.keypairs import PrivateKey
+
+
+KEYSTORE_MAGIC = b"KIIKEYS1"
+DEFAULT_KDF_LOG2_N = 15
+DEFAULT_KDF_R = 8
+DEFAULT_KDF_P = 1
+
+# header: magic, salt, kdf log2(n), kdf r, kdf p, slot count, key count, password check
+_HEADER = struct.Struct(">8s16sBBBxII16s12x")
+# slot: address, nonce, tag, encrypted private key
+_SLOT = struct.Struct(">20s12s16s32s")
+_EMPTY_ADDRESS = bytes(20)
+_PASSWORD_CHECK_CONTEXT = b"kiipy keystore password check"
+
+
+def _derive_master_key(
+    password: str, salt: bytes, log2_n: int, r: int, p: int
+) -> bytes:
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=1 << log2_n,
+        r=r,
+        p=p,
+        maxmem=256 * 1024 * 1024,
+        dklen=32,
+    )
+
+
+def _password_check(master_key: bytes) -> bytes:
+    return hmac.digest(master_key, _PASSWORD_CHECK_CONTEXT, "sha256")[:16]
+
+
+def _slot_count(num_keys: int) -> int:
+    # keep the table at most half full so that probe sequences stay short
+    slots = 1
+    while slots < num_keys * 2:
+        slots <<= 1
+    return slots
+
+
+def _slot_index(address: bytes, num_slots: int) -> int:
+    # addresses are hash outputs, so their leading bytes are already uniformly spread
+    return int.from_bytes(address[:8], byteorder="big") & (num_slots - 1)
+
+
+def _address_bytes(address: Union[Address, str, bytes]) -> bytes:
+    if isinstance(address, bytes):
+        return address
+    return bytes(Address(address))
+
+
+class Keystore:
+    """Encrypted keystore holding many wallet keys.
+
+    All keys are encrypted with AES-GCM under a single master key derived from the
+    password with scrypt, so opening the keystore costs one key derivation regardless
+    of the number of keys. The file is a memory-mapped open addressing table indexed
+    by address: a lookup touches a single slot on average and only the requested key
+    is decrypted. Decrypted keys are cached for the lifetime of the keystore.
+    """
+
+    def __init__(self, path: str, password: str):
+        """Open and unlock a keystore file.
+
+        :param path: path of the keystore file
+        :param password: keystore password
+        :raises RuntimeError: if the file is not a keystore or the password is invalid
+        """
+        with open(path, "rb") as keystore_file:
+            self._mmap = mmap.mmap(keystore_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER.size:
+            self._mmap.close()
+            raise RuntimeError("Invalid keystore file")
+
+        (
+            magic,
+            salt,
+            log2_n,
+            kdf_r,
+            kdf_p,
+            self._num_slots,
+            self._num_keys,
+            check,
+        ) = _HEADER.unpack_from(self._mmap, 0)
+        if (
+            magic != KEYSTORE_MAGIC
+            or len(self._mmap) != _HEADER.size + self._num_slots * _SLOT.size
+        ):
+            self._mmap.close()
+            raise RuntimeError("Invalid keystore file")
+
+        self._master_key = _derive_master_key(password, salt, log2_n, kdf_r, kdf_p)
+        if not hmac.compare_digest(_password_check(self._master_key), check):
+            self._mmap.close()
+            raise RuntimeError("Invalid keystore password")
+
+        self._cache: Dict[bytes, PrivateKey] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create(
+        path: str,
+        password: str,
+        private_keys: Iterable[PrivateKey],
+        kdf_log2_n: int = DEFAULT_KDF_LOG2_N,
+    ) -> "Keystore":
+        """Create a keystore file holding the given keys and open it.
+
+        An existing file at the same path is replaced atomically.
+
+        :param path: path of the keystore file
+        :param password: keystore password
+        :param private_keys: keys to store
+        :param kdf_log2_n: log2 of the scrypt cost parameter
+        :return: the unlocked keystore
+        """
+        keys = {bytes(Address(key.public_key)): key for key in private_keys}
+        num_slots = _slot_count(len(keys))
+
+        salt = os.urandom(16)
+        master_key = _derive_master_key(
+            password, salt, kdf_log2_n, DEFAULT_KDF_R, DEFAULT_KDF_P
+        )
+
+        table = bytearray(num_slots * _SLOT.size)
+        for address, key in keys.items():
+            index = _slot_index(address, num_slots)
+            while _SLOT.unpack_from(table, index * _SLOT.size)[0] != _EMPTY_ADDRESS:
+                index = (index + 1) & (num_slots - 1)
+
+            nonce = os.urandom(12)
+            cipher = AES.new(master_key, AES.MODE_GCM, nonce=nonce)
+            cipher.update(address)
+            ciphertext, tag = cipher.encrypt_and_digest(key.private_key_bytes)
+            _SLOT.pack_into(table, index * _SLOT.size, address, nonce, tag, ciphertext)
+
+        header = _HEADER.pack(
+            KEYSTORE_MAGIC,
+            salt,
+            kdf_log2_n,
+            DEFAULT_KDF_R,
+            DEFAULT_KDF_P,
+            num_slots,
+            len(keys),
+            _password_check(master_key),
+        )
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as keystore_file:
+            keystore_file.write(header)
+            keystore_file.write(table)
+        os.replace(tmp_path, path)
+
+        return Keystore(path, password)
+
+    def __len__(self) -> int:
+        """Get the number of keys in the keystore.
+
+        :return: number of keys
+        """
+        return self._num_keys
+
+    def __contains__(self, address: Union[Address, str, bytes]) -> bool:
+        """Check if the keystore holds the key of an address.
+
+        :param address: address
+        :return: True if the key is in the keystore
+        """
+        return self._find_slot(_address_bytes(address)) is not None
+
+    def addresses(self, prefix: Optional[str] = None) -> Iterator[Address]:
+        """Iterate over the addresses of the stored keys.
+
+        :param prefix: address prefix, defaults to None
+        :yield: address of each stored key
+        """
+        for index in range(self._num_slots):
+            offset = _HEADER.size + index * _SLOT.size
+            address = self._mmap[offset : offset + 20]  # noqa: E203
+            if address != _EMPTY_ADDRESS:
+                yield Address(address, prefix)
+
+    def private_key(self, address: Union[Address, str, bytes]) -> PrivateKey:
+        """Get the private key of an address, decrypting it on first use.
+
+        :param address: address
+        :raises KeyError: if the keystore does not hold the key of the address
+        :raises RuntimeError: if the stored key fails authentication
+        :return: private key
+        """
+        raw_address = _address_bytes(address)
+
+        key = self._cache.get(raw_address)
+        if key is not None:
+            return key
+
+        index = self._find_slot(raw_address)
+        if index is None:
+            raise KeyError(str(address))
+
+        _, nonce, tag, ciphertext = _SLOT.unpack_from(
+            self._mmap, _HEADER.size + index * _SLOT.size
+        )
+        cipher = AES.new(self._master_key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(raw_address)
+        try:
+            key = PrivateKey(cipher.decrypt_and_verify(ciphertext, tag))
+        except ValueError as error:
+            raise RuntimeError("Keystore entry failed authentication") from error
+
+        with self._lock:
+            self._cache[raw_address] = key
+        return key
+
+    def wallet(
+        self, address: Union[Address, str, bytes], prefix: Optional[str] = None
+    ) -> LocalWallet:
+        """Get the wallet of an address.
+
+        :param address: address
+        :param prefix: prefix, defaults to None
+        :return: local wallet
+        """
+        return LocalWallet(self.private_key(address), prefix=prefix)
+
+    def close(self):
+        """Close the keystore and drop the decrypted keys."""
+        with self._lock:
+            self._cache.clear()
+        self._mmap.close()
+
+    def __enter__(self) -> "Keystore":
+        """Enter the context.
+
+        :return: keystore
+        """
+        return self
+
+    def __exit__(self, *args):
+        """Close the keystore on context exit.
+
+        :param args: exception details
+        """
+        self.close()
+
+    def _find_slot(self, address: bytes) -> Optional[int]:
+        if len(address) != 20 or address == _EMPTY_ADDRESS:
+            return None
+
+        index = _slot_index(address, self._num_slots)
+        for _ in range(self._num_slots):
+            offset = _HEADER.size + index * _SLOT.size
+            slot_address = self._mmap[offset : offset + 20]  # noqa: E203
+            if slot_address == address:
+                return index
+            if slot_address == _EMPTY_ADDRESS:
+                return None
+            index = (index + 1) & (self._num_slots - 1)
+        return None
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Stake allocation and compounding period optimizer."""
+
+import math
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from kiipy.aerial.client.staking import (
+    ValidatorStatus,
+    create_delegate_msg,
+    create_redelegate_msg,
+)
+from kiipy.aerial.client.utils import get_paginated
+from kiipy.aerial.client.validators import ValidatorSetCache, ValidatorState
+from kiipy.crypto.address import Address
+from kiipy.crypto.hashfuncs import sha256
+from kiipy.protos.cosmos.slashing.v1beta1.query_pb2 import (
+    QueryParamsRequest,
+    QuerySigningInfosRequest,
+)
+from kiipy.slashing.rest_client import SlashingRestClient
+
+
+DEFAULT_MAX_VALIDATOR_SHARE = 0.25
+DEFAULT_MAX_POWER_SHARE = 0.10
+DEFAULT_MIN_UPTIME = 0.95
+_PERIOD_GRID_POINTS = 64
+
+
+def total_reward(
+    period: int, fee: float, stake: float, rate: float, duration: int
+) -> float:
+    """Get the final stake when compounding the rewards every period.
+
+    :param period: compounding period
+    :param fee: fee paid at each compounding
+    :param stake: initial stake
+    :param rate: reward rate per unit of time
+    :param duration: total staking duration, in the same unit as the period
+    :return: final stake
+    """
+    growth = math.exp(duration / period * math.log1p(rate * period))
+    return stake * growth + (1 - growth) / (rate * period) * fee
+
+
+def optimal_compounding_period(
+    fee: float, stake: float, rate: float, duration: int
+) -> int:
+    """Find the compounding period maximising the final stake.
+
+    The final stake is unimodal in the period: a geometric grid brackets the optimum,
+    which is then located by a ternary search over the integers of the bracket. This
+    costs about a hundred evaluations whatever the duration.
+
+    :param fee: fee paid at each compounding
+    :param stake: initial stake
+    :param rate: reward rate per unit of time
+    :param duration: total staking duration
+    :return: optimal period, the whole duration when there is no reward
+    """
+    if rate <= 0 or duration <= 2:
+        return max(1, duration)
+
+    def value(period: int) -> float:
+        return total_reward(period, fee, stake, rate, duration)
+
+    upper = duration - 1
+    ratio = upper ** (1 / (_PERIOD_GRID_POINTS - 1))
+    grid = sorted({min(upper, round(ratio**i)) for i in range(_PERIOD_GRID_POINTS)})
+    best = max(range(len(grid)), key=lambda i: value(grid[i]))
+
+    low = grid[max(best - 1, 0)]
+    high = grid[min(best + 1, len(grid) - 1)]
+    while high - low > 2:
+        third = (high - low) // 3
+        if value(low + third) < value(high - third):
+            low += third + 1
+        else:
+            high -= third
+    return max(range(low, high + 1), key=value)
+
+
+def estimate_reward_rate(
+    total_supply: float,
+    inflation: float,
+    community_tax: float,
+    bonded_tokens: float,
+    periods_per_year: float,
+) -> float:
+    """Estimate the staking reward rate per period before commission.
+
+    :param total_supply: total supply of the staking token
+    :param inflation: annual inflation rate
+    :param community_tax: community tax rate
+    :param bonded_tokens: total bonded tokens
+    :param periods_per_year: number of periods per year, e.g. minutes per year
+    :return: reward per staked token and period
+    """
+    annual = inflation * total_supply * (1 - community_tax) / bonded_tokens
+    return annual / periods_per_year
+
+
+@dataclass(frozen=True)
+class ValidatorCandidate:
+    """Validator considered for delegation."""
+
+    address: Address
+    tokens: int
+    commission: float
+    uptime: float = 1.0
+    jailed: bool = False
+
+    @property
+    def reward_factor(self) -> float:
+        """Get the fraction of the base reward rate earned with the validator.
+
+        :return: reward factor
+        """
+        return (1 - self.commission) * self.uptime
+
+
+@dataclass
+class DelegatorPosition:
+    """Stake of a delegator to allocate."""
+
+    address: Address
+    # amount available for new delegations, fees must already be set aside
+    liquid: int
+    # current delegations by validator operator address
+    delegations: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class StakePlan:
+    """Allocation of a delegator stake and the messages to reach it."""
+
+    delegator: Address
+    allocations: Dict[str, int]
+    compounding_period: int
+    final_stake: float
+    msgs: List[Any]
+
+
+def _consensus_address(state: ValidatorState) -> bytes:
+    return sha256(state.consensus_pubkey)[:20]
+
+
+def query_uptimes(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+) -> Dict[bytes, float]:
+    """Query the uptime of the validators over the slashing window.
+
+    :param client: Ledger client
+    :return: uptime by consensus address bytes
+    """
+    if isinstance(client.slashing, SlashingRestClient):
+        params = client.slashing.Params().params
+    else:
+        params = client.slashing.Params(QueryParamsRequest()).params
+    window = int(params.signed_blocks_window)
+
+    uptimes: Dict[bytes, float] = {}
+    for resp in get_paginated(
+        QuerySigningInfosRequest(), client.slashing.SigningInfos, per_page_limit=500
+    ):
+        for info in resp.info:
+            missed = int(info.missed_blocks_counter)
+            uptime = 1.0 - missed / window if window else 1.0
+            uptimes[bytes(Address(info.address))] = 0.0 if info.tombstoned else uptime
+    return uptimes
+
+
+def candidates_from_snapshot(
+    validators: Iterable[ValidatorState], uptimes: Optional[Dict[bytes, float]] = None
+) -> List[ValidatorCandidate]:
+    """Build the candidates from a validator set snapshot.
+
+    :param validators: validator states
+    :param uptimes: uptime by consensus address bytes, defaults to full uptime
+    :return: candidates
+    """
+    return [
+        ValidatorCandidate(
+            address=state.address,
+            tokens=state.tokens,
+            commission=state.commission_rate,
+            uptime=(uptimes or {}).get(_consensus_address(state), 1.0),
+            jailed=state.jailed or state.status != ValidatorStatus.BONDED,
+        )
+        for state in validators
+    ]
+
+
+def query_candidates(
+    client: "LedgerClient",  # type: ignore # noqa: F821
+    cache: Optional[ValidatorSetCache] = None,
+) -> List[ValidatorCandidate]:
+    """Query the validators and their uptimes.
+
+    :param client: Ledger client
+    :param cache: validator set cache to read the validators from, refreshed if due
+    :return: candidates
+    """
+    if cache is None:
+        cache = ValidatorSetCache(client)
+    cache.refresh()
+    return candidates_from_snapshot(cache.validators(), query_uptimes(client))
+
+
+class StakeOptimizer:
+    """Allocate the stake of many delegators across validators.
+
+    The candidates are filtered and ranked once per run, by decreasing share of the
+    reward kept after commission and downtime and, among equals, by increasing voting
+    power. Each delegator stake is then spread over the best candidates with at most
+    ``max_validator_share`` of it per validator, and its compounding period is
+    optimised for the resulting reward rate.
+    """
+
+    def __init__(
+        self,
+        candidates: Iterable[ValidatorCandidate],
+        reward_rate: float,
+        fee: float,
+        duration: int,
+        denom: str,
+        max_validator_share: float = DEFAULT_MAX_VALIDATOR_SHARE,
+        max_power_share: float = DEFAULT_MAX_POWER_SHARE,
+        min_uptime: float = DEFAULT_MIN_UPTIME,
+    ):
+        """Init the optimizer.
+
+        :param candidates: validators considered for delegation
+        :param reward_rate: base reward rate per period, see estimate_reward_rate
+        :param fee: fee paid to claim and delegate the rewards
+        :param duration: staking duration, in periods
+        :param denom: staking denomination
+        :param max_validator_share: maximum fraction of a stake on one validator
+        :param max_power_share: skip validators with more of the bonded tokens
+        :param min_uptime: skip validators with a lower uptime
+        :raises RuntimeError: if no candidate is eligible
+        """
+        candidates = list(candidates)
+        bonded = sum(c.tokens for c in candidates if not c.jailed) or 1
+        self._ranked: List[ValidatorCandidate] = sorted(
+            (
+                c
+                for c in candidates
+                if not c.jailed
+                and c.uptime >= min_uptime
+                and c.tokens / bonded <= max_power_share
+            ),
+            key=lambda c: (-c.reward_factor, c.tokens),
+        )
+        if not self._ranked:
+            raise RuntimeError("No eligible validator")
+        # bech32 encoding dominates the planning of small stakes, do it once per run
+        self._addresses: Dict[str, Address] = {
+            str(c.address): c.address for c in self._ranked
+        }
+        self._keys = list(self._addresses)
+
+        self._reward_rate = reward_rate
+        self._fee = fee
+        self._duration = duration
+        self._denom = denom
+        # exact share, a float product would overshoot the cap of large stakes
+        self._max_validator_share = Fraction(str(max_validator_share))
+
+    @property
+    def ranked(self) -> List[ValidatorCandidate]:
+        """Get the eligible candidates, best first.
+
+        :return: candidates
+        """
+        return list(self._ranked)
+
+    def allocate(self, stake: int) -> List[Tuple[ValidatorCandidate, int]]:
+        """Spread a stake over the best candidates.
+
+        Each validator receives at most the maximum validator share of the stake,
+        rounded down. What the eligible validators can not hold stays unallocated.
+
+        :param stake: amount to allocate
+        :return: (validator, amount) pairs, best validator first
+        """
+        cap = math.floor(stake * self._max_validator_share)
+
+        allocations = []
+        remaining = stake
+        for candidate in self._ranked:
+            if remaining <= 0 or cap <= 0:
+                break
+            amount = min(cap, remaining)
+            allocations.append((candidate, amount))
+            remaining -= amount
+        return allocations
+
+    def plan(self, position: DelegatorPosition) -> StakePlan:
+        """Plan the allocation of a delegator stake.
+
+        :param position: delegator stake
+        :return: stake plan
+        """
+        stake = position.liquid + sum(position.delegations.values())
+        allocations = self.allocate(stake)
+        targets = {key: amount for key, (_, amount) in zip(self._keys, allocations)}
+
+        rate = self._reward_rate
+        if stake > 0:
+            rate *= sum(c.reward_factor * amount for c, amount in allocations) / stake
+        period = optimal_compounding_period(self._fee, stake, rate, self._duration)
+        final_stake = (
+            total_reward(period, self._fee, stake, rate, self._duration)
+            if rate > 0 and period < self._duration
+            else float(stake)
+        )
+
+        return StakePlan(
+            delegator=position.address,
+            allocations=targets,
+            compounding_period=period,
+            final_stake=final_stake,
+            msgs=self._msgs(position, targets),
+        )
+
+    def plan_many(self, positions: Iterable[DelegatorPosition]) -> List[StakePlan]:
+        """Plan the allocation of the stake of many delegators.
+
+        :param positions: delegator stakes
+        :return: stake plans in the order of the positions
+        """
+        return [self.plan(position) for position in positions]
+
+    def _msgs(self, position: DelegatorPosition, targets: Dict[str, int]) -> List[Any]:
+        surplus = [
+            [validator, amount - targets.get(validator, 0)]
+            for validator, amount in position.delegations.items()
+            if amount > targets.get(validator, 0)
+        ]
+        deficit = [
+            [validator, target - position.delegations.get(validator, 0)]
+            for validator, target in targets.items()
+            if target > position.delegations.get(validator, 0)
+        ]
+
+        # move the surplus delegations first, then delegate the liquid stake
+        msgs: List[Any] = []
+        src = 0
+        for entry in deficit:
+            validator = entry[0]
+            while entry[1] > 0 and src < len(surplus):
+                amount = min(entry[1], surplus[src][1])
+                msgs.append(
+                    create_redelegate_msg(
+                        position.address,
+                        self._address(surplus[src][0]),
+                        self._addresses[validator],
+                        amount,
+                        self._denom,
+                    )
+                )
+                entry[1] -= amount
+                surplus[src][1] -= amount
+                if surplus[src][1] == 0:
+                    src += 1
+            if entry[1] > 0:
+                msgs.append(
+                    create_delegate_msg(
+                        position.address,
+                        self._addresses[validator],
+                        entry[1],
+                        self._denom,
+                    )
+                )
+        return msgs
+
+    def _address(self, validator: str) -> Address:
+        address = self._addresses.get(validator)
+        if address is None:
+            address = self._addresses[validator] = Address(validator)
+        return address
@@ -19,13 +19,22 @@
 
 """Transaction."""
 
+import functools
+import importlib
+import pkgutil
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
 from typing import Any, List, Optional, Union
 
+from google.protobuf import symbol_database
 from google.protobuf.any_pb2 import Any as ProtoAny
 
+import kiipy.protos
 from kiipy.aerial.coins import parse_coins
+from kiipy.crypto.address import Address
+from kiipy.crypto.hashfuncs import ripemd160, sha256
 from kiipy.crypto.interface import Signer
 from kiipy.crypto.keypairs import PublicKey
 from kiipy.protos.cosmos.crypto.secp256k1.keys_pb2 import PubKey as ProtoPubKey
@@ -38,9 +47,13 @@ from kiipy.protos.cosmos.tx.v1beta1.tx_pb2 import (
     SignerInfo,
     Tx,
     TxBody,
+    TxRaw,
 )
 
 
+DEFAULT_DECODED_TX_CACHE_SIZE = 4096
+
+
 class TxState(Enum):
     """Transaction state.
 
@@ -268,3 +281,182 @@ class Transaction:
         """
         self._state = TxState.Final
         return self
+
+
+@functools.lru_cache(maxsize=None)
+def _load_bundled_protos() -> int:
+    # registers every bundled message type in the default descriptor pool
+    loaded = 0
+    for module in pkgutil.walk_packages(
+        kiipy.protos.__path__, kiipy.protos.__name__ + "."
+    ):
+        if not module.name.endswith("_pb2"):
+            continue
+        try:
+            importlib.import_module(module.name)
+            loaded += 1
+        except TypeError:
+            # a few bundled files duplicate definitions that are already registered
+            continue
+    return loaded
+
+
+def message_class(type_url: str) -> Optional[Any]:
+    """Resolve the message class of an Any type URL from the bundled protos.
+
+    :param type_url: type URL, e.g. /cosmos.bank.v1beta1.MsgSend
+    :return: message class, None if the type is unknown
+    """
+    full_name = type_url.rsplit("/", 1)[-1]
+    database = symbol_database.Default()
+    try:
+        return database.GetSymbol(full_name)
+    except KeyError:
+        _load_bundled_protos()
+    try:
+        return database.GetSymbol(full_name)
+    except KeyError:
+        return None
+
+
+def unpack_any(value: ProtoAny) -> Any:
+    """Unpack an Any message using the bundled protos.
+
+    :param value: Any message
+    :return: unpacked message, the Any itself if its type is unknown
+    """
+    cls = message_class(value.type_url)
+    if cls is None:
+        return value
+    msg = cls()
+    msg.ParseFromString(value.value)
+    return msg
+
+
+def encode_tx(tx: Tx) -> bytes:
+    """Encode a transaction into its TxRaw wire bytes.
+
+    :param tx: transaction
+    :return: transaction bytes as broadcast and stored in blocks
+    """
+    return TxRaw(
+        body_bytes=tx.body.SerializeToString(),
+        auth_info_bytes=tx.auth_info.SerializeToString(),
+        signatures=tx.signatures,
+    ).SerializeToString()
+
+
+@dataclass
+class DecodedTx:
+    """Transaction decoded from its raw bytes."""
+
+    hash: str
+    body: TxBody
+    auth_info: AuthInfo
+    signatures: List[bytes]
+    messages: List[Any]
+    signers: List[Optional[Address]]
+
+    @property
+    def memo(self) -> str:
+        """Get the transaction memo.
+
+        :return: memo
+        """
+        return self.body.memo
+
+
+def _signer_address(
+    signer_info: SignerInfo, prefix: Optional[str]
+) -> Optional[Address]:
+    public_key = unpack_any(signer_info.public_key)
+    if not isinstance(public_key, ProtoPubKey):
+        return None
+    # same derivation as Address(PublicKey(...)) without parsing the curve point
+    return Address(ripemd160(sha256(public_key.key)), prefix)
+
+
+def decode_tx(
+    tx_bytes: bytes, prefix: Optional[str] = None, tx_hash: Optional[str] = None
+) -> DecodedTx:
+    """Decode raw transaction bytes, e.g. from block.data.txs, without a node.
+
+    :param tx_bytes: TxRaw bytes
+    :param prefix: address prefix of the signers, defaults to None
+    :param tx_hash: precomputed upper case hex hash of the bytes, defaults to hashing them
+    :return: decoded transaction
+    """
+    tx_bytes = bytes(tx_bytes)
+    if tx_hash is None:
+        tx_hash = sha256(tx_bytes).hex().upper()
+    return _decode_tx(tx_bytes, prefix, tx_hash)
+
+
+def _decode_tx(tx_bytes: bytes, prefix: Optional[str], tx_hash: str) -> DecodedTx:
+    tx_raw = TxRaw()
+    tx_raw.ParseFromString(tx_bytes)
+
+    body = TxBody()
+    body.ParseFromString(tx_raw.body_bytes)
+    auth_info = AuthInfo()
+    auth_info.ParseFromString(tx_raw.auth_info_bytes)
+
+    return DecodedTx(
+        hash=tx_hash,
+        body=body,
+        auth_info=auth_info,
+        signatures=list(tx_raw.signatures),
+        messages=[unpack_any(msg) for msg in body.messages],
+        signers=[_signer_address(info, prefix) for info in auth_info.signer_infos],
+    )
+
+
+class TxDecoder:
+    """Transaction decoder with an LRU cache of decoded transactions keyed by hash.
+
+    Decoded transactions are shared between callers and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        prefix: Optional[str] = None,
+        max_entries: int = DEFAULT_DECODED_TX_CACHE_SIZE,
+    ):
+        """Init the transaction decoder.
+
+        :param prefix: address prefix of the signers, defaults to None
+        :param max_entries: maximum number of cached transactions
+        """
+        self._prefix = prefix
+        self._max_entries = max_entries
+        self._cache: "OrderedDict[str, DecodedTx]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, tx_bytes: bytes) -> DecodedTx:
+        """Decode raw transaction bytes, reusing the cached result of the same hash.
+
+        :param tx_bytes: TxRaw bytes
+        :return: decoded transaction
+        """
+        tx_hash = sha256(bytes(tx_bytes)).hex().upper()
+        with self._lock:
+            decoded = self._cache.get(tx_hash)
+            if decoded is not None:
+                self._cache.move_to_end(tx_hash)
+                return decoded
+
+        decoded = _decode_tx(bytes(tx_bytes), self._prefix, tx_hash)
+        with self._lock:
+            self._cache[tx_hash] = decoded
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+        return decoded
+
+    def get(self, tx_hash: str) -> Optional[DecodedTx]:
+        """Get a cached decoded transaction by hash.
+
+        :param tx_hash: transaction hash
+        :return: decoded transaction, None if not cached
+        """
+        with self._lock:
+            return self._cache.get(tx_hash.upper())
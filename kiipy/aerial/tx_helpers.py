@@ -20,9 +20,23 @@
 """Transaction helpers."""
 
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from dateutil.parser import isoparse
 
 from kiipy.aerial.exceptions import BroadcastError, InsufficientFeesError, OutOfGasError
 from kiipy.crypto.address import Address
@@ -37,6 +51,161 @@ class MessageLog:
     events: Dict[str, Dict[str, str]]
 
 
+@dataclass
+class TxEvent:
+    """Transaction event, with its attributes in emission order."""
+
+    type: str
+    attributes: List[Tuple[str, str]]
+
+    def get(self, key: str) -> Optional[str]:
+        """Get the first value of an attribute.
+
+        :param key: attribute key
+        :return: attribute value, None if the event has no such attribute
+        """
+        for attribute_key, value in self.attributes:
+            if attribute_key == key:
+                return value
+        return None
+
+
+TxEventT = TypeVar("TxEventT", bound=TxEvent)
+
+
+def tx_response_events(tx_response: Any) -> Sequence[Any]:
+    """Get the events of a transaction response protobuf.
+
+    Chains emitting per message logs may leave the top level events empty, the
+    events of the message logs are returned instead.
+
+    :param tx_response: transaction response protobuf
+    :return: protobuf events in emission order
+    """
+    if len(tx_response.events) > 0:
+        return tx_response.events
+    return [event for log in tx_response.logs for event in log.events]
+
+
+def group_event_rows(
+    rows: Iterable[Sequence[Any]], make_event: Callable[..., TxEventT]
+) -> List[TxEventT]:
+    """Group joined event and attribute rows into events.
+
+    Each row holds the columns of an event followed by the key and value of one of
+    its attributes, both None for an event without attributes. The rows of an event
+    must be consecutive and ordered by attribute.
+
+    :param rows: event and attribute rows
+    :param make_event: builds an event, with no attributes, from the event columns
+    :return: events in the order of the rows
+    """
+    events: List[TxEventT] = []
+    last_columns: Optional[Sequence[Any]] = None
+    for row in rows:
+        columns, key, value = row[:-2], row[-2], row[-1]
+        if columns != last_columns:
+            events.append(make_event(*columns))
+            last_columns = columns
+        if key is not None:
+            events[-1].attributes.append((key, value))
+    return events
+
+
+class TxEvents:
+    """Ordered list of transaction events with lookup by type and attribute key."""
+
+    def __init__(self, events: List[TxEvent]):
+        """Init the transaction events.
+
+        :param events: events in emission order
+        """
+        self._events = events
+        self._index: Optional[Dict[Tuple[str, str], List[str]]] = None
+
+    @staticmethod
+    def from_proto(events: Any) -> "TxEvents":
+        """Build the transaction events from protobuf events.
+
+        :param events: protobuf events
+        :return: transaction events
+        """
+        return TxEvents(
+            [
+                TxEvent(
+                    type=str(event.type),
+                    attributes=[(str(a.key), str(a.value)) for a in event.attributes],
+                )
+                for event in events
+            ]
+        )
+
+    def __len__(self) -> int:
+        """Get the number of events.
+
+        :return: number of events
+        """
+        return len(self._events)
+
+    def __iter__(self) -> Iterator[TxEvent]:
+        """Iterate over the events in emission order.
+
+        :return: iterator over the events
+        """
+        return iter(self._events)
+
+    def __getitem__(self, index: int) -> TxEvent:
+        """Get an event by position.
+
+        :param index: position of the event
+        :return: event
+        """
+        return self._events[index]
+
+    def of_type(self, event_type: str) -> List[TxEvent]:
+        """Get all the events of a type.
+
+        :param event_type: event type
+        :return: events of the type in emission order
+        """
+        return [event for event in self._events if event.type == event_type]
+
+    def get(self, event_type: str, key: str) -> Optional[str]:
+        """Get the first value of an attribute of an event type.
+
+        :param event_type: event type
+        :param key: attribute key
+        :return: attribute value, None if not found
+        """
+        values = self.get_all(event_type, key)
+        return values[0] if values else None
+
+    def get_all(self, event_type: str, key: str) -> List[str]:
+        """Get all the values of an attribute of an event type.
+
+        :param event_type: event type
+        :param key: attribute key
+        :return: attribute values in emission order
+        """
+        if self._index is None:
+            index: Dict[Tuple[str, str], List[str]] = {}
+            for event in self._events:
+                for attribute_key, value in event.attributes:
+                    index.setdefault((event.type, attribute_key), []).append(value)
+            self._index = index
+        return list(self._index.get((event_type, key), []))
+
+    def as_dict(self) -> Dict[str, Dict[str, str]]:
+        """Get the events merged by type, the last value of each attribute winning.
+
+        :return: events dict
+        """
+        merged: Dict[str, Dict[str, str]] = {}
+        for event in self._events:
+            merged.setdefault(event.type, {}).update(event.attributes)
+        return merged
+
+
 @dataclass
 class TxResponse:
     """Transaction response.
@@ -55,6 +224,43 @@ class TxResponse:
     logs: List[MessageLog]
     events: Dict[str, Dict[str, str]]
     timestamp: Optional[datetime]
+    # raw response the logs, events and timestamp are decoded from, if any
+    proto: Optional[Any] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_proto(cls, tx_response: Any) -> "TxResponse":
+        """Build a transaction response decoding its logs and events lazily.
+
+        Only the scalar fields are read up front. The logs, events and timestamp are
+        decoded from the protobuf on first access.
+
+        :param tx_response: transaction response protobuf
+        :return: transaction response
+        """
+        response = cls.__new__(cls)
+        response.hash = str(tx_response.txhash)
+        response.height = int(tx_response.height)
+        response.code = int(tx_response.code)
+        response.gas_wanted = int(tx_response.gas_wanted)
+        response.gas_used = int(tx_response.gas_used)
+        response.raw_log = str(tx_response.raw_log)
+        response.proto = tx_response
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        """Decode a field left undecoded by :meth:`from_proto`.
+
+        :param name: attribute name
+        :raises AttributeError: if the attribute is not a lazily decoded field
+        :return: decoded value, cached on the instance
+        """
+        decode = _LAZY_FIELDS.get(name)
+        proto = self.__dict__.get("proto")
+        if decode is None or proto is None:
+            raise AttributeError(name)
+        value = decode(proto)
+        self.__dict__[name] = value
+        return value
 
     def is_successful(self) -> bool:
         """Check transaction is successful.
@@ -92,6 +298,104 @@ class TxResponse:
                 raise InsufficientFeesError(self.hash, required_fee)
             raise BroadcastError(self.hash, self.raw_log)
 
+    @property
+    def tx_events(self) -> TxEvents:
+        """Get the transaction events, every instance and attribute in order.
+
+        Responses built from a protobuf keep every event, others rebuild them from
+        the merged events dict.
+
+        :return: transaction events
+        """
+        tx_events = self.__dict__.get("_tx_events")
+        if tx_events is None:
+            if self.proto is not None:
+                tx_events = TxEvents.from_proto(tx_response_events(self.proto))
+            else:
+                tx_events = TxEvents(
+                    [
+                        TxEvent(type=event_type, attributes=list(attributes.items()))
+                        for event_type, attributes in self.events.items()
+                    ]
+                )
+            self.__dict__["_tx_events"] = tx_events
+        return tx_events
+
+    def message_events(self, msg_index: int) -> TxEvents:
+        """Get the events of a message.
+
+        Events tagged with a ``msg_index`` attribute are selected from the
+        transaction events, chains that do not tag their events fall back to the
+        message logs.
+
+        :param msg_index: index of the message in the transaction
+        :return: message events, empty if the chain reports neither
+        """
+        tagged = [
+            event for event in self.tx_events if event.get("msg_index") is not None
+        ]
+        if tagged:
+            return TxEvents(
+                [event for event in tagged if event.get("msg_index") == str(msg_index)]
+            )
+
+        if self.proto is not None:
+            message_events = self.__dict__.get("_message_events")
+            if message_events is None:
+                message_events = {
+                    int(log.msg_index): TxEvents.from_proto(log.events)
+                    for log in self.proto.logs
+                }
+                self.__dict__["_message_events"] = message_events
+            return message_events.get(msg_index, TxEvents([]))
+
+        for message_log in self.logs:
+            if message_log.index == msg_index:
+                return TxEvents(
+                    [
+                        TxEvent(type=event_type, attributes=list(attributes.items()))
+                        for event_type, attributes in message_log.events.items()
+                    ]
+                )
+        return TxEvents([])
+
+
+def _merge_proto_events(events: Any) -> Dict[str, Dict[str, str]]:
+    merged: Dict[str, Dict[str, str]] = {}
+    for event in events:
+        attributes = merged.setdefault(event.type, {})
+        for attribute in event.attributes:
+            attributes[attribute.key] = attribute.value
+    return merged
+
+
+def _decode_logs(tx_response: Any) -> List[MessageLog]:
+    return [
+        MessageLog(
+            index=int(log.msg_index),
+            log=log.msg_index,
+            events=_merge_proto_events(log.events),
+        )
+        for log in tx_response.logs
+    ]
+
+
+def _decode_events(tx_response: Any) -> Dict[str, Dict[str, str]]:
+    return _merge_proto_events(tx_response.events)
+
+
+def _decode_timestamp(tx_response: Any) -> Optional[datetime]:
+    if not tx_response.timestamp:
+        return None
+    return isoparse(tx_response.timestamp)
+
+
+_LAZY_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "logs": _decode_logs,
+    "events": _decode_events,
+    "timestamp": _decode_timestamp,
+}
+
 
 class SubmittedTx:
     """Submitted transaction."""
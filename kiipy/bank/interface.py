@@ -28,6 +28,8 @@ from kiipy.protos.cosmos.bank.v1beta1.query_pb2 import (
     QueryBalanceResponse,
     QueryDenomMetadataRequest,
     QueryDenomMetadataResponse,
+    QueryDenomOwnersRequest,
+    QueryDenomOwnersResponse,
     QueryDenomsMetadataRequest,
     QueryDenomsMetadataResponse,
     QueryParamsRequest,
@@ -115,3 +117,13 @@ class Bank(ABC):
 
         :return: QueryDenomsMetadataResponse
         """
+
+    @abstractmethod
+    def DenomOwners(self, request: QueryDenomOwnersRequest) -> QueryDenomOwnersResponse:
+        """
+        Query the accounts holding a given coin denomination.
+
+        :param request: QueryDenomOwnersRequest with denomination
+
+        :return: QueryDenomOwnersResponse
+        """
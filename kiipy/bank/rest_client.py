@@ -19,10 +19,12 @@
 
 """Implementation of Bank interface using REST."""
 
+from typing import Optional, Sequence, Tuple
+
 from google.protobuf.json_format import Parse
 
 from kiipy.bank.interface import Bank
-from kiipy.common.rest_client import RestClient
+from kiipy.common.rest_client import RestClient, metadata_to_headers
 from kiipy.protos.cosmos.bank.v1beta1.query_pb2 import (
     QueryAllBalancesRequest,
     QueryAllBalancesResponse,
@@ -30,6 +32,8 @@ from kiipy.protos.cosmos.bank.v1beta1.query_pb2 import (
     QueryBalanceResponse,
     QueryDenomMetadataRequest,
     QueryDenomMetadataResponse,
+    QueryDenomOwnersRequest,
+    QueryDenomOwnersResponse,
     QueryDenomsMetadataRequest,
     QueryDenomsMetadataResponse,
     QueryParamsRequest,
@@ -54,11 +58,16 @@ class BankRestClient(Bank):
         """
         self._rest_api = rest_api
 
-    def Balance(self, request: QueryBalanceRequest) -> QueryBalanceResponse:
+    def Balance(
+        self,
+        request: QueryBalanceRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> QueryBalanceResponse:
         """
         Query balance of selected denomination from specific account.
 
         :param request: QueryBalanceRequest with address and denomination
+        :param metadata: optional call metadata, e.g. the block height to query at
 
         :return: QueryBalanceResponse
         """
@@ -66,6 +75,7 @@ class BankRestClient(Bank):
             f"{self.API_URL}/balances/{request.address}/by_denom?denom={request.denom}",
             request,
             ["address", "denom"],
+            headers=metadata_to_headers(metadata),
         )
         return Parse(response, QueryBalanceResponse())
 
@@ -140,3 +150,24 @@ class BankRestClient(Bank):
         """
         response = self._rest_api.get(f"{self.API_URL}/denoms_metadata", request)
         return Parse(response, QueryDenomsMetadataResponse())
+
+    def DenomOwners(
+        self,
+        request: QueryDenomOwnersRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> QueryDenomOwnersResponse:
+        """
+        Query the accounts holding a given coin denomination.
+
+        :param request: QueryDenomOwnersRequest with denomination
+        :param metadata: optional call metadata, e.g. the block height to query at
+
+        :return: QueryDenomOwnersResponse
+        """
+        response = self._rest_api.get(
+            f"{self.API_URL}/denom_owners/{request.denom}",
+            request,
+            ["denom"],
+            headers=metadata_to_headers(metadata),
+        )
+        return Parse(response, QueryDenomOwnersResponse())
@@ -20,7 +20,7 @@
 """Implementation of REST api client."""
 import base64
 import json
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 from urllib.parse import urlencode
 
 import requests
@@ -28,6 +28,19 @@ from google.protobuf.json_format import MessageToDict
 from google.protobuf.message import Message
 
 
+def metadata_to_headers(
+    metadata: Optional[Sequence[Tuple[str, str]]]
+) -> Optional[Dict[str, str]]:
+    """
+    Convert gRPC style call metadata to REST request headers.
+
+    :param metadata: Sequence of (key, value) metadata pairs
+
+    :return: Headers dict or None when there is no metadata
+    """
+    return dict(metadata) if metadata else None
+
+
 class RestClient:
     """REST api client."""
 
@@ -45,6 +58,7 @@ class RestClient:
         url_base_path: str,
         request: Optional[Message] = None,
         used_params: Optional[List[str]] = None,
+        headers: Optional[Dict[str, str]] = None,
     ) -> bytes:
         """
         Send a GET request.
@@ -52,6 +66,7 @@ class RestClient:
         :param url_base_path: URL base path
         :param request: Protobuf coded request
         :param used_params: Parameters to be removed from request after converting it to dict
+        :param headers: Optional extra request headers
 
         :raises RuntimeError: if response code is not 200
 
@@ -61,7 +76,10 @@ class RestClient:
             url_base_path=url_base_path, request=request, used_params=used_params
         )
 
-        response = self._session.get(url=url)
+        if headers:
+            response = self._session.get(url=url, headers=headers)
+        else:
+            response = self._session.get(url=url)
         if response.status_code != 200:
             raise RuntimeError(
                 f"Error when sending a GET request.\n Response: {response.status_code}, {str(response.content)})"
@@ -20,6 +20,7 @@
 """Interface for the Wasm functionality of CosmosSDK."""
 
 from abc import ABC, abstractmethod
+from typing import Optional, Sequence, Tuple
 
 from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import (
     QueryAllContractStateRequest,
@@ -94,24 +95,30 @@ class CosmWasm(ABC):
 
     @abstractmethod
     def RawContractState(
-        self, request: QueryRawContractStateRequest
+        self,
+        request: QueryRawContractStateRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
     ) -> QueryRawContractStateResponse:
         """
         Get single key from the raw store data of a contract.
 
         :param request: QueryRawContractStateRequest
+        :param metadata: optional call metadata, e.g. the block height to query at
 
         :return: QueryRawContractStateResponse
         """
 
     @abstractmethod
     def SmartContractState(
-        self, request: QuerySmartContractStateRequest
+        self,
+        request: QuerySmartContractStateRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
     ) -> QuerySmartContractStateResponse:
         """
         Get smart query result from the contract.
 
         :param request: QuerySmartContractStateRequest
+        :param metadata: optional call metadata, e.g. the block height to query at
 
         :return: QuerySmartContractStateResponse
         """
@@ -21,10 +21,11 @@
 
 import base64
 import json
+from typing import Optional, Sequence, Tuple
 
 from google.protobuf.json_format import Parse, ParseDict
 
-from kiipy.common.rest_client import RestClient
+from kiipy.common.rest_client import RestClient, metadata_to_headers
 from kiipy.common.types import JSONLike
 from kiipy.common.utils import json_encode
 from kiipy.cosmwasm.interface import CosmWasm
@@ -126,12 +127,15 @@ class CosmWasmRestClient(CosmWasm):
         return Parse(response, QueryAllContractStateResponse())
 
     def RawContractState(
-        self, request: QueryRawContractStateRequest
+        self,
+        request: QueryRawContractStateRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
     ) -> QueryRawContractStateResponse:
         """
         Get single key from the raw store data of a contract.
 
         :param request: QueryRawContractStateRequest
+        :param metadata: optional call metadata, e.g. the block height to query at
 
         :return: QueryRawContractStateResponse
         """
@@ -142,31 +146,61 @@ class CosmWasmRestClient(CosmWasm):
             f"{self.API_URL}/contract/{request.address}/raw/{query_data}",
             request,
             ["address", "queryData"],
+            headers=metadata_to_headers(metadata),
         )
 
-        return ParseDict(
-            self._fix_state_response(response), QueryRawContractStateResponse()
+        return QueryRawContractStateResponse(
+            data=json_encode(json.loads(response)["data"]).encode("UTF8")
         )
 
     def SmartContractState(
-        self, request: QuerySmartContractStateRequest
+        self,
+        request: QuerySmartContractStateRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
     ) -> QuerySmartContractStateResponse:
         """
         Get smart query result from the contract.
 
         :param request: QuerySmartContractStateRequest
+        :param metadata: optional call metadata, e.g. the block height to query at
 
         :return: QuerySmartContractStateResponse
         """
+        response = self._smart_query(request, metadata)
+
+        return QuerySmartContractStateResponse(
+            data=json_encode(json.loads(response)["data"]).encode("UTF8")
+        )
+
+    def smart_contract_state_json(
+        self,
+        request: QuerySmartContractStateRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> JSONLike:
+        """
+        Get smart query result from the contract as decoded JSON.
+
+        The REST endpoint already returns the result as JSON, so this skips the
+        re-encoding into a protobuf response that SmartContractState performs.
+
+        :param request: QuerySmartContractStateRequest
+        :param metadata: optional call metadata, e.g. the block height to query at
+
+        :return: query result
+        """
+        return json.loads(self._smart_query(request, metadata))["data"]
+
+    def _smart_query(
+        self,
+        request: QuerySmartContractStateRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]],
+    ) -> bytes:
         query_data = base64.b64encode(request.query_data).decode()
-        response = self._rest_api.get(
+        return self._rest_api.get(
             f"{self.API_URL}/contract/{request.address}/smart/{query_data}",
             request,
             ["address", "queryData"],
-        )
-
-        return ParseDict(
-            self._fix_state_response(response), QuerySmartContractStateResponse()
+            headers=metadata_to_headers(metadata),
         )
 
     def Code(self, request: QueryCodeRequest) -> QueryCodeResponse:
@@ -213,22 +247,6 @@ class CosmWasmRestClient(CosmWasm):
             permission_name, AccessType.Value("ACCESS_TYPE_UNSPECIFIED")
         )
 
-    @staticmethod
-    def _fix_state_response(response: bytes) -> JSONLike:
-        """
-        Fix raw/smart contract state response to be parsable to protobuf object.
-
-        - Converts dict to base64 encoded string
-
-        :param response: raw/smart contract state response
-        :return: Fixed response in form of dict
-        """
-        dict_response = json.loads(response)
-        dict_response["data"] = base64.b64encode(
-            json_encode(dict_response["data"]).encode("UTF8")
-        ).decode()
-        return dict_response
-
     @staticmethod
     def _fix_history_response(response: bytes) -> JSONLike:
         """
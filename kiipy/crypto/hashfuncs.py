@@ -20,6 +20,8 @@
 """Hash functions of Crypto package."""
 
 import hashlib
+import mmap
+import os
 
 from Crypto.Hash import RIPEMD160  # type: ignore # nosec
 
@@ -37,6 +39,22 @@ def sha256(contents: bytes) -> bytes:
     return h.digest()
 
 
+def sha256_file(path: str) -> bytes:
+    """
+    Get sha256 hash of a file without reading it into memory.
+
+    :param path: str path of the file.
+
+    :return: bytes sha256 hash.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        if os.fstat(input_file.fileno()).st_size > 0:
+            with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                h.update(data)
+    return h.digest()
+
+
 def ripemd160(contents: bytes) -> bytes:
     """
     Get ripemd160 hash using PyCryptodome.
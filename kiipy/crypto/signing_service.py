@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Signers that delegate the signing work to worker processes or a signing daemon."""
+
+import base64
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import struct
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from kiipy.crypto.interface import Signer
+from kiipy.crypto.keypairs import PrivateKey, PublicKey
+
+
+DEFAULT_MAX_BATCH_SIZE = 64
+_FRAME_HEADER = struct.Struct(">I")
+
+_WORKER_KEY: Optional[PrivateKey] = None
+
+
+def _init_worker(private_key_bytes: bytes):
+    global _WORKER_KEY  # pylint: disable=global-statement
+    _WORKER_KEY = PrivateKey(private_key_bytes)
+
+
+def _worker_sign(
+    payload: bytes, is_digest: bool, deterministic: bool, canonicalise: bool
+) -> bytes:
+    assert _WORKER_KEY is not None
+    sign_fnc = _WORKER_KEY.sign_digest if is_digest else _WORKER_KEY.sign
+    return sign_fnc(payload, deterministic=deterministic, canonicalise=canonicalise)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Signing daemon connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _send_frame(sock: socket.socket, content: Dict[str, Any]):
+    data = json.dumps(content).encode()
+    sock.sendall(_FRAME_HEADER.pack(len(data)) + data)
+
+
+def _recv_frame(sock: socket.socket) -> Dict[str, Any]:
+    (size,) = _FRAME_HEADER.unpack(_recv_exact(sock, _FRAME_HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+def _fail_batch(batch: List[Tuple[List[Any], Future]], message: str):
+    for _, future in batch:
+        future.set_exception(RuntimeError(message))
+
+
+class ProcessPoolSigner(Signer):
+    """Signer that runs the ECDSA operations in a pool of worker processes.
+
+    The private key is loaded once into each worker, so the calling process only
+    waits on the result and concurrent sign requests are spread across the workers.
+    """
+
+    def __init__(self, private_key: PrivateKey, max_workers: Optional[int] = None):
+        """Init the process pool signer.
+
+        :param private_key: private key loaded into the workers
+        :param max_workers: number of worker processes, defaults to the cpu count
+        """
+        self._public_key = private_key.public_key
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(private_key.private_key_bytes,),
+        )
+
+    @property
+    def public_key(self) -> PublicKey:
+        """Get the public key of the signer.
+
+        :return: public key
+        """
+        return self._public_key
+
+    def sign(
+        self, message: bytes, deterministic: bool = True, canonicalise: bool = True
+    ) -> bytes:
+        """Sign message in one of the worker processes.
+
+        :param message: bytes message content.
+        :param deterministic: bool is deterministic.
+        :param canonicalise: bool is canonicalise.
+        :return: bytes signed message.
+        """
+        return self._executor.submit(
+            _worker_sign, message, False, deterministic, canonicalise
+        ).result()
+
+    def sign_digest(
+        self, digest: bytes, deterministic=True, canonicalise: bool = True
+    ) -> bytes:
+        """Sign digest in one of the worker processes.
+
+        :param digest: bytes digest content.
+        :param deterministic: bool is deterministic.
+        :param canonicalise: bool is canonicalise.
+        :return: bytes signed digest.
+        """
+        return self._executor.submit(
+            _worker_sign, digest, True, deterministic, canonicalise
+        ).result()
+
+    def sign_many(
+        self,
+        messages: Iterable[bytes],
+        deterministic: bool = True,
+        canonicalise: bool = True,
+    ) -> List[bytes]:
+        """Sign a batch of messages across all the workers.
+
+        :param messages: messages to sign
+        :param deterministic: bool is deterministic.
+        :param canonicalise: bool is canonicalise.
+        :return: signatures in the same order as the messages
+        """
+        futures = [
+            self._executor.submit(
+                _worker_sign, message, False, deterministic, canonicalise
+            )
+            for message in messages
+        ]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Shut down the worker processes."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ProcessPoolSigner":
+        """Enter the context.
+
+        :return: signer
+        """
+        return self
+
+    def __exit__(self, *args):
+        """Shut down the workers on context exit.
+
+        :param args: exception details
+        """
+        self.close()
+
+
+class _SigningRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        keys: Dict[str, PrivateKey] = self.server.keys  # type: ignore
+        while True:
+            try:
+                request = _recv_frame(self.request)
+            except ConnectionError:
+                return
+
+            private_key = keys.get(request.get("key", ""))
+            if private_key is None:
+                _send_frame(self.request, {"error": "Unknown signing key"})
+                continue
+
+            signatures = []
+            for payload, is_digest, deterministic, canonicalise in request["items"]:
+                sign_fnc = private_key.sign_digest if is_digest else private_key.sign
+                signature = sign_fnc(
+                    base64.b64decode(payload),
+                    deterministic=deterministic,
+                    canonicalise=canonicalise,
+                )
+                signatures.append(base64.b64encode(signature).decode())
+
+            _send_frame(self.request, {"signatures": signatures})
+
+
+class SigningDaemon:
+    """Local signing daemon serving sign requests over a Unix socket.
+
+    Keys are addressed by the hex encoding of their compressed public key.
+    """
+
+    def __init__(self, socket_path: str, private_keys: Iterable[PrivateKey]):
+        """Init the signing daemon.
+
+        :param socket_path: path of the Unix socket to listen on
+        :param private_keys: keys the daemon is allowed to sign with
+        """
+        self._socket_path = socket_path
+        self._keys = {key.public_key.public_key_hex: key for key in private_keys}
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def socket_path(self) -> str:
+        """Get the socket path.
+
+        :return: socket path
+        """
+        return self._socket_path
+
+    def start(self) -> "SigningDaemon":
+        """Start serving requests in a background thread.
+
+        :return: signing daemon
+        """
+        # a socket left behind by a daemon that did not shut down cleanly
+        if os.path.exists(self._socket_path) and stat.S_ISSOCK(
+            os.stat(self._socket_path).st_mode
+        ):
+            os.unlink(self._socket_path)
+
+        # only the owner may connect, the socket is created with the umask applied
+        previous_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(
+                self._socket_path, _SigningRequestHandler
+            )
+        finally:
+            os.umask(previous_umask)
+        os.chmod(self._socket_path, 0o600)
+        self._server.daemon_threads = True
+        self._server.keys = self._keys  # type: ignore
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+    def __enter__(self) -> "SigningDaemon":
+        """Start the daemon on context entry.
+
+        :return: signing daemon
+        """
+        return self.start()
+
+    def __exit__(self, *args):
+        """Stop the daemon on context exit.
+
+        :param args: exception details
+        """
+        self.stop()
+
+
+class UnixSocketSigner(Signer):
+    """Signer that forwards requests to a signing daemon over a Unix socket.
+
+    Sign requests issued concurrently from several threads are collected by a single
+    connection thread and sent to the daemon in batches of up to `max_batch_size`.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        key_id: str,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        timeout: Optional[float] = None,
+    ):
+        """Init the Unix socket signer.
+
+        :param socket_path: path of the signing daemon socket
+        :param key_id: hex encoded public key of the key to sign with
+        :param max_batch_size: max number of sign requests sent in one frame
+        :param timeout: optional timeout in seconds for each sign request
+        """
+        self._socket_path = socket_path
+        self._key_id = key_id
+        self._max_batch_size = max_batch_size
+        self._timeout = timeout
+        self._queue: "queue.Queue[Optional[Tuple[List[Any], Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def public_key(self) -> PublicKey:
+        """Get the public key of the signer.
+
+        :return: public key
+        """
+        return PublicKey(bytes.fromhex(self._key_id))
+
+    def sign(
+        self, message: bytes, deterministic: bool = True, canonicalise: bool = True
+    ) -> bytes:
+        """Sign message with the signing daemon.
+
+        :param message: bytes message content.
+        :param deterministic: bool is deterministic.
+        :param canonicalise: bool is canonicalise.
+        :return: bytes signed message.
+        """
+        return self._submit(message, False, deterministic, canonicalise).result(
+            self._timeout
+        )
+
+    def sign_digest(
+        self, digest: bytes, deterministic=True, canonicalise: bool = True
+    ) -> bytes:
+        """Sign digest with the signing daemon.
+
+        :param digest: bytes digest content.
+        :param deterministic: bool is deterministic.
+        :param canonicalise: bool is canonicalise.
+        :return: bytes signed digest.
+        """
+        return self._submit(digest, True, deterministic, canonicalise).result(
+            self._timeout
+        )
+
+    def sign_many(
+        self,
+        messages: Iterable[bytes],
+        deterministic: bool = True,
+        canonicalise: bool = True,
+    ) -> List[bytes]:
+        """Sign a batch of messages with the signing daemon.
+
+        :param messages: messages to sign
+        :param deterministic: bool is deterministic.
+        :param canonicalise: bool is canonicalise.
+        :return: signatures in the same order as the messages
+        """
+        futures = [
+            self._submit(message, False, deterministic, canonicalise)
+            for message in messages
+        ]
+        return [future.result(self._timeout) for future in futures]
+
+    def close(self):
+        """Close the connection to the signing daemon."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def _submit(
+        self, payload: bytes, is_digest: bool, deterministic: bool, canonicalise: bool
+    ) -> Future:
+        future: Future = Future()
+        item = [
+            base64.b64encode(payload).decode(),
+            is_digest,
+            deterministic,
+            canonicalise,
+        ]
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._queue.put((item, future))
+
+        return future
+
+    def _run(self):
+        sock: Optional[socket.socket] = None
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    return
+
+                batch = [entry]
+                while len(batch) < self._max_batch_size:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(entry)
+
+                if sock is None:
+                    try:
+                        sock = self._connect()
+                    except OSError as error:
+                        _fail_batch(
+                            batch, f"Unable to connect to signing daemon: {error}"
+                        )
+                        continue
+
+                if not self._process_batch(sock, batch):
+                    # the stream may be left mid frame, reconnect for the next batch
+                    sock.close()
+                    sock = None
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self._socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _process_batch(
+        self, sock: socket.socket, batch: List[Tuple[List[Any], Future]]
+    ) -> bool:
+        try:
+            _send_frame(sock, {"key": self._key_id, "items": [i for i, _ in batch]})
+            response = _recv_frame(sock)
+        except (OSError, ValueError) as error:
+            _fail_batch(batch, f"Signing request failed: {error}")
+            return False
+
+        if "error" in response:
+            _fail_batch(batch, response["error"])
+            return True
+
+        signatures = response.get("signatures", [])
+        if len(signatures) != len(batch):
+            _fail_batch(
+                batch,
+                f"Signing daemon returned {len(signatures)} signatures "
+                f"for {len(batch)} requests",
+            )
+            return False
+
+        for (_, future), signature in zip(batch, signatures):
+            future.set_result(base64.b64decode(signature))
+        return True
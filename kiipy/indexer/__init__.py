@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Local indexer of chain transactions."""
+
+from kiipy.indexer.indexer import (  # noqa: F401
+    ChainIndexer,
+    DEFAULT_COMMIT_SIZE,
+    MessageAddresses,
+    message_addresses,
+)
+from kiipy.indexer.store import (  # noqa: F401
+    IndexStore,
+    IndexedEvent,
+    IndexedMessage,
+    IndexedTx,
+)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Incremental indexer of chain transactions."""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.protobuf.message import DecodeError
+
+from kiipy.aerial.client import CompactBlock, DEFAULT_BLOCK_FETCH_CONCURRENCY
+from kiipy.aerial.client.search import iter_txs_event_pages
+from kiipy.aerial.tx import decode_tx
+from kiipy.aerial.tx_helpers import tx_response_events
+from kiipy.indexer.store import (
+    IndexBatch,
+    IndexStore,
+    IndexedEvent,
+    IndexedMessage,
+    IndexedTx,
+)
+
+
+DEFAULT_COMMIT_SIZE = 1000
+DEFAULT_TXS_PAGE_LIMIT = 100
+
+# message fields holding the address of each role, in order of preference
+SENDER_FIELDS = ("sender", "from_address", "delegator_address", "granter", "signer")
+RECIPIENT_FIELDS = (
+    "to_address",
+    "recipient",
+    "receiver",
+    "grantee",
+    "validator_address",
+)
+CONTRACT_FIELDS = ("contract",)
+
+
+@dataclass
+class MessageAddresses:
+    """Addresses taking part in a message."""
+
+    sender: Optional[str] = None
+    recipient: Optional[str] = None
+    contract: Optional[str] = None
+
+
+def _first_address(msg: Any, fields: Tuple[str, ...]) -> Optional[str]:
+    fields_by_name = msg.DESCRIPTOR.fields_by_name
+    for name in fields:
+        descriptor = fields_by_name.get(name)
+        if descriptor is None or descriptor.label == descriptor.LABEL_REPEATED:
+            continue
+        value = getattr(msg, name)
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+def message_addresses(msg: Any) -> MessageAddresses:
+    """Get the sender, recipient and contract addresses of a message.
+
+    :param msg: decoded message
+    :return: addresses found in the message fields
+    """
+    return MessageAddresses(
+        sender=_first_address(msg, SENDER_FIELDS),
+        recipient=_first_address(msg, RECIPIENT_FIELDS),
+        contract=_first_address(msg, CONTRACT_FIELDS),
+    )
+
+
+class ChainIndexer:
+    """Incremental local indexer of the transactions of a chain.
+
+    Blocks are fetched concurrently and in order with
+    :meth:`LedgerClient.iter_blocks`, their transactions are decoded locally and their
+    messages, together with the events of the transaction results, are written to an
+    :class:`IndexStore`. Rows are committed in batches of at least ``commit_size``
+    transactions, each batch together with the height of its last block, so that an
+    interrupted sync resumes after the last committed block.
+    """
+
+    def __init__(
+        self,
+        client: "LedgerClient",  # type: ignore # noqa: F821
+        path: str,
+        prefix: Optional[str] = None,
+        commit_size: int = DEFAULT_COMMIT_SIZE,
+        with_events: bool = True,
+        start_height: int = 1,
+    ):
+        """Init the chain indexer.
+
+        :param client: Ledger client
+        :param path: path of the SQLite database
+        :param prefix: address prefix of the signers, defaults to the network prefix
+        :param commit_size: minimum number of transactions per database commit
+        :param with_events: fetch and index the events and result codes
+        :param start_height: first block indexed by an empty database
+        """
+        self._client = client
+        self._prefix = (
+            prefix if prefix is not None else client.network_config.address_prefix
+        )
+        self._commit_size = commit_size
+        self._with_events = with_events
+        self._start_height = start_height
+        self.store = IndexStore(path)
+
+    def checkpoint(self) -> int:
+        """Get the highest block height fully indexed.
+
+        :return: block height, 0 if nothing has been indexed
+        """
+        return self.store.checkpoint()
+
+    def sync(
+        self,
+        end: Optional[int] = None,
+        concurrency: int = DEFAULT_BLOCK_FETCH_CONCURRENCY,
+        follow: bool = False,
+    ) -> int:
+        """Index the blocks after the checkpoint.
+
+        :param end: last block height to index, defaults to the chain head
+        :param concurrency: maximum number of blocks fetched concurrently
+        :param follow: keep indexing new blocks past the chain head
+        :return: number of transactions indexed
+        """
+        start = max(self.checkpoint() + 1, self._start_height)
+        if end is not None and end < start:
+            return 0
+        blocks = self._client.iter_blocks(
+            start, end=end, concurrency=concurrency, follow=follow, compact=True
+        )
+        return self.index_blocks(blocks, concurrency=concurrency)
+
+    def index_blocks(
+        self,
+        blocks: Iterable[CompactBlock],
+        concurrency: int = DEFAULT_BLOCK_FETCH_CONCURRENCY,
+    ) -> int:
+        """Index consecutive blocks.
+
+        :param blocks: compact blocks in height order
+        :param concurrency: maximum number of blocks whose events are fetched concurrently
+        :return: number of transactions indexed
+        """
+        indexed = 0
+        batch = IndexBatch()
+        for block, tx_responses in self._with_tx_responses(blocks, concurrency):
+            self._add_block(batch, block, tx_responses)
+            batch.height = block.height
+            if len(batch) >= self._commit_size:
+                self.store.write(batch)
+                indexed += len(batch)
+                batch = IndexBatch()
+        if batch.height is not None:
+            self.store.write(batch)
+            indexed += len(batch)
+        return indexed
+
+    def account_history(
+        self,
+        address: str,
+        from_height: Optional[int] = None,
+        to_height: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[IndexedTx]:
+        """Get the indexed transactions touching an address.
+
+        :param address: account address
+        :param from_height: lowest block height, inclusive, defaults to None
+        :param to_height: highest block height, inclusive, defaults to None
+        :param limit: maximum number of transactions, defaults to all
+        :return: transactions in chain order
+        """
+        return self.store.account_history(address, from_height, to_height, limit)
+
+    def messages(self, **filters: Any) -> List[IndexedMessage]:
+        """Get indexed messages, see :meth:`IndexStore.messages` for the filters.
+
+        :param filters: message filters
+        :return: messages in chain order
+        """
+        return self.store.messages(**filters)
+
+    def events(self, **filters: Any) -> List[IndexedEvent]:
+        """Get indexed events, see :meth:`IndexStore.events` for the filters.
+
+        :param filters: event filters
+        :return: events in chain order
+        """
+        return self.store.events(**filters)
+
+    def close(self):
+        """Close the database."""
+        self.store.close()
+
+    def _with_tx_responses(
+        self, blocks: Iterable[CompactBlock], concurrency: int
+    ) -> Iterator[Tuple[CompactBlock, Dict[str, Any]]]:
+        if not self._with_events:
+            for block in blocks:
+                yield block, {}
+            return
+
+        # the results of the next blocks are fetched while the current one is indexed
+        pending: Deque[Tuple[CompactBlock, Optional[Future]]] = deque()
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        try:
+            for block in blocks:
+                future = (
+                    executor.submit(self._tx_responses, block.height)
+                    if block.num_txs
+                    else None
+                )
+                pending.append((block, future))
+                if len(pending) > concurrency:
+                    yield self._resolve(*pending.popleft())
+            while pending:
+                yield self._resolve(*pending.popleft())
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _resolve(
+        block: CompactBlock, future: Optional[Future]
+    ) -> Tuple[CompactBlock, Dict[str, Any]]:
+        return block, future.result() if future is not None else {}
+
+    def _tx_responses(self, height: int) -> Dict[str, Any]:
+        # the blocks are already fetched concurrently, the pages of one block are not
+        return {
+            str(tx_response.txhash).upper(): tx_response
+            for page in iter_txs_event_pages(
+                self._client.txs,
+                [[f"tx.height={height}"]],
+                DEFAULT_TXS_PAGE_LIMIT,
+                concurrency=1,
+            )
+            for tx_response in page.tx_responses
+        }
+
+    def _add_block(
+        self, batch: IndexBatch, block: CompactBlock, tx_responses: Dict[str, Any]
+    ):
+        height = block.height
+        batch.blocks.append((height, block.time.isoformat(), block.num_txs))
+
+        for tx_index, (tx_bytes, tx_hash) in enumerate(zip(block.txs, block.tx_hashes)):
+            tx_response = tx_responses.get(tx_hash)
+            code = int(tx_response.code) if tx_response is not None else None
+
+            try:
+                decoded = decode_tx(tx_bytes, self._prefix, tx_hash)
+            except DecodeError:
+                # not a cosmos transaction, only its position and result are indexed
+                batch.txs.append((tx_hash, height, tx_index, code, "", None))
+                continue
+
+            signer = decoded.signers[0] if decoded.signers else None
+            batch.txs.append(
+                (
+                    tx_hash,
+                    height,
+                    tx_index,
+                    code,
+                    decoded.memo,
+                    str(signer) if signer is not None else None,
+                )
+            )
+
+            for msg_index, (packed, msg) in enumerate(
+                zip(decoded.body.messages, decoded.messages)
+            ):
+                addresses = message_addresses(msg)
+                batch.messages.append(
+                    (
+                        tx_hash,
+                        msg_index,
+                        height,
+                        str(packed.type_url),
+                        addresses.sender,
+                        addresses.recipient,
+                        addresses.contract,
+                        bytes(packed.value),
+                    )
+                )
+
+            if tx_response is None:
+                continue
+            for event_index, event in enumerate(tx_response_events(tx_response)):
+                batch.events.append((tx_hash, event_index, height, str(event.type)))
+                batch.attributes.extend(
+                    (tx_hash, event_index, attribute_index, str(a.key), str(a.value))
+                    for attribute_index, a in enumerate(event.attributes)
+                )
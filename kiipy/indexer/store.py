@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""SQLite storage of indexed transactions, messages and events."""
+
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+from kiipy.aerial.tx import message_class
+from kiipy.aerial.tx_helpers import TxEvent, group_event_rows
+
+
+# event attributes whose value is an address taking part in the transaction
+ACCOUNT_EVENT_KEYS = ("sender", "recipient", "receiver", "spender")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    height INTEGER PRIMARY KEY,
+    time TEXT NOT NULL,
+    num_txs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS txs (
+    hash TEXT PRIMARY KEY,
+    height INTEGER NOT NULL,
+    tx_index INTEGER NOT NULL,
+    code INTEGER,
+    memo TEXT NOT NULL,
+    signer TEXT
+);
+CREATE INDEX IF NOT EXISTS txs_by_height ON txs (height, tx_index);
+CREATE INDEX IF NOT EXISTS txs_by_signer ON txs (signer, height);
+CREATE TABLE IF NOT EXISTS messages (
+    tx_hash TEXT NOT NULL,
+    msg_index INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    type_url TEXT NOT NULL,
+    sender TEXT,
+    recipient TEXT,
+    contract TEXT,
+    value BLOB NOT NULL,
+    PRIMARY KEY (tx_hash, msg_index)
+);
+CREATE INDEX IF NOT EXISTS messages_by_sender ON messages (sender, height);
+CREATE INDEX IF NOT EXISTS messages_by_recipient ON messages (recipient, height);
+CREATE INDEX IF NOT EXISTS messages_by_contract ON messages (contract, height);
+CREATE INDEX IF NOT EXISTS messages_by_type ON messages (type_url, height);
+CREATE TABLE IF NOT EXISTS events (
+    tx_hash TEXT NOT NULL,
+    event_index INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, event_index)
+);
+CREATE INDEX IF NOT EXISTS events_by_type ON events (type, height);
+CREATE TABLE IF NOT EXISTS event_attributes (
+    tx_hash TEXT NOT NULL,
+    event_index INTEGER NOT NULL,
+    attribute_index INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, event_index, attribute_index)
+);
+CREATE INDEX IF NOT EXISTS event_attributes_by_key_value
+    ON event_attributes (key, value);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    height INTEGER NOT NULL
+);
+"""
+
+
+@dataclass
+class IndexedTx:
+    """Indexed transaction."""
+
+    hash: str
+    height: int
+    index: int
+    code: Optional[int]
+    memo: str
+    signer: Optional[str]
+
+
+@dataclass
+class IndexedMessage:
+    """Indexed transaction message."""
+
+    tx_hash: str
+    height: int
+    index: int
+    type_url: str
+    sender: Optional[str]
+    recipient: Optional[str]
+    contract: Optional[str]
+    value: bytes
+
+    def decode(self) -> Optional[Any]:
+        """Decode the message using the bundled protos.
+
+        :return: message, None if its type is unknown
+        """
+        cls = message_class(self.type_url)
+        if cls is None:
+            return None
+        msg = cls()
+        msg.ParseFromString(self.value)
+        return msg
+
+
+@dataclass
+class IndexedEvent(TxEvent):
+    """Indexed transaction event."""
+
+    tx_hash: str
+    height: int
+    index: int
+
+
+@dataclass
+class IndexBatch:
+    """Rows of consecutive blocks written to the store in one transaction."""
+
+    blocks: List[Tuple] = field(default_factory=list)
+    txs: List[Tuple] = field(default_factory=list)
+    messages: List[Tuple] = field(default_factory=list)
+    events: List[Tuple] = field(default_factory=list)
+    attributes: List[Tuple] = field(default_factory=list)
+    height: Optional[int] = None
+
+    def __len__(self) -> int:
+        """Get the number of transactions in the batch.
+
+        :return: number of transactions
+        """
+        return len(self.txs)
+
+
+def _where(clauses: Sequence[Tuple[str, Any]]) -> Tuple[str, List[Any]]:
+    used = [(clause, value) for clause, value in clauses if value is not None]
+    if not used:
+        return "", []
+    return (
+        "WHERE " + " AND ".join(clause for clause, _ in used),
+        [value for _, value in used],
+    )
+
+
+class IndexStore:
+    """SQLite database of indexed transactions, messages and events.
+
+    Messages are indexed by sender, recipient, contract and type, events by type and
+    attributes by key and value, all together with the block height so that history
+    queries are answered from the indexes alone. Each batch of blocks is written in a
+    single database transaction together with the checkpoint height.
+    """
+
+    def __init__(self, path: str):
+        """Open the store, creating its tables if needed.
+
+        :param path: path of the SQLite database
+        """
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def checkpoint(self) -> int:
+        """Get the highest block height fully indexed.
+
+        :return: block height, 0 if nothing has been indexed
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT height FROM checkpoint WHERE id = 0"
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def write(self, batch: IndexBatch):
+        """Write a batch and move the checkpoint to its last block.
+
+        :param batch: batch of indexed rows
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?)", batch.blocks
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO txs VALUES (?, ?, ?, ?, ?, ?)", batch.txs
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                batch.messages,
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?)", batch.events
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO event_attributes VALUES (?, ?, ?, ?, ?)",
+                batch.attributes,
+            )
+            if batch.height is not None:
+                self._db.execute(
+                    "INSERT INTO checkpoint VALUES (0, ?) ON CONFLICT (id) "
+                    "DO UPDATE SET height = MAX(height, excluded.height)",
+                    (batch.height,),
+                )
+
+    def tx(self, tx_hash: str) -> Optional[IndexedTx]:
+        """Get an indexed transaction.
+
+        :param tx_hash: transaction hash
+        :return: transaction, None if not indexed
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM txs WHERE hash = ?", (tx_hash.upper(),)
+            ).fetchone()
+        return IndexedTx(*row) if row else None
+
+    def account_history(
+        self,
+        address: str,
+        from_height: Optional[int] = None,
+        to_height: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[IndexedTx]:
+        """Get the transactions touching an address.
+
+        An address touches a transaction when it signs it, is the sender or the
+        recipient of one of its messages, or is the value of one of the
+        ``ACCOUNT_EVENT_KEYS`` attributes of its events.
+
+        :param address: account address
+        :param from_height: lowest block height, inclusive, defaults to None
+        :param to_height: highest block height, inclusive, defaults to None
+        :param limit: maximum number of transactions, defaults to all
+        :return: transactions in chain order
+        """
+        where, params = _where(
+            [("t.height >= ?", from_height), ("t.height <= ?", to_height)]
+        )
+        where = f"{where} AND" if where else "WHERE"
+        placeholders = ", ".join("?" * len(ACCOUNT_EVENT_KEYS))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT t.* FROM txs AS t "  # nosec
+                f"{where} t.hash IN ("
+                "SELECT hash FROM txs WHERE signer = ? "
+                "UNION SELECT tx_hash FROM messages WHERE sender = ? "
+                "UNION SELECT tx_hash FROM messages WHERE recipient = ? "
+                "UNION SELECT tx_hash FROM event_attributes "
+                f"WHERE key IN ({placeholders}) AND value = ?"
+                ") ORDER BY t.height, t.tx_index LIMIT ?",
+                [
+                    *params,
+                    address,
+                    address,
+                    address,
+                    *ACCOUNT_EVENT_KEYS,
+                    address,
+                    -1 if limit is None else limit,
+                ],
+            ).fetchall()
+        return [IndexedTx(*row) for row in rows]
+
+    def messages(
+        self,
+        type_url: Optional[str] = None,
+        sender: Optional[str] = None,
+        recipient: Optional[str] = None,
+        contract: Optional[str] = None,
+        from_height: Optional[int] = None,
+        to_height: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[IndexedMessage]:
+        """Get indexed messages.
+
+        :param type_url: only the messages of this type, e.g. /cosmos.bank.v1beta1.MsgSend
+        :param sender: only the messages sent by this address, defaults to all
+        :param recipient: only the messages received by this address, defaults to all
+        :param contract: only the messages to this contract, defaults to all
+        :param from_height: lowest block height, inclusive, defaults to None
+        :param to_height: highest block height, inclusive, defaults to None
+        :param limit: maximum number of messages, defaults to all
+        :return: messages in chain order
+        """
+        # the type is far less selective than an address: the unary + keeps SQLite
+        # from picking the type index when an address index can be used instead
+        by_address = any(a is not None for a in (sender, recipient, contract))
+        where, params = _where(
+            [
+                ("+m.type_url = ?" if by_address else "m.type_url = ?", type_url),
+                ("m.sender = ?", sender),
+                ("m.recipient = ?", recipient),
+                ("m.contract = ?", contract),
+                ("m.height >= ?", from_height),
+                ("m.height <= ?", to_height),
+            ]
+        )
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT m.tx_hash, m.height, m.msg_index, m.type_url, m.sender, "  # nosec
+                "m.recipient, m.contract, m.value FROM messages AS m "
+                "JOIN txs AS t ON t.hash = m.tx_hash "
+                f"{where} ORDER BY m.height, t.tx_index, m.msg_index LIMIT ?",
+                [*params, -1 if limit is None else limit],
+            ).fetchall()
+        return [IndexedMessage(*row) for row in rows]
+
+    def events(
+        self,
+        event_type: Optional[str] = None,
+        tx_hash: Optional[str] = None,
+        from_height: Optional[int] = None,
+        to_height: Optional[int] = None,
+    ) -> List[IndexedEvent]:
+        """Get indexed events.
+
+        :param event_type: only the events of this type, defaults to all
+        :param tx_hash: only the events of this transaction, defaults to all
+        :param from_height: lowest block height, inclusive, defaults to None
+        :param to_height: highest block height, inclusive, defaults to None
+        :return: events in chain order
+        """
+        where, params = _where(
+            [
+                ("e.type = ?", event_type),
+                ("e.tx_hash = ?", tx_hash.upper() if tx_hash is not None else None),
+                ("e.height >= ?", from_height),
+                ("e.height <= ?", to_height),
+            ]
+        )
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT e.type, e.tx_hash, e.height, e.event_index, a.key, "  # nosec
+                "a.value FROM events AS e JOIN txs AS t ON t.hash = e.tx_hash "
+                "LEFT JOIN event_attributes AS a USING (tx_hash, event_index) "
+                f"{where} ORDER BY e.height, t.tx_index, e.event_index, "
+                "a.attribute_index",
+                params,
+            ).fetchall()
+        return group_event_rows(
+            rows, lambda type_, *columns: IndexedEvent(type_, [], *columns)
+        )
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
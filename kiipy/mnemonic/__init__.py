@@ -23,11 +23,14 @@ import hashlib
 import hmac
 import os
 import re
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 
 from kiipy.crypto.hashfuncs import sha256
 from kiipy.crypto.keypairs import PrivateKey
-from kiipy.mnemonic.words import ENGLISH_MNEMONIC_WORDS, ENGLISH_MNEMONIC_WORDS_LIST
+from kiipy.mnemonic.words import (
+    ENGLISH_MNEMONIC_WORDS_INDEX,
+    ENGLISH_MNEMONIC_WORDS_LIST,
+)
 
 
 SEED_MIN_BYTE_LEN = 16
@@ -36,6 +39,9 @@ HMAC_HALF_LEN = HMAC_LEN // 2
 MNEMONIC_SALT = "mnemonic"
 MNEMONIC_ROUNDS = 2048
 COSMOS_HD_PATH = "m/44'/118'/0'/0/0"
+ENTROPY_BYTE_LENGTHS = (16, 20, 24, 28, 32)
+MNEMONIC_WORD_BITS = 11
+MNEMONIC_WORD_MASK = (1 << MNEMONIC_WORD_BITS) - 1
 
 
 def split_hmac(data: bytes) -> Tuple[bytes, bytes]:
@@ -171,22 +177,33 @@ def derive_child_key(master_private_key: bytes, chain_code: bytes, path: str) ->
 
 def validate_mnemonic_and_normalise(mnemonic: str) -> str:
     """
-    Validate a mnemonic phrase.
+    Validate a mnemonic phrase, including its BIP-39 checksum.
 
     :param mnemonic: str The mnemonic phrase to validate.
     :return: str The normalized mnemonic phrase.
 
-    :raises ValueError: If the mnemonic length is invalid or a word is invalid.
-    """
+    :raises ValueError: If the mnemonic length, a word or the checksum is invalid.
+    """  # noqa: DAR402
     words = mnemonic.split()
-    if len(words) not in [12, 15, 18, 21, 24]:
-        raise ValueError("Invalid mnemonic length")
+    mnemonic_words_to_entropy(words)
+    return " ".join(words)
 
-    for word in words:
-        if word not in ENGLISH_MNEMONIC_WORDS:
-            raise ValueError(f"Invalid mnemonic word: {word}")
 
-    return " ".join(words)
+def validate_mnemonics(mnemonics: Iterable[str]) -> List[bool]:
+    """
+    Validate a batch of mnemonic phrases.
+
+    :param mnemonics: Iterable[str] The mnemonic phrases to validate.
+    :return: List[bool] Whether each mnemonic is valid, in the input order.
+    """
+    results = []
+    for mnemonic in mnemonics:
+        try:
+            mnemonic_words_to_entropy(mnemonic.split())
+            results.append(True)
+        except ValueError:
+            results.append(False)
+    return results
 
 
 def derive_seed_from_mnemonic(mnemonic: str, passphrase: Optional[str] = None) -> bytes:
@@ -231,6 +248,11 @@ def derive_child_key_from_mnemonic(
     return derive_child_key(master_private_key, master_chain_code, path)
 
 
+def _checksum_bits(entropy: bytes) -> int:
+    # the checksum is made of the first len(entropy) * 8 / 32 bits of the hash
+    return sha256(entropy)[0] >> (8 - len(entropy) // 4)
+
+
 def entropy_to_mnemonic(entropy: bytes) -> str:
     """
     Convert entropy bytes to a mnemonic phrase.
@@ -240,28 +262,74 @@ def entropy_to_mnemonic(entropy: bytes) -> str:
 
     :raises ValueError: If the data length is invalid.
     """
-    # Get the english mnemonic words list - later we can add support for other languages
-    mnemonic = ENGLISH_MNEMONIC_WORDS_LIST
-
-    if len(entropy) not in [16, 20, 24, 28, 32]:
+    if len(entropy) not in ENTROPY_BYTE_LENGTHS:
         raise ValueError(
             f"Data length should be one of the following: [16, 20, 24, 28, 32], but it is not ({len(entropy)})."
         )
 
-    # b is the binary representation of the entropy joined with the first bits of the hash
-    h = sha256(entropy).hex()
-    b = (
-        bin(int.from_bytes(entropy, byteorder="big"))[2:].zfill(len(entropy) * 8)
-        + bin(int(h, 16))[2:].zfill(256)[: len(entropy) * 8 // 32]
+    # the entropy bits followed by the checksum bits, as a single integer
+    checksum_len = len(entropy) // 4
+    value = (int.from_bytes(entropy, byteorder="big") << checksum_len) | (
+        _checksum_bits(entropy)
+    )
+
+    # take 11 bits for each word, starting from the most significant ones
+    num_words = (len(entropy) * 8 + checksum_len) // MNEMONIC_WORD_BITS
+    words = ENGLISH_MNEMONIC_WORDS_LIST
+    return " ".join(
+        words[(value >> shift) & MNEMONIC_WORD_MASK]
+        for shift in range(
+            (num_words - 1) * MNEMONIC_WORD_BITS, -1, -MNEMONIC_WORD_BITS
+        )
     )
 
-    # Iterate over the binary string taking 11 bits for each word
-    result = []
-    for i in range(len(b) // 11):
-        idx = int(b[i * 11 : (i + 1) * 11], 2)  # noqa: E203
-        result.append(mnemonic[idx])
 
-    return " ".join(result)
+def entropies_to_mnemonics(entropies: Iterable[bytes]) -> List[str]:
+    """
+    Convert a batch of entropy buffers to mnemonic phrases.
+
+    :param entropies: Iterable[bytes] The entropy buffers.
+    :return: List[str] The generated mnemonic phrases, in the input order.
+    """
+    return [entropy_to_mnemonic(bytes(entropy)) for entropy in entropies]
+
+
+def mnemonic_words_to_entropy(words: List[str]) -> bytes:
+    """
+    Convert mnemonic words back to the entropy bytes, verifying the checksum.
+
+    :param words: List[str] The mnemonic words.
+    :return: bytes The entropy bytes.
+
+    :raises ValueError: If the mnemonic length, a word or the checksum is invalid.
+    """
+    if len(words) not in [12, 15, 18, 21, 24]:
+        raise ValueError("Invalid mnemonic length")
+
+    value = 0
+    for word in words:
+        index = ENGLISH_MNEMONIC_WORDS_INDEX.get(word)
+        if index is None:
+            raise ValueError(f"Invalid mnemonic word: {word}")
+        value = (value << MNEMONIC_WORD_BITS) | index
+
+    checksum_len = len(words) // 3
+    entropy_len = (len(words) * MNEMONIC_WORD_BITS - checksum_len) // 8
+    entropy = (value >> checksum_len).to_bytes(entropy_len, byteorder="big")
+    if value & ((1 << checksum_len) - 1) != _checksum_bits(entropy):
+        raise ValueError("Invalid mnemonic checksum")
+
+    return entropy
+
+
+def mnemonic_to_entropy(mnemonic: str) -> bytes:
+    """
+    Convert a mnemonic phrase back to the entropy bytes, verifying the checksum.
+
+    :param mnemonic: str The mnemonic phrase.
+    :return: bytes The entropy bytes.
+    """
+    return mnemonic_words_to_entropy(mnemonic.split())
 
 
 def generate_entropy(num_bits: int) -> bytes:
@@ -287,3 +355,22 @@ def generate_mnemonic(num_bits=256):
     """
     entropy = generate_entropy(num_bits)
     return entropy_to_mnemonic(entropy)
+
+
+def generate_mnemonics(count: int, num_bits: int = 256) -> List[str]:
+    """
+    Generate a batch of mnemonic phrases.
+
+    The entropy for the whole batch is drawn with a single call to the random source.
+
+    :param count: int The number of mnemonic phrases.
+    :param num_bits: int The number of bits for the entropy of each phrase.
+
+    :return: List[str] The generated mnemonic phrases.
+    """
+    byte_length = (num_bits + 7) // 8
+    entropy = memoryview(generate_entropy(count * byte_length * 8))
+    return entropies_to_mnemonics(
+        entropy[offset : offset + byte_length]  # noqa: E203
+        for offset in range(0, len(entropy), byte_length)
+    )
@@ -19,4 +19,8 @@
 
 """Mnemonic words."""
 
-from .english import ENGLISH_MNEMONIC_WORDS, ENGLISH_MNEMONIC_WORDS_LIST  # noqa: F401
+from .english import (  # noqa: F401
+    ENGLISH_MNEMONIC_WORDS,
+    ENGLISH_MNEMONIC_WORDS_INDEX,
+    ENGLISH_MNEMONIC_WORDS_LIST,
+)
@@ -133,3 +133,6 @@ ENGLISH_COMPRESSED = (
 
 ENGLISH_MNEMONIC_WORDS_LIST = decompress_words(ENGLISH_COMPRESSED)
 ENGLISH_MNEMONIC_WORDS = set(ENGLISH_MNEMONIC_WORDS_LIST)
+ENGLISH_MNEMONIC_WORDS_INDEX = {
+    word: index for index, word in enumerate(ENGLISH_MNEMONIC_WORDS_LIST)
+}
@@ -19,9 +19,11 @@
 
 """Implementation of Staking interface using REST."""
 
+from typing import Optional, Sequence, Tuple
+
 from google.protobuf.json_format import Parse
 
-from kiipy.common.rest_client import RestClient
+from kiipy.common.rest_client import RestClient, metadata_to_headers
 from kiipy.protos.cosmos.staking.v1beta1.query_pb2 import (
     QueryDelegationRequest,
     QueryDelegationResponse,
@@ -68,14 +70,23 @@ class StakingRestClient(Staking):
         """
         self._rest_api = rest_api
 
-    def Validators(self, request: QueryValidatorsRequest) -> QueryValidatorsResponse:
+    def Validators(
+        self,
+        request: QueryValidatorsRequest,
+        metadata: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> QueryValidatorsResponse:
         """
         Query all validators that match the given status.
 
         :param request: QueryValidatorsRequest
+        :param metadata: optional call metadata, e.g. the block height to query at
         :return: QueryValidatorsResponse
         """
-        json_response = self._rest_api.get(f"{self.API_URL}/validators", request)
+        json_response = self._rest_api.get(
+            f"{self.API_URL}/validators",
+            request,
+            headers=metadata_to_headers(metadata),
+        )
         return Parse(json_response, QueryValidatorsResponse())
 
     def Validator(self, request: QueryValidatorRequest) -> QueryValidatorResponse:
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the compressed wasm artifacts."""
+
+import gzip
+import os
+from unittest.mock import Mock, patch
+
+from kiipy.aerial.contract import LedgerContract, create_cosmwasm_store_code_msg
+from kiipy.aerial.contract.artifacts import WasmArtifactCache, compress_wasm
+from kiipy.crypto.address import Address
+from kiipy.crypto.hashfuncs import sha256, sha256_file
+
+
+SENDER = Address("kii1j6aq5pp57mpp0gehgwh6wety8qmhyzlzj5mthg")
+
+
+def test_sha256_file(tmp_path):
+    """Test hashing a file matches hashing its contents."""
+    contents = os.urandom(3 * 1024 * 1024 + 7)
+    path = tmp_path / "contract.wasm"
+    path.write_bytes(contents)
+    empty_path = tmp_path / "empty.wasm"
+    empty_path.write_bytes(b"")
+
+    assert sha256_file(str(path)) == sha256(contents)
+    assert sha256_file(str(empty_path)) == sha256(b"")
+
+
+def test_artifact_cache_reuses_compressed_code(tmp_path):
+    """Test the artifact cache compresses once and serves later requests from disk."""
+    contents = b"\x00asm" + os.urandom(4096) + bytes(4096)
+    path = tmp_path / "contract.wasm"
+    path.write_bytes(contents)
+    digest = sha256(contents)
+
+    cache = WasmArtifactCache(str(tmp_path / "cache"), compression_level=1)
+    compressed = cache.get_compressed(str(path))
+    assert gzip.decompress(compressed) == contents
+    assert os.path.isfile(cache.artifact_path(digest))
+
+    # the source file is not read again once the artifact is cached
+    os.remove(path)
+    msg = create_cosmwasm_store_code_msg(
+        str(path), SENDER, artifact_cache=cache, digest=digest
+    )
+    assert msg.wasm_byte_code == compressed
+    assert msg.sender == str(SENDER)
+
+
+def test_store_code_msg_compression_level(tmp_path):
+    """Test the compression level of the store code message."""
+    contents = b"\x00asm" + bytes(8192)
+    path = tmp_path / "contract.wasm"
+    path.write_bytes(contents)
+
+    msg = create_cosmwasm_store_code_msg(str(path), SENDER, compression_level=1)
+    assert msg.wasm_byte_code == compress_wasm(str(path), 1)
+    assert gzip.decompress(msg.wasm_byte_code) == contents
+
+
+def test_contract_store_uses_compression_level(tmp_path):
+    """Test the contract stores its code at its compression level."""
+    path = tmp_path / "contract.wasm"
+    path.write_bytes(b"\x00asm" + bytes(8192))
+    contract = LedgerContract(str(path), Mock(), code_id=1, compression_level=1)
+    sender = Mock()
+    sender.address.return_value = SENDER
+
+    with patch(
+        "kiipy.aerial.contract.prepare_and_broadcast_basic_transaction"
+    ) as broadcast:
+        broadcast.return_value.wait_to_complete.return_value.contract_code_id = 2
+        assert contract.store(sender) == 2
+
+    tx = broadcast.call_args.args[1]
+    assert tx.msgs[0].wasm_byte_code == compress_wasm(str(path), 1)
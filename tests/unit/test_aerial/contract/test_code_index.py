@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the persistent code index."""
+
+from unittest.mock import Mock
+
+from kiipy.aerial.config import NetworkConfig
+from kiipy.aerial.contract import LedgerContract
+from kiipy.aerial.contract.code_index import CodeIndex
+from kiipy.crypto.hashfuncs import sha256
+from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageResponse
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import CodeInfoResponse, QueryCodesResponse
+
+
+def _digest(code_id: int) -> bytes:
+    return sha256(f"code {code_id}".encode())
+
+
+class FakeChain:
+    """Codes listing paginated by big endian code id keys."""
+
+    def __init__(self, num_codes: int, page_size: int = 2):
+        """Init the fake chain.
+
+        :param num_codes: number of stored codes
+        :param page_size: number of codes per page
+        """
+        self.num_codes = num_codes
+        self.page_size = page_size
+        self.requests = []
+
+    def codes(self, request):
+        """Handle a codes request.
+
+        :param request: QueryCodesRequest
+        :return: QueryCodesResponse
+        """
+        self.requests.append(request)
+        start = int.from_bytes(request.pagination.key, "big") or 1
+        end = min(start + self.page_size, self.num_codes + 1)
+        next_key = end.to_bytes(8, "big") if end <= self.num_codes else b""
+        return QueryCodesResponse(
+            code_infos=[
+                CodeInfoResponse(code_id=i, data_hash=_digest(i))
+                for i in range(start, end)
+            ],
+            pagination=PageResponse(next_key=next_key),
+        )
+
+
+def _client(chain: FakeChain) -> Mock:
+    client = Mock()
+    client.network_config = NetworkConfig.kii_testnet()
+    client.wasm.Codes.side_effect = chain.codes
+    return client
+
+
+def test_code_index_syncs_incrementally(tmp_path):
+    """Test the index only fetches codes stored after the last sync."""
+    path = str(tmp_path / "codes.sqlite")
+    chain = FakeChain(num_codes=5)
+
+    index = CodeIndex(_client(chain), path)
+    assert index.lookup(_digest(4)) == 4
+    assert index.last_code_id == 5
+    assert len(chain.requests) == 3
+    index.close()
+
+    # a new process picks up where the last sync stopped
+    chain.num_codes = 7
+    chain.requests.clear()
+    index = CodeIndex(_client(chain), path)
+    assert index.lookup(_digest(2), sync=False) == 2
+    assert not chain.requests
+
+    results = index.lookup_many([_digest(1), _digest(7), b"unknown"])
+    assert results == {_digest(1): 1, _digest(7): 7, b"unknown": None}
+    assert len(chain.requests) == 1
+    assert int.from_bytes(chain.requests[0].pagination.key, "big") == 6
+
+
+def test_contract_uses_code_index(tmp_path):
+    """Test the contract looks up its code id in the index."""
+    contract_path = tmp_path / "contract.wasm"
+    contract_path.write_bytes(b"code 3")
+
+    chain = FakeChain(num_codes=4)
+    client = _client(chain)
+    index = CodeIndex(client, str(tmp_path / "codes.sqlite"))
+
+    contract = LedgerContract(str(contract_path), client, code_index=index)
+    assert contract.code_id == 3
+
+    index.add(9, b"stored locally")
+    assert index.lookup(b"stored locally", sync=False) == 9
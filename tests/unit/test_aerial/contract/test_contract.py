@@ -20,6 +20,7 @@
 
 from unittest.mock import Mock
 
+from kiipy.aerial.client import ContractQueryResult
 from kiipy.aerial.contract import LedgerContract
 from kiipy.aerial.wallet import LocalWallet
 from kiipy.common.utils import json_encode
@@ -34,3 +35,31 @@ def test_contract_behaves_like_address_string():
 
     assert contract == contract.address
     assert json_encode(contract) == json_encode(contract.address)
+
+
+def test_contract_query_many_reports_validation_errors(tmp_path):
+    """Test invalid messages of a query batch are not sent."""
+    schema_path = tmp_path / "schema"
+    schema_path.mkdir()
+    (schema_path / "query_msg.json").write_text(
+        json_encode({"type": "object", "required": ["balance"]})
+    )
+
+    address = LocalWallet.generate().address()
+    client = Mock()
+    client.query_contracts_batch.side_effect = lambda queries, **kwargs: [
+        ContractQueryResult(address=str(a), result=msg) for a, msg in queries
+    ]
+    contract = LedgerContract(
+        None, client, address=address, schema_path=str(schema_path)
+    )
+
+    msgs = [{"balance": {}}, {"other": {}}, {"balance": {"id": 1}}]
+    results = contract.query_many(msgs, height=7)
+
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[0].result == msgs[0]
+    assert results[2].result == msgs[2]
+    sent = client.query_contracts_batch.call_args
+    assert [msg for _, msg in sent.args[0]] == [msgs[0], msgs[2]]
+    assert sent.kwargs["height"] == 7
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the contract deployment plan."""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from kiipy.aerial.client import Account
+from kiipy.aerial.config import NetworkConfig
+from kiipy.aerial.contract import LedgerContract
+from kiipy.aerial.contract.deployment import ContractRef, DeploymentPlan
+from kiipy.aerial.tx_helpers import MessageLog, SubmittedTx, TxResponse
+from kiipy.aerial.wallet import LocalWallet
+from kiipy.protos.cosmos.base.abci.v1beta1.abci_pb2 import TxResponse as PbTxResponse
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import QueryCodesResponse
+from kiipy.protos.cosmwasm.wasm.v1.tx_pb2 import MsgStoreCode
+from kiipy.protos.tendermint.abci.types_pb2 import Event, EventAttribute
+
+
+def _mock_client(sender: LocalWallet, tagged_events: bool = False) -> Mock:
+    client = Mock()
+    client.network_config = NetworkConfig.kii_testnet()
+    client.query_account.return_value = Account(sender.address(), 7, 3)
+    client.gas_strategy.block_gas_limit.return_value = 1000
+    client.estimate_gas_for_tx.side_effect = lambda tx: min(300 * len(tx.msgs), 1000)
+    client.estimate_fee_from_gas.side_effect = lambda gas: f"{gas}ukii"
+    client.wasm.Codes.return_value = QueryCodesResponse()
+
+    broadcast = []
+    instantiated = []
+
+    def broadcast_tx(tx):
+        broadcast.append(tx)
+        return SubmittedTx(client, str(len(broadcast) - 1))
+
+    def wait_for_query_tx(tx_hash, timeout=None, poll_period=None):
+        logs = []
+        for index, msg in enumerate(broadcast[int(tx_hash)].msgs):
+            if isinstance(msg, MsgStoreCode):
+                events = {"store_code": {"code_id": str(100 + len(msg.wasm_byte_code))}}
+            else:
+                instantiated.append(json.loads(msg.msg))
+                address = LocalWallet.generate().address()
+                events = {"instantiate": {"_contract_address": str(address)}}
+            logs.append(MessageLog(index, "", events))
+
+        if tagged_events:
+            # chains without message logs tag each event with its message index
+            return TxResponse.from_proto(
+                PbTxResponse(
+                    txhash=tx_hash,
+                    height=1,
+                    events=[
+                        Event(
+                            type=event_type,
+                            attributes=[
+                                EventAttribute(key=key, value=value)
+                                for key, value in attributes.items()
+                            ]
+                            + [EventAttribute(key="msg_index", value=str(log.index))],
+                        )
+                        for log in logs
+                        for event_type, attributes in log.events.items()
+                    ],
+                )
+            )
+        return TxResponse(tx_hash, 1, 0, 0, 0, "", logs, {}, None)
+
+    client.broadcast_tx.side_effect = broadcast_tx
+    client.wait_for_query_tx.side_effect = wait_for_query_tx
+    client.broadcast = broadcast
+    client.instantiated = instantiated
+    return client
+
+
+@pytest.mark.parametrize("tagged_events", [False, True])
+def test_deployment_plan(tmp_path, tagged_events):
+    """Test codes are stored once and contracts instantiated in dependency waves."""
+    token_path = tmp_path / "token.wasm"
+    token_path.write_bytes(b"\0asm token")
+    pool_path = tmp_path / "pool.wasm"
+    pool_path.write_bytes(b"\0asm pool contract")
+
+    sender = LocalWallet.generate()
+    client = _mock_client(sender, tagged_events)
+
+    plan = DeploymentPlan(client, sender)
+    plan.add("token_a", LedgerContract(str(token_path), client), {"symbol": "A"})
+    plan.add("token_b", LedgerContract(str(token_path), client), {"symbol": "B"})
+    plan.add(
+        "pool",
+        LedgerContract(str(pool_path), client),
+        {"tokens": [ContractRef("token_a"), ContractRef("token_b")]},
+    )
+    plan.add(
+        "router", LedgerContract(str(pool_path), client), {"pool": ContractRef("pool")}
+    )
+    assert plan.waves() == [["token_a", "token_b"], ["pool"], ["router"]]
+
+    addresses = plan.deploy()
+
+    # one store transaction holding the two distinct codes, then one per wave
+    assert [len(tx.msgs) for tx in client.broadcast] == [2, 2, 1, 1]
+    assert client.instantiated[2] == {
+        "tokens": [str(addresses["token_a"]), str(addresses["token_b"])]
+    }
+    assert client.instantiated[3] == {"pool": str(addresses["pool"])}
+    assert len(set(addresses.values())) == 4
+    # each stored code id is resolved from the events of its own message
+    token_code_ids = {msg.code_id for msg in client.broadcast[1].msgs}
+    assert len(token_code_ids) == 1
+    assert client.broadcast[2].msgs[0].code_id not in token_code_ids
+    client.query_account.assert_called()
+
+
+def test_deployment_plan_rejects_invalid_references():
+    """Test unknown and cyclic references are reported."""
+    sender = LocalWallet.generate()
+    client = _mock_client(sender)
+
+    plan = DeploymentPlan(client, sender)
+    plan.add("a", LedgerContract(None, client, code_id=1), {"b": ContractRef("b")})
+    with pytest.raises(RuntimeError, match="unknown contracts"):
+        plan.waves()
+
+    plan.add("b", LedgerContract(None, client, code_id=1), {"a": ContractRef("a")})
+    with pytest.raises(RuntimeError, match="Cyclic"):
+        plan.waves()
+
+
+def test_deployment_plan_labels_contracts_without_digest():
+    """Test contracts known only by code id are labelled from their code id."""
+    sender = LocalWallet.generate()
+    client = _mock_client(sender)
+
+    plan = DeploymentPlan(client, sender)
+    plan.add("a", LedgerContract(None, client, code_id=11), {})
+    plan.add("b", LedgerContract(None, client, code_id=12), {})
+    plan.deploy()
+
+    labels = [msg.label for msg in client.broadcast[0].msgs]
+    assert labels[0].startswith(b"11".hex()) and labels[1].startswith(b"12".hex())
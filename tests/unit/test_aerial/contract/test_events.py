@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the contract event indexer."""
+
+from unittest.mock import Mock
+
+from kiipy.aerial.contract.events import ContractEventIndexer, parse_contract_events
+from kiipy.protos.cosmos.base.abci.v1beta1.abci_pb2 import (
+    ABCIMessageLog,
+    StringEvent,
+    TxResponse,
+)
+from kiipy.protos.cosmos.tx.v1beta1.service_pb2 import GetTxsEventResponse
+from kiipy.protos.tendermint.abci.types_pb2 import Event, EventAttribute
+
+
+def _wasm_event(contract: str, action: str, **attributes) -> Event:
+    return Event(
+        type="wasm",
+        attributes=[
+            EventAttribute(key=key, value=value)
+            for key, value in [("_contract_address", contract), ("action", action)]
+            + list(attributes.items())
+        ],
+    )
+
+
+def _tx(height: int, *events: Event, txhash: str = "") -> TxResponse:
+    return TxResponse(
+        height=height, txhash=txhash or f"TX{height}", events=list(events)
+    )
+
+
+def _client(txs) -> Mock:
+    def get_txs_event(req):
+        from_height = int(req.events[1].split(">=")[1])
+        matching = [tx for tx in txs if tx.height >= from_height]
+        start = (req.page - 1) * req.limit
+        return GetTxsEventResponse(
+            tx_responses=matching[start : start + req.limit],  # noqa: E203
+            total=len(matching),
+        )
+
+    def query_compact_block(height):
+        # the transactions of a block, in the order they were included
+        return Mock(tx_hashes=[tx.txhash for tx in txs if tx.height == height])
+
+    client = Mock()
+    client.txs.GetTxsEvent.side_effect = get_txs_event
+    client.query_compact_block.side_effect = query_compact_block
+    return client
+
+
+def test_parse_contract_events_keeps_every_instance():
+    """Test repeated events and attributes of a transaction are all kept."""
+    tx = _tx(
+        5,
+        Event(type="message", attributes=[EventAttribute(key="action", value="x")]),
+        _wasm_event("pool", "swap", amount="1"),
+        _wasm_event("pool", "swap", amount="2"),
+        _wasm_event("token", "transfer", amount="3"),
+    )
+
+    events = parse_contract_events(tx)
+    assert [(e.contract, e.action, e.get("amount")) for e in events] == [
+        ("pool", "swap", "1"),
+        ("pool", "swap", "2"),
+        ("token", "transfer", "3"),
+    ]
+    assert [e.event_index for e in events] == [1, 2, 3]
+    assert len(parse_contract_events(tx, ["token"])) == 1
+
+
+def test_indexer_sync_and_checkpoint(tmp_path):
+    """Test incremental indexing, checkpoints and idempotent catch-up."""
+    txs = [
+        _tx(1, _wasm_event("pool", "swap", amount="1")),
+        _tx(2, _wasm_event("pool", "provide"), _wasm_event("pool", "swap")),
+        _tx(3, _wasm_event("pool", "swap", amount="3")),
+    ]
+
+    client = _client(txs)
+
+    path = str(tmp_path / "events.db")
+    indexer = ContractEventIndexer(client, path, ["pool"], page_limit=2)
+    assert indexer.sync() == 4
+    assert indexer.checkpoint("pool") == 3
+
+    swaps = indexer.events(contract="pool", action="swap", from_height=2)
+    assert [(e.height, e.get("amount")) for e in swaps] == [(2, None), (3, "3")]
+    assert swaps[1].attributes == [
+        ("_contract_address", "pool"),
+        ("action", "swap"),
+        ("amount", "3"),
+    ]
+    indexer.close()
+
+    txs.append(_tx(4, _wasm_event("pool", "swap", amount="4")))
+    indexer = ContractEventIndexer(client, path, ["pool"], page_limit=2)
+    assert indexer.sync() == 1
+    assert client.txs.GetTxsEvent.call_args.args[0].events[1] == "tx.height>=3"
+    assert len(indexer.events()) == 5
+    indexer.close()
+
+
+def test_indexer_orders_transactions_by_block_position(tmp_path):
+    """Test events of a block are returned in transaction order, not hash order."""
+    txs = [
+        _tx(7, _wasm_event("pool", "swap", amount="1"), txhash="FF"),
+        _tx(7, _wasm_event("pool", "swap", amount="2"), txhash="00"),
+    ]
+    client = _client(txs)
+
+    indexer = ContractEventIndexer(client, str(tmp_path / "events.db"), ["pool"])
+    indexer.sync()
+    events = indexer.events()
+    assert [(e.tx_hash, e.tx_index, e.get("amount")) for e in events] == [
+        ("FF", 0, "1"),
+        ("00", 1, "2"),
+    ]
+    client.query_compact_block.assert_called_once_with(7)
+    indexer.close()
+
+
+def test_parse_contract_events_falls_back_to_logs():
+    """Test the events of the message logs are used when there are no top events."""
+    tx = TxResponse(
+        height=1,
+        txhash="TX",
+        logs=[
+            ABCIMessageLog(
+                msg_index=0,
+                events=[
+                    StringEvent(
+                        type="wasm",
+                        attributes=[{"key": "_contract_address", "value": "pool"}],
+                    )
+                ],
+            )
+        ],
+    )
+    assert [e.contract for e in parse_contract_events(tx)] == ["pool"]
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for batched contract execution."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from kiipy.aerial.client import Account
+from kiipy.aerial.config import NetworkConfig
+from kiipy.aerial.contract import ExecuteBatch, LedgerContract
+from kiipy.aerial.exceptions import BroadcastError, MessageSimulationError
+from kiipy.aerial.tx_helpers import MessageLog, SubmittedTx, TxResponse
+from kiipy.aerial.wallet import LocalWallet
+
+
+GAS_PER_MSG = 300
+BLOCK_GAS_LIMIT = 1000
+
+
+def _mock_client(sender: LocalWallet, failing_tx: int = -1) -> Mock:
+    client = Mock()
+    client.network_config = NetworkConfig.kii_testnet()
+    client.query_account.return_value = Account(sender.address(), 7, 3)
+    client.gas_strategy.block_gas_limit.return_value = BLOCK_GAS_LIMIT
+    client.estimate_gas_for_tx.side_effect = lambda tx: min(
+        GAS_PER_MSG * len(tx.msgs), BLOCK_GAS_LIMIT
+    )
+    client.estimate_fee_from_gas.side_effect = lambda gas: f"{gas}ukii"
+
+    broadcast = []
+
+    def broadcast_tx(tx):
+        broadcast.append(tx)
+        return SubmittedTx(client, f"hash{len(broadcast) - 1}")
+
+    def wait_for_query_tx(tx_hash, timeout=None, poll_period=None):
+        tx = broadcast[int(tx_hash[4:])]
+        return TxResponse(
+            hash=tx_hash,
+            height=1,
+            code=1 if tx_hash == f"hash{failing_tx}" else 0,
+            gas_wanted=0,
+            gas_used=0,
+            raw_log="failed",
+            logs=[MessageLog(i, "", {}) for i in range(len(tx.msgs))],
+            events={},
+            timestamp=None,
+        )
+
+    client.broadcast_tx.side_effect = broadcast_tx
+    client.wait_for_query_tx.side_effect = wait_for_query_tx
+    client.broadcast = broadcast
+    return client
+
+
+def test_execute_batch_packs_messages_into_block_sized_transactions():
+    """Test messages are packed by gas and results map back to each message."""
+    sender = LocalWallet.generate()
+    client = _mock_client(sender, failing_tx=1)
+    contract = LedgerContract(None, client, address=LocalWallet.generate().address())
+    other = LocalWallet.generate().address()
+
+    batch = contract.execute_batch(sender)
+    for i in range(6):
+        assert batch.add(contract if i % 2 else other, {"op": {"id": i}}) == i
+    assert len(batch) == 6
+
+    txs = batch.broadcast()
+    assert [tx.tx_hash for tx in txs] == ["hash0", "hash1"]
+    assert [len(tx.msgs) for tx in client.broadcast] == [3, 3]
+    # one account lookup, consecutive sequences
+    client.query_account.assert_called_once()
+    assert [tx.tx.auth_info.signer_infos[0].sequence for tx in client.broadcast] == [
+        3,
+        4,
+    ]
+
+    results = batch.wait_to_complete()
+    assert [(r.tx_hash, r.msg_index) for r in results] == [
+        ("hash0", 0),
+        ("hash0", 1),
+        ("hash0", 2),
+        ("hash1", 0),
+        ("hash1", 1),
+        ("hash1", 2),
+    ]
+    assert all(r.ok and r.log.index == r.msg_index for r in results[:3])
+    assert all(isinstance(r.error, BroadcastError) for r in results[3:])
+
+    with pytest.raises(RuntimeError, match="already broadcast"):
+        batch.broadcast()
+
+
+def test_execute_batch_requires_broadcast():
+    """Test waiting for a batch that was not broadcast."""
+    sender = LocalWallet.generate()
+    batch = ExecuteBatch(_mock_client(sender), sender)
+    with pytest.raises(RuntimeError, match="not broadcast"):
+        batch.wait_to_complete()
+
+
+def test_execute_batch_empty():
+    """Test an empty batch broadcasts nothing."""
+    sender = LocalWallet.generate()
+    client = _mock_client(sender)
+    batch = ExecuteBatch(client, sender)
+    assert batch.broadcast() == []
+    assert batch.wait_to_complete() == []
+    client.query_account.assert_not_called()
+    client.broadcast_tx.assert_not_called()
+
+
+def test_execute_batch_reports_failing_message():
+    """Test a message failing its simulation is named and nothing is broadcast."""
+    sender = LocalWallet.generate()
+    client = _mock_client(sender)
+    failing = LocalWallet.generate().address()
+
+    def estimate_gas(tx):
+        if any(msg.contract == str(failing) for msg in tx.msgs):
+            raise RuntimeError("unauthorized")
+        return GAS_PER_MSG * len(tx.msgs)
+
+    client.estimate_gas_for_tx.side_effect = estimate_gas
+    batch = ExecuteBatch(client, sender)
+    for i in range(5):
+        batch.add(failing if i == 3 else LocalWallet.generate().address(), {"i": i})
+
+    with pytest.raises(MessageSimulationError, match="unauthorized") as error:
+        batch.broadcast()
+    assert error.value.index == 3
+    client.broadcast_tx.assert_not_called()
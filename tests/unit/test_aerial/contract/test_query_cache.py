@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the contract query cache."""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from kiipy.aerial.contract import LedgerContract
+from kiipy.aerial.contract.query_cache import ContractQueryCache
+from kiipy.aerial.wallet import LocalWallet
+
+
+def _mock_client(height: int = 10) -> Mock:
+    client = Mock()
+    client.query_height.return_value = height
+    client.query_contract.side_effect = lambda address, msg, height=None: {
+        "msg": msg,
+        "height": height,
+    }
+    return client
+
+
+def test_query_cache_hits_within_a_block():
+    """Test repeated queries are served from the cache until a new block."""
+    client = _mock_client()
+    cache = ContractQueryCache(client, height_refresh_secs=60)
+
+    first = cache.query("contract", {"config": {}})
+    assert cache.query("contract", {"config": {}}) == first
+    assert first == {"msg": {"config": {}}, "height": 10}
+    assert client.query_contract.call_count == 1
+    assert client.query_height.call_count == 1
+    assert cache.hits == 1 and cache.misses == 1
+    assert cache.hit_rate == 0.5
+
+    # keys are canonical: the order of the message fields does not matter
+    cache.query("contract", {"pool": {"a": 1, "b": 2}})
+    cache.query("contract", {"pool": {"b": 2, "a": 1}})
+    assert client.query_contract.call_count == 2
+
+    cache.observe_height(11)
+    assert len(cache) == 0
+    assert cache.query("contract", {"config": {}})["height"] == 11
+    assert client.query_contract.call_count == 3
+
+
+def test_query_cache_immutable_queries():
+    """Test immutable queries stay cached across blocks."""
+    client = _mock_client()
+    cache = ContractQueryCache(
+        client, immutable_queries=["token_info"], height_refresh_secs=60
+    )
+
+    cache.query("contract", {"token_info": {}})
+    cache.query("contract", {"balance": {"address": "a"}})
+    cache.observe_height(11)
+    assert len(cache) == 1
+
+    cache.query("contract", {"token_info": {}})
+    assert client.query_contract.call_count == 2
+
+    cache.invalidate("contract")
+    assert len(cache) == 0
+
+
+def test_query_cache_thread_safety_and_eviction():
+    """Test concurrent queries and the bound on the number of entries."""
+    client = _mock_client()
+    cache = ContractQueryCache(client, max_entries=8, height_refresh_secs=60)
+
+    msgs = [{"balance": {"id": i % 16}} for i in range(256)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda m: cache.query("contract", m), msgs))
+
+    assert [r["msg"] for r in results] == msgs
+    assert len(cache) <= 8
+    assert cache.hits + cache.misses == len(msgs)
+
+
+def test_contract_query_uses_cache():
+    """Test contract queries go through the query cache when provided."""
+    client = _mock_client()
+    cache = ContractQueryCache(client, height_refresh_secs=60)
+    contract = LedgerContract(
+        None, client, address=LocalWallet.generate().address(), query_cache=cache
+    )
+
+    assert contract.query({"config": {}}) == contract.query({"config": {}})
+    assert client.query_contract.call_count == 1
+    client.wasm.SmartContractState.assert_not_called()
+
+
+def test_query_cache_keeps_historical_queries():
+    """Test results at an explicit height are cached and kept across blocks."""
+    client = _mock_client()
+    cache = ContractQueryCache(client, height_refresh_secs=60)
+
+    assert cache.query("contract", {"config": {}}, height=5)["height"] == 5
+    assert cache.query("contract", {"config": {}}, height=5)["height"] == 5
+    cache.query("contract", {"config": {}})
+    assert client.query_contract.call_count == 2
+
+    # the latest result is reused for the same explicit height, and then kept
+    assert cache.query("contract", {"config": {}}, height=10)["height"] == 10
+    assert client.query_contract.call_count == 2
+
+    cache.observe_height(12)
+    assert len(cache) == 2
+    cache.query("contract", {"config": {}}, height=5)
+    cache.query("contract", {"config": {}}, height=10)
+    assert client.query_contract.call_count == 2
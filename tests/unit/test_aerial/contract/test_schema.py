@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the compiled contract schemas."""
+
+import json
+import os
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+from jsonschema import ValidationError
+
+from kiipy.aerial.contract import LedgerContract
+from kiipy.aerial.contract.schema import (
+    ContractSchema,
+    SchemaValidation,
+    inline_refs,
+    load_contract_schema,
+)
+from kiipy.aerial.wallet import LocalWallet
+
+
+SCHEMA_PATH = str(Path(__file__).parents[4] / "contracts" / "simple" / "schema")
+
+
+def test_schema_validators_are_shared():
+    """Test contracts sharing a schema directory share the compiled validators."""
+    schema = load_contract_schema(SCHEMA_PATH)
+    assert schema is not None
+    assert load_contract_schema(SCHEMA_PATH + "/") is schema
+    assert schema.schema("query") is not None
+    assert load_contract_schema(SCHEMA_PATH + "/missing") is None
+
+    schema.validate("query", {"get_count": {}})
+    with pytest.raises(ValidationError):
+        schema.validate("query", {"get_count": 0})
+
+
+def test_contract_validation_modes():
+    """Test the strict, sampled and off validation modes of a contract."""
+    address = LocalWallet.generate().address()
+    client = Mock()
+    client.query_contract.return_value = {"count": 1}
+    bad_query = {"get_count": 0}
+
+    contract = LedgerContract(None, client, address=address, schema_path=SCHEMA_PATH)
+    assert contract.query({"get_count": {}}) == {"count": 1}
+    with pytest.raises(ValidationError):
+        contract.query(bad_query)
+
+    for mode, sample_rate in [
+        (SchemaValidation.Off, 1.0),
+        (SchemaValidation.Sampled, 0.0),
+    ]:
+        contract = LedgerContract(
+            None,
+            client,
+            address=address,
+            schema_path=SCHEMA_PATH,
+            schema_validation=mode,
+            schema_sample_rate=sample_rate,
+        )
+        assert contract.query(bad_query) == {"count": 1}
+
+
+def test_inline_refs():
+    """Test local references are resolved up front, recursive ones are kept."""
+    schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {
+            "amount": {"$ref": "#/definitions/Uint128", "description": "amount"},
+            "tree": {"$ref": "#/definitions/Tree"},
+        },
+        "definitions": {
+            "Uint128": {"type": "string", "pattern": "^[0-9]+$"},
+            "Tree": {
+                "type": "object",
+                "properties": {
+                    "children": {
+                        "type": "array",
+                        "items": {"$ref": "#/definitions/Tree"},
+                    }
+                },
+            },
+        },
+    }
+
+    inlined = inline_refs(schema)
+    assert inlined["properties"]["amount"] == schema["definitions"]["Uint128"]
+    assert inlined["properties"]["tree"]["properties"]["children"]["items"] == {
+        "$ref": "#/definitions/Tree"
+    }
+    assert schema["properties"]["amount"]["$ref"] == "#/definitions/Uint128"
+
+    contract_schema = ContractSchema({"execute_msg": schema})
+    contract_schema.validate("execute", {"amount": "12", "tree": {"children": [{}]}})
+    with pytest.raises(ValidationError):
+        contract_schema.validate("execute", {"amount": "1.5"})
+    with pytest.raises(ValidationError):
+        contract_schema.validate("execute", {"tree": {"children": [{"children": 1}]}})
+
+
+def test_schema_cache_follows_the_schema_files(tmp_path):
+    """Test missing directories are not cached and modified schemas are reloaded."""
+    schema_path = tmp_path / "schema"
+    assert load_contract_schema(str(schema_path)) is None
+
+    schema_path.mkdir()
+    query_path = schema_path / "query_msg.json"
+    query_path.write_text(json.dumps({"type": "object"}))
+    schema = load_contract_schema(str(schema_path))
+    assert schema is not None
+    assert load_contract_schema(str(schema_path)) is schema
+
+    query_path.write_text(json.dumps({"type": "string"}))
+    os.utime(query_path, ns=(0, 1))
+    reloaded = load_contract_schema(str(schema_path))
+    assert reloaded is not schema
+    assert reloaded.schema("query") == {"type": "string"}
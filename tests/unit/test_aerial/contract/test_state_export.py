@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the contract raw state export."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from kiipy.aerial.contract import LedgerContract
+from kiipy.aerial.contract.state_export import read_raw_state_dump
+from kiipy.aerial.wallet import LocalWallet
+from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageResponse
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import QueryAllContractStateResponse
+from kiipy.protos.cosmwasm.wasm.v1.types_pb2 import Model
+
+
+STATE = sorted(
+    [(f"balance{i:03d}".encode(), f"{i}".encode()) for i in range(25)]
+    + [(f"config{i}".encode(), b"{}") for i in range(3)]
+)
+
+
+def _mock_client(fail_after: int = -1) -> Mock:
+    """Mock a client paging through STATE, keyed by the first key of each page."""
+    calls = []
+
+    def all_contract_state(req):
+        calls.append(req.pagination.key)
+        if len(calls) == fail_after:
+            raise RuntimeError("connection lost")
+        keys = [key for key, _ in STATE]
+        start = next(
+            (i for i, key in enumerate(keys) if key >= req.pagination.key), len(keys)
+        )
+        page = STATE[start : start + req.pagination.limit]  # noqa: E203
+        next_key = keys[start + len(page)] if start + len(page) < len(keys) else b""
+        return QueryAllContractStateResponse(
+            models=[Model(key=key, value=value) for key, value in page],
+            pagination=PageResponse(next_key=next_key),
+        )
+
+    client = Mock()
+    client.wasm.AllContractState.side_effect = all_contract_state
+    client.calls = calls
+    return client
+
+
+def _contract(client: Mock) -> LedgerContract:
+    return LedgerContract(None, client, address=LocalWallet.generate().address())
+
+
+def test_iter_raw_state():
+    """Test streaming the raw state with and without a prefix."""
+    client = _mock_client()
+    contract = _contract(client)
+
+    models = list(contract.iter_raw_state(page_limit=4))
+    assert [(m.key, m.value) for m in models] == STATE
+
+    client = _mock_client()
+    contract = _contract(client)
+    models = list(contract.iter_raw_state(prefix=b"balance", page_limit=10))
+    assert [m.key for m in models] == [k for k, _ in STATE if k.startswith(b"balance")]
+    # the export stops at the first page going past the prefix
+    assert client.calls == [b"balance", b"balance010", b"balance020"]
+
+
+def test_dump_raw_state_resumes(tmp_path):
+    """Test an interrupted dump resumes from its last complete page."""
+    path = str(tmp_path / "state.bin")
+
+    contract = _contract(_mock_client(fail_after=3))
+    with pytest.raises(RuntimeError, match="connection lost"):
+        contract.dump_raw_state(path, page_limit=5)
+    assert (tmp_path / "state.bin.checkpoint").exists()
+
+    client = _mock_client()
+    contract = _contract(client)
+    assert contract.dump_raw_state(path, page_limit=5) == len(STATE) - 10
+    assert client.calls[0] == STATE[10][0]
+    assert not (tmp_path / "state.bin.checkpoint").exists()
+
+    assert list(read_raw_state_dump(path)) == STATE
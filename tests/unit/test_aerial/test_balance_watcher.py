@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""Tests for the balance watcher."""
+
+from unittest.mock import Mock
+
+from kiipy.aerial.balance_watcher import BalanceWatcher
+from kiipy.aerial.client.balances import BalanceTable
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.base.abci.v1beta1.abci_pb2 import TxResponse
+from kiipy.protos.tendermint.abci.types_pb2 import Event, EventAttribute
+
+
+def _address(index: int) -> str:
+    return str(Address(bytes([index]) * 20))
+
+
+def _transfer(sender: str, recipient: str, amount: str) -> Mock:
+    tx_response = TxResponse(
+        events=[
+            Event(
+                type="coin_spent",
+                attributes=[
+                    EventAttribute(key="spender", value=sender),
+                    EventAttribute(key="amount", value=amount),
+                ],
+            ),
+            Event(
+                type="coin_received",
+                attributes=[
+                    EventAttribute(key="receiver", value=recipient),
+                    EventAttribute(key="amount", value=amount),
+                ],
+            ),
+            Event(
+                type="message",
+                attributes=[EventAttribute(key="sender", value=sender)],
+            ),
+        ]
+    )
+    return Mock(proto=tx_response)
+
+
+def _client(balances, heights):
+    client = Mock()
+    client.network_config.fee_denomination = "ukii"
+    client.query_height.side_effect = heights
+
+    def query_balances_bulk(addresses, denom, height):
+        assert denom == "ukii"
+        return BalanceTable(
+            denom,
+            height,
+            [bytes(Address(address)) for address in addresses],
+            [balances[str(address)] for address in addresses],
+        )
+
+    client.query_balances_bulk.side_effect = query_balances_bulk
+    return client
+
+
+def test_poll_requeries_touched_accounts_only():
+    """Test only the watched accounts moving the watched denom are queried again."""
+    alice, bob, carol, stranger = (_address(i) for i in range(1, 5))
+    balances = {alice: 100, bob: 100, carol: 100, stranger: 0}
+    client = _client(balances, [10, 10, 12])
+    crossings = []
+
+    watcher = BalanceWatcher(client)
+    watcher.watch_many([alice, bob], threshold=50, callback=crossings.append)
+    watcher.watch(carol)
+    assert len(watcher) == 3
+    assert watcher.height == 10
+    assert client.query_balances_bulk.call_count == 2
+
+    # no new block, no search
+    assert watcher.poll() == []
+    client.search_txs.assert_not_called()
+
+    balances[alice] = 40
+    balances[stranger] = 60
+    client.search_txs.return_value = [
+        _transfer(alice, stranger, "60ukii"),
+        _transfer(bob, stranger, "5uatom"),
+    ]
+    changes = watcher.poll()
+
+    client.search_txs.assert_called_once_with([], from_height=11, to_height=12)
+    assert client.query_balances_bulk.call_args.args[0] == [alice]
+    assert client.query_balances_bulk.call_args.kwargs["height"] == 12
+    assert [(c.address, c.previous, c.balance) for c in changes] == [(alice, 100, 40)]
+    assert crossings == changes
+    assert crossings[0].below
+    assert watcher.balance(alice) == 40
+    assert watcher.height == 12
+
+
+def test_refresh_and_threshold_recovery():
+    """Test the callback fires on each crossing and refresh queries every account."""
+    alice, bob = _address(1), _address(2)
+    balances = {alice: 10, bob: 80}
+    client = _client(balances, [5, 6])
+    crossings = []
+
+    watcher = BalanceWatcher(client)
+    watcher.watch(alice, threshold=50, callback=crossings.append)
+    watcher.watch(bob, threshold=50, callback=crossings.append)
+
+    balances[alice] = 70  # recovers above the threshold
+    balances[bob] = 60  # changes without crossing
+    changes = watcher.refresh()
+
+    assert sorted(c.address for c in changes) == sorted([alice, bob])
+    assert [(c.address, c.below) for c in crossings] == [(alice, False)]
+
+    watcher.unwatch(bob)
+    assert bob not in watcher
+    assert alice in watcher
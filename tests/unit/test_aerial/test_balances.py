@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""Tests for the bulk balance queries."""
+
+import threading
+from unittest.mock import Mock, patch
+
+import bech32
+import grpc
+import pytest
+
+from kiipy.aerial.client import BLOCK_HEIGHT_METADATA_KEY, LedgerClient
+from kiipy.aerial.client.balances import BalanceTable, call_with_retries
+from kiipy.aerial.config import NetworkConfig
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.bank.v1beta1.query_pb2 import (
+    DenomOwner,
+    QueryBalanceResponse,
+    QueryDenomOwnersResponse,
+)
+from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageResponse
+from kiipy.protos.cosmos.base.v1beta1.coin_pb2 import Coin
+
+
+class _RpcError(grpc.RpcError):
+    def __init__(self, code: grpc.StatusCode):
+        super().__init__()
+        self._code = code
+
+    def code(self) -> grpc.StatusCode:
+        return self._code
+
+
+def _address(index: int) -> Address:
+    return Address(bytes([index]) * 20)
+
+
+def test_query_balances_bulk_pins_height_and_retries():
+    """Test the balances are read at one height, in order, with retries."""
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    addresses = [_address(i) for i in range(1, 21)]
+    big = 10**30 + 1
+    failed = set()
+    lock = threading.Lock()
+
+    def balance(req, metadata=None):
+        assert metadata == [(BLOCK_HEIGHT_METADATA_KEY, "42")]
+        index = bytes(Address(req.address))[0]
+        with lock:
+            # every fifth account fails once with a transient error
+            if index % 5 == 0 and index not in failed:
+                failed.add(index)
+                raise _RpcError(grpc.StatusCode.UNAVAILABLE)
+        return QueryBalanceResponse(
+            balance=Coin(denom=req.denom, amount=str(big + index))
+        )
+
+    with patch.object(client, "query_height", return_value=42), patch.object(
+        client, "bank"
+    ) as bank, patch("time.sleep"):
+        bank.Balance.side_effect = balance
+        table = client.query_balances_bulk(addresses, denom="ukii")
+
+    assert table.height == 42
+    assert table.denom == "ukii"
+    assert len(table) == 20
+    assert table.amounts == [big + i for i in range(1, 21)]
+    assert table.raw_addresses == [bytes(address) for address in addresses]
+    assert table.get(str(addresses[3])) == big + 4
+    assert table.get(_address(99)) is None
+    assert table.total == sum(table.amounts)
+    assert bank.Balance.call_count == 24
+
+
+def test_query_balances_bulk_denom_owners_fast_path():
+    """Test all the holders of a denom are listed page by page."""
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    contract = Address(
+        bech32.bech32_encode("kii", bech32.convertbits(bytes(range(32)), 8, 5, True))
+    )
+    owners = [
+        DenomOwner(address=str(_address(1)), balance=Coin(denom="ukii", amount="5")),
+        DenomOwner(address=str(contract), balance=Coin(denom="ukii", amount="7")),
+        DenomOwner(address=str(_address(2)), balance=Coin(denom="ukii", amount="9")),
+    ]
+
+    def denom_owners(req, metadata=None):
+        assert metadata == [(BLOCK_HEIGHT_METADATA_KEY, "7")]
+        # the node serves at most two holders per page
+        start = int(req.pagination.key or b"0")
+        end = start + 2
+        return QueryDenomOwnersResponse(
+            denom_owners=owners[start:end],
+            pagination=PageResponse(
+                next_key=str(end).encode() if end < len(owners) else b""
+            ),
+        )
+
+    with patch.object(client, "bank") as bank:
+        bank.DenomOwners.side_effect = denom_owners
+        table = client.query_balances_bulk(denom="ukii", height=7)
+
+    assert bank.DenomOwners.call_count == 2
+    assert bank.Balance.call_count == 0
+    assert table.amounts == [5, 7, 9]
+    assert [str(address) for address, _ in table.items()] == [
+        str(_address(1)),
+        str(contract),
+        str(_address(2)),
+    ]
+    assert table.get(contract) == 7
+
+
+def test_call_with_retries_gives_up():
+    """Test permanent errors are raised at once and transient ones after retries."""
+    query = Mock(side_effect=_RpcError(grpc.StatusCode.NOT_FOUND))
+    with pytest.raises(grpc.RpcError):
+        call_with_retries(query, retries=3)
+    assert query.call_count == 1
+
+    query = Mock(side_effect=RuntimeError("Response: 503, b'overloaded'"))
+    with patch("time.sleep") as sleep, pytest.raises(RuntimeError):
+        call_with_retries(query, retries=2, backoff_secs=1.0)
+    assert query.call_count == 3
+    assert [call.args[0] for call in sleep.call_args_list] == [1.0, 2.0]
+
+
+def test_balance_table_rejects_mismatched_columns():
+    """Test the columns must have the same length."""
+    with pytest.raises(RuntimeError):
+        BalanceTable("ukii", 1, [bytes(20)], [])
+
+
+def test_query_balances_bulk_rejects_invalid_addresses_up_front():
+    """Test malformed addresses are reported before any balance is queried."""
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    with patch.object(client, "bank") as bank, pytest.raises(
+        RuntimeError, match="kii1invalid"
+    ):
+        client.query_balances_bulk(
+            [_address(1), "kii1invalid", _address(2)], denom="ukii", height=1
+        )
+    bank.Balance.assert_not_called()
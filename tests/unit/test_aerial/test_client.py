@@ -22,17 +22,47 @@
 
 
 import datetime
+import json
+import random
+import threading
+import time
+from unittest.mock import Mock, patch
 
 from google.protobuf.timestamp_pb2 import Timestamp
 
 from kiipy.aerial.client import (
+    BLOCK_HEIGHT_METADATA_KEY,
     Block,
+    CompactBlock,
     DEFAULT_QUERY_INTERVAL_SECS,
     DEFAULT_QUERY_TIMEOUT_SECS,
+    DEFAULT_STAKING_PAGE_LIMIT,
     LedgerClient,
 )
 from kiipy.aerial.config import NetworkConfig
+from kiipy.crypto.address import Address
 from kiipy.protos.cosmos.base.abci.v1beta1.abci_pb2 import TxResponse as PbTxResponse
+from kiipy.protos.cosmos.base.tendermint.v1beta1.query_pb2 import GetLatestBlockResponse
+from kiipy.protos.cosmos.base.v1beta1.coin_pb2 import Coin as CoinProto
+from kiipy.protos.cosmos.base.v1beta1.coin_pb2 import DecCoin
+from kiipy.protos.cosmos.distribution.v1beta1.distribution_pb2 import (
+    DelegationDelegatorReward,
+)
+from kiipy.protos.cosmos.distribution.v1beta1.query_pb2 import (
+    QueryDelegationTotalRewardsResponse,
+)
+from kiipy.protos.cosmos.staking.v1beta1.query_pb2 import (
+    QueryDelegatorDelegationsResponse,
+    QueryDelegatorUnbondingDelegationsResponse,
+)
+from kiipy.protos.cosmos.staking.v1beta1.staking_pb2 import (
+    Delegation,
+    DelegationResponse,
+    UnbondingDelegation,
+    UnbondingDelegationEntry,
+)
+from kiipy.protos.cosmos.tx.v1beta1.service_pb2 import GetTxsEventResponse
+from kiipy.protos.cosmwasm.wasm.v1.query_pb2 import QuerySmartContractStateResponse
 from kiipy.protos.tendermint.types.block_pb2 import Block as PbBlock
 from kiipy.protos.tendermint.types.types_pb2 import Data, Header
 
@@ -124,3 +154,267 @@ def test_parse_block():
         "27CA64C092A959C7EDC525ED45E845B1DE6A7590D173FD2FAD9133C8A779A1E3",
     ]
     assert block.chain_id == chain_id
+
+
+def test_parse_compact_block():
+    """Test the compact block hashes its transactions lazily."""
+    timestamp = Timestamp(seconds=1234567890, nanos=5678910)
+    pb_block = PbBlock(
+        header=Header(chain_id="something", height=123, time=timestamp),
+        data=Data(txs=[b"tx1", b"tx2"]),
+    )
+
+    block = CompactBlock.from_proto(pb_block)
+    assert block.height == 123
+    assert block.chain_id == "something"
+    assert block.num_txs == 2
+    assert [bytes(tx) for tx in block.txs] == [b"tx1", b"tx2"]
+    assert block._tx_hashes is None  # pylint: disable=protected-access
+    assert not hasattr(block, "__dict__")
+
+    assert block.to_block() == Block.from_proto(pb_block)
+    assert block.tx_hashes is block.tx_hashes
+
+
+def test_query_height_reads_the_header_only():
+    """Test the latest height is read without parsing the block."""
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    resp = GetLatestBlockResponse(
+        block=PbBlock(header=Header(chain_id="kii", height=77))
+    )
+    with patch.object(client, "tendermint") as tendermint, patch.object(
+        Block, "from_proto"
+    ) as from_proto:
+        tendermint.GetLatestBlock.return_value = resp
+        assert client.query_height() == 77
+        assert client.query_chain_id() == "kii"
+    from_proto.assert_not_called()
+
+
+def test_query_contracts_batch():
+    """Test batch contract queries keep their order and report errors per query."""
+
+    def smart_contract_state(req, metadata=None):
+        assert metadata == [(BLOCK_HEIGHT_METADATA_KEY, "42")]
+        if req.address == "bad":
+            raise RuntimeError("query failed")
+        query = json.loads(req.query_data)
+        return QuerySmartContractStateResponse(
+            data=json.dumps({"address": req.address, "n": query["n"]}).encode()
+        )
+
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    client.wasm = Mock()
+    client.wasm.SmartContractState.side_effect = smart_contract_state
+
+    queries = [(f"contract{i}", {"n": i}) for i in range(20)]
+    queries.insert(5, ("bad", {"n": -1}))
+
+    results = client.query_contracts_batch(queries, max_workers=4, height=42)
+
+    assert len(results) == len(queries)
+    assert not results[5].ok
+    assert str(results[5].error) == "query failed"
+    for (address, query), result in zip(queries, results):
+        assert result.address == address
+        if address != "bad":
+            assert result.ok
+            assert result.result == {"address": address, "n": query["n"]}
+
+    assert client.query_contracts_batch([]) == []
+
+
+def _block(height: int) -> Block:
+    return Block(
+        height=height,
+        time=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        + datetime.timedelta(seconds=5 * height),
+        chain_id="kiichain",
+        tx_hashes=[],
+    )
+
+
+def test_iter_blocks_yields_in_order_with_bounded_concurrency():
+    """Test blocks fetched concurrently are yielded in height order."""
+    in_flight = []
+    lock = threading.Lock()
+
+    def query_block(height):
+        with lock:
+            in_flight.append(height)
+            assert len(in_flight) <= 4
+        time.sleep(random.random() / 100)  # nosec
+        with lock:
+            in_flight.remove(height)
+        return _block(height)
+
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    with patch.object(client, "query_height", return_value=50), patch.object(
+        client, "query_block", side_effect=query_block
+    ):
+        assert [b.height for b in client.iter_blocks(10, concurrency=4)] == list(
+            range(10, 51)
+        )
+        assert [
+            b.height for b in client.iter_blocks(45, end=100, concurrency=4)
+        ] == list(range(45, 51))
+
+
+def test_iter_blocks_follow():
+    """Test following the chain head waits using the observed block interval."""
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    with patch.object(client, "query_height", side_effect=[3, 3, 4, 6]), patch.object(
+        client, "query_block", side_effect=_block
+    ), patch("time.sleep") as sleep:
+        blocks = client.iter_blocks(1, end=6, follow=True)
+        assert [b.height for b in blocks] == [1, 2, 3, 4, 5, 6]
+
+    # the blocks are 5 seconds apart but long past, so the delay is the poll floor
+    assert sleep.call_count == 3
+    assert sleep.call_args.args[0] == 0.5
+
+
+def _txs_event_node(txs, report_total=True):
+    """Serve GetTxsEvent pages of (height, hash) transactions like a node."""
+    requests = []
+
+    def get_txs_event(req):
+        requests.append(req)
+        matching = list(txs)
+        for event in req.events:
+            if event.startswith("tx.height>="):
+                matching = [t for t in matching if t[0] >= int(event.split(">=")[1])]
+            elif event.startswith("tx.height<="):
+                matching = [t for t in matching if t[0] <= int(event.split("<=")[1])]
+        if req.pagination.limit:
+            start, limit = req.pagination.offset, req.pagination.limit
+        else:
+            start, limit = (req.page - 1) * req.limit, req.limit
+        return GetTxsEventResponse(
+            tx_responses=[
+                PbTxResponse(height=height, txhash=txhash)
+                for height, txhash in matching[start : start + limit]  # noqa: E203
+            ],
+            total=len(matching) if report_total else 0,
+        )
+
+    return get_txs_event, requests
+
+
+def test_search_txs_paginates_concurrently():
+    """Test every page of a search is fetched and yielded in order."""
+    txs = [(height, f"TX{height}") for height in range(1, 24)]
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    get_txs_event, requests = _txs_event_node(txs)
+    with patch.object(client, "txs") as txs_client:
+        txs_client.GetTxsEvent.side_effect = get_txs_event
+        results = list(client.search_txs(["message.action='send'"], page_limit=5))
+
+    assert [r.hash for r in results] == [txhash for _, txhash in txs]
+    assert sorted(r.page for r in requests) == [1, 2, 3, 4, 5]
+
+    get_txs_event, requests = _txs_event_node(txs)
+    with patch.object(client, "txs") as txs_client:
+        txs_client.GetTxsEvent.side_effect = get_txs_event
+        results = list(
+            client.search_txs(
+                ["message.action='send'"],
+                from_height=10,
+                page_limit=5,
+                offset_pagination=True,
+            )
+        )
+    assert [r.height for r in results] == list(range(10, 24))
+    assert requests[0].events[-1] == "tx.height>=10"
+    assert requests[0].pagination.count_total
+
+
+def test_search_txs_height_chunks_and_dedupe():
+    """Test chunked searches keep chain order and drop repeated transactions."""
+    # the node returns the transaction at height 8 in both the chunks
+    txs = [(height, f"TX{height}") for height in range(1, 13)] + [(11, "TX8")]
+    txs.sort()
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    get_txs_event, _ = _txs_event_node(txs, report_total=False)
+    with patch.object(client, "txs") as txs_client, patch.object(
+        client, "query_height", return_value=12
+    ):
+        txs_client.GetTxsEvent.side_effect = get_txs_event
+        results = list(
+            client.search_txs(["a.b='c'"], height_chunk=5, page_limit=2, concurrency=3)
+        )
+
+    assert [r.hash for r in results] == [f"TX{height}" for height in range(1, 13)]
+
+
+def _validator(index: int) -> str:
+    return str(Address(bytes([index]) * 20, "kiivaloper"))
+
+
+LARGE = {1: 0, 2: 0, 3: 10**24}
+
+
+def _staking_client() -> LedgerClient:
+    client = LedgerClient(NetworkConfig.kii_testnet())
+    denom = client.network_config.staking_denomination
+    client.staking = Mock()
+    client.distribution = Mock()
+    client.staking.DelegatorDelegations.return_value = QueryDelegatorDelegationsResponse(
+        delegation_responses=[
+            DelegationResponse(
+                delegation=Delegation(validator_address=_validator(i)),
+                # amounts above 2**53 must not go through a float
+                balance=CoinProto(denom=denom, amount=str(100 * i + LARGE[i])),
+            )
+            for i in range(1, 4)
+        ]
+    )
+    client.distribution.DelegationTotalRewards.return_value = (
+        QueryDelegationTotalRewardsResponse(
+            rewards=[
+                DelegationDelegatorReward(
+                    validator_address=_validator(i),
+                    reward=[DecCoin(denom=denom, amount=str(i * 10**18))],
+                )
+                for i in range(1, 3)
+            ]
+        )
+    )
+    client.staking.DelegatorUnbondingDelegations.return_value = (
+        QueryDelegatorUnbondingDelegationsResponse(
+            unbonding_responses=[
+                UnbondingDelegation(
+                    validator_address=_validator(1),
+                    entries=[
+                        UnbondingDelegationEntry(balance=str(10**24 + 5)),
+                        UnbondingDelegationEntry(balance="6"),
+                    ],
+                )
+            ]
+        )
+    )
+    return client
+
+
+def test_query_staking_summary_batches_requests():
+    """Test the staking summary costs one request per query type."""
+    client = _staking_client()
+    summary = client.query_staking_summary(Address(bytes(20)))
+    assert [
+        (str(p.validator), p.amount, p.reward) for p in summary.current_positions
+    ] == [
+        (_validator(1), 100, 1),
+        (_validator(2), 200, 2),
+        (_validator(3), 10**24 + 300, 0),
+    ]
+    assert summary.total_unbonding == 10**24 + 11
+    assert client.distribution.DelegationTotalRewards.call_count == 1
+    assert client.distribution.DelegationRewards.call_count == 0
+    req = client.staking.DelegatorDelegations.call_args.args[0]
+    assert req.pagination.limit == DEFAULT_STAKING_PAGE_LIMIT
+
+    summaries = client.query_staking_summaries(
+        [Address(bytes([i]) * 20) for i in range(3)], max_workers=2
+    )
+    assert [s.total_staked for s in summaries] == [10**24 + 600] * 3
+    assert client.distribution.DelegationTotalRewards.call_count == 4
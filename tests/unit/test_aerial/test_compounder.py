@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the auto-compounding scheduler."""
+
+from typing import List
+from unittest.mock import Mock, patch
+
+from kiipy.aerial.client import Account, StakingPosition, StakingSummary
+from kiipy.aerial.compounder import CompoundScheduler
+from kiipy.aerial.config import NetworkConfig
+from kiipy.aerial.wallet import LocalWallet
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.distribution.v1beta1.tx_pb2 import MsgWithdrawDelegatorReward
+from kiipy.protos.cosmos.staking.v1beta1.tx_pb2 import MsgDelegate
+
+
+VALIDATORS = [Address(bytes([i]) * 20, "kiivaloper") for i in range(1, 3)]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _client(rewards: List[int]) -> Mock:
+    client = Mock()
+    config = NetworkConfig.kii_testnet()
+    config.fee_minimum_gas_price = 0.01
+    client.network_config = config
+    client.query_staking_summary.side_effect = lambda address: StakingSummary(
+        current_positions=[
+            StakingPosition(validator=validator, amount=10**6, reward=reward)
+            for validator, reward in zip(VALIDATORS, rewards)
+        ],
+        unbonding_positions=[],
+    )
+    client.query_account.side_effect = lambda address: Account(address, 1, 0)
+    client.estimate_gas_for_tx.return_value = 1000
+    client.estimate_fee_from_gas.side_effect = lambda gas: f"{-(-gas // 100)}ukii"
+    client.broadcast_tx.return_value.wait_to_complete.return_value.tx_hash = "HASH"
+    return client
+
+
+def test_compound_own_wallets():
+    """Test due delegators are compounded in one transaction each and rescheduled."""
+    client = _client([100, 3])
+    clock = _Clock()
+    scheduler = CompoundScheduler(client, clock=clock)
+    wallets = [LocalWallet.generate() for _ in range(3)]
+    for wallet in wallets[:2]:
+        scheduler.add(wallet)
+    scheduler.add(wallets[2], first_time=clock.now + 10)
+
+    results = scheduler.run_pending()
+    assert [r.delegator for r in results] == [w.address() for w in wallets[:2]]
+    assert all(r.ok and r.tx_hash == "HASH" for r in results)
+    # the 10 ukii fee is taken out of the largest reward
+    assert [r.compounded for r in results] == [93, 93]
+
+    tx = client.broadcast_tx.call_args.args[0]
+    msgs = tx.msgs
+    assert [type(msg) for msg in msgs] == [
+        MsgWithdrawDelegatorReward,
+        MsgWithdrawDelegatorReward,
+        MsgDelegate,
+        MsgDelegate,
+    ]
+    assert [msg.amount.amount for msg in msgs[2:]] == ["90", "3"]
+
+    # no rate observed yet, the default period is used
+    assert results[0].next_time == clock.now + 3600
+    assert scheduler.next_due() == clock.now + 10
+
+    clock.now += 3600
+    results = scheduler.run_pending()
+    assert len(results) == 3
+    period = scheduler.job(wallets[0].address()).next_time - clock.now
+    assert 60 <= period <= 30 * 24 * 3600 and period != 3600
+
+    scheduler.remove(wallets[0].address())
+    assert len(scheduler) == 2
+
+
+def test_compound_skips_rewards_below_fee():
+    """Test no transaction is sent while the rewards do not cover the fee."""
+    client = _client([4, 3])
+    scheduler = CompoundScheduler(client, clock=_Clock())
+    scheduler.add(LocalWallet.generate())
+
+    (result,) = scheduler.run_pending()
+    assert result.ok and result.compounded == 0 and result.tx_hash is None
+    client.broadcast_tx.assert_not_called()
+
+
+def test_compound_granted_delegators():
+    """Test authz delegators are packed into MsgExec messages of the grantee."""
+    client = _client([50, 0])
+    grantee = LocalWallet.generate()
+    scheduler = CompoundScheduler(client, grantee=grantee, clock=_Clock())
+    delegators = [LocalWallet.generate().address() for _ in range(2)]
+    for delegator in delegators:
+        scheduler.add_grant(delegator)
+
+    submitted = Mock(tx_hash="EXEC")
+    submitted.response.gas_wanted = 3000
+    with patch(
+        "kiipy.aerial.compounder.pack_and_broadcast_messages",
+        return_value=[(submitted, [0, 1])],
+    ) as pack:
+        results = scheduler.run_pending()
+
+    execs = pack.call_args.args[1]
+    assert pack.call_args.args[2] is grantee
+    assert [e.grantee for e in execs] == [str(grantee.address())] * 2
+    assert [m.type_url for m in execs[0].msgs] == [
+        "/cosmos.distribution.v1beta1.MsgWithdrawDelegatorReward",
+        "/cosmos.staking.v1beta1.MsgDelegate",
+    ]
+    assert [(r.tx_hash, r.compounded) for r in results] == [("EXEC", 50)] * 2
+    # the grantee fee is shared between the delegators of the transaction
+    assert scheduler.job(delegators[0]).fee == 15
+
+
+def test_compound_granted_delegators_isolates_failing_grants():
+    """Test a revoked grant only fails its own delegator, the others are retried."""
+    client = _client([50, 0])
+    grantee = LocalWallet.generate()
+    scheduler = CompoundScheduler(client, grantee=grantee, clock=_Clock())
+    delegators = [LocalWallet.generate().address() for _ in range(3)]
+    for delegator in delegators:
+        scheduler.add_grant(delegator)
+
+    revoked = delegators[1]
+
+    def estimate_gas(tx):
+        delegators = {
+            MsgWithdrawDelegatorReward.FromString(msg.msgs[0].value).delegator_address
+            for msg in tx.msgs
+        }
+        if str(revoked) in delegators:
+            raise RuntimeError("authorization not found")
+        return 1000
+
+    client.estimate_gas_for_tx.side_effect = estimate_gas
+    client.gas_strategy.block_gas_limit.return_value = 0
+    client.broadcast_tx.return_value.response.gas_wanted = 2000
+    results = scheduler.run_pending()
+
+    assert [r.ok for r in results] == [True, False, True]
+    assert "authorization not found" in str(results[1].error)
+    assert results[1].compounded == 0
+    assert [r.compounded for r in results] == [50, 0, 50]
+    # the two valid delegators went out together, sharing the fee
+    tx = client.broadcast_tx.call_args.args[0]
+    assert len(tx.msgs) == 2
+    assert scheduler.job(delegators[0]).fee == 10
@@ -17,6 +17,7 @@
 #
 # ------------------------------------------------------------------------------
 """This module contains the tests for the aerial/tx_helpers module."""
+import dataclasses
 from unittest.mock import Mock, patch
 
 import pytest
@@ -24,7 +25,10 @@ import pytest
 from kiipy.aerial.client import LedgerClient
 from kiipy.aerial.config import NetworkConfig
 from kiipy.aerial.exceptions import NotFoundError, QueryTimeoutError
-from kiipy.aerial.tx_helpers import SubmittedTx
+from kiipy.aerial.tx_helpers import SubmittedTx, TxResponse
+from kiipy.protos.cosmos.base.abci.v1beta1.abci_pb2 import ABCIMessageLog, StringEvent
+from kiipy.protos.cosmos.base.abci.v1beta1.abci_pb2 import TxResponse as PbTxResponse
+from kiipy.protos.tendermint.abci.types_pb2 import Event, EventAttribute
 
 
 def test_broadcast_tx_timeouts():
@@ -45,3 +49,71 @@ def test_broadcast_tx_timeouts():
     ):
         with pytest.raises(QueryTimeoutError):
             tx.wait_to_complete(timeout=0.1, poll_period=0.2)
+
+
+def test_tx_response_from_proto_keeps_every_event():
+    """Test the lossless event model and the merged compatibility views."""
+
+    def transfer(recipient, amount):
+        return Event(
+            type="transfer",
+            attributes=[
+                EventAttribute(key="recipient", value=recipient),
+                EventAttribute(key="amount", value=amount),
+            ],
+        )
+
+    pb_response = PbTxResponse(
+        txhash="hash",
+        height=10,
+        events=[transfer("a", "1ukii"), transfer("b", "2ukii")],
+        logs=[
+            ABCIMessageLog(
+                msg_index=1,
+                events=[StringEvent(type="message", attributes=[{"key": "k"}])],
+            )
+        ],
+        timestamp="2023-05-09T08:21:03Z",
+    )
+    tx = TxResponse.from_proto(pb_response)
+
+    assert tx.hash == "hash" and tx.height == 10 and tx.is_successful()
+    assert [e.get("recipient") for e in tx.tx_events.of_type("transfer")] == ["a", "b"]
+    assert tx.tx_events.get_all("transfer", "amount") == ["1ukii", "2ukii"]
+    assert tx.tx_events.get("transfer", "amount") == "1ukii"
+    assert tx.tx_events.get("transfer", "missing") is None
+
+    # compatibility views merge events of the same type
+    assert tx.events == {"transfer": {"recipient": "b", "amount": "2ukii"}}
+    assert tx.logs[0].index == 1
+    assert tx.logs[0].events == {"message": {"k": ""}}
+    assert len(tx.message_events(1)) == 1
+    assert len(tx.message_events(0)) == 0
+    assert tx.timestamp.year == 2023
+
+
+def test_tx_response_from_proto_behaves_like_a_dataclass():
+    """Test lazily decoded responses support assignment, replace and equality."""
+    pb_response = PbTxResponse(
+        txhash="hash",
+        height=10,
+        events=[Event(type="message", attributes=[EventAttribute(key="k", value="v")])],
+    )
+    tx = TxResponse.from_proto(pb_response)
+    assert "events" not in tx.__dict__
+
+    eager = TxResponse("hash", 10, 0, 0, 0, "", [], {"message": {"k": "v"}}, None)
+    assert tx == eager
+    assert "events" in tx.__dict__
+    assert repr(tx) == repr(eager)
+
+    copy = dataclasses.replace(tx, code=5)
+    assert copy.code == 5 and not copy.is_successful()
+    assert copy.events == {"message": {"k": "v"}}
+    assert [f.name for f in dataclasses.fields(tx)][-1] == "proto"
+
+    tx.code = 3
+    tx.events = {}
+    assert tx.code == 3 and tx.events == {}
+    with pytest.raises(AttributeError):
+        tx.missing  # pylint: disable=pointless-statement
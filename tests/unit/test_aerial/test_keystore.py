@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the encrypted keystore."""
+
+import pytest
+
+from kiipy.aerial.keystore import Keystore
+from kiipy.aerial.wallet import LocalWallet
+from kiipy.crypto.keypairs import PrivateKey
+
+
+KDF_LOG2_N = 4
+
+
+def test_keystore_roundtrip(tmp_path):
+    """Test keys can be looked up by address after reopening the keystore."""
+    path = str(tmp_path / "wallets.keystore")
+    keys = [PrivateKey() for _ in range(25)]
+
+    Keystore.create(path, "secret", keys, kdf_log2_n=KDF_LOG2_N).close()
+
+    with Keystore(path, "secret") as keystore:
+        assert len(keystore) == len(keys)
+        assert {str(a) for a in keystore.addresses()} == {
+            str(LocalWallet(k).address()) for k in keys
+        }
+
+        for key in keys:
+            address = LocalWallet(key).address()
+            assert address in keystore
+            assert str(address) in keystore
+            assert keystore.private_key(address).private_key == key.private_key
+            assert keystore.wallet(str(address)).address() == address
+
+        unknown = LocalWallet.generate().address()
+        assert unknown not in keystore
+        with pytest.raises(KeyError):
+            keystore.private_key(unknown)
+
+
+def test_keystore_rejects_bad_password(tmp_path):
+    """Test opening the keystore with a wrong password fails."""
+    path = str(tmp_path / "wallets.keystore")
+    Keystore.create(path, "secret", [PrivateKey()], kdf_log2_n=KDF_LOG2_N).close()
+
+    with pytest.raises(RuntimeError, match="password"):
+        Keystore(path, "not the secret")
+
+
+def test_keystore_rejects_invalid_file(tmp_path):
+    """Test opening a file that is not a keystore fails."""
+    path = tmp_path / "wallets.keystore"
+    path.write_bytes(b"not a keystore" * 10)
+
+    with pytest.raises(RuntimeError, match="Invalid keystore file"):
+        Keystore(str(path), "secret")
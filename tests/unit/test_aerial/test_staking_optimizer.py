@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the stake optimizer."""
+
+import pytest
+
+from kiipy.aerial.staking_optimizer import (
+    DelegatorPosition,
+    StakeOptimizer,
+    ValidatorCandidate,
+    optimal_compounding_period,
+    total_reward,
+)
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.staking.v1beta1.tx_pb2 import MsgBeginRedelegate, MsgDelegate
+
+
+def _validator(index: int) -> Address:
+    return Address(bytes([index]) * 20, "kiivaloper")
+
+
+def test_optimal_compounding_period_matches_exhaustive_search():
+    """Test the optimum matches the evaluation of every period."""
+    for fee, stake, rate, duration in [
+        (1e15, 5e19, 2e-7, 6000),
+        (10.0, 1e6, 1e-5, 997),
+        (0.0, 1e6, 1e-6, 100),
+    ]:
+        best = max(
+            range(1, duration),
+            key=lambda period: total_reward(period, fee, stake, rate, duration),
+        )
+        period = optimal_compounding_period(fee, stake, rate, duration)
+        assert total_reward(period, fee, stake, rate, duration) == pytest.approx(
+            total_reward(best, fee, stake, rate, duration), rel=1e-12
+        )
+    assert optimal_compounding_period(10.0, 1e6, 0.0, 100) == 100
+
+
+def test_stake_optimizer_plan():
+    """Test candidates are ranked and the plan messages reach the allocation."""
+    delegator = Address(bytes(20))
+    candidates = [
+        ValidatorCandidate(_validator(1), tokens=100, commission=0.05),
+        ValidatorCandidate(_validator(2), tokens=100, commission=0.01),
+        ValidatorCandidate(_validator(3), tokens=100, commission=0.01, uptime=0.5),
+        ValidatorCandidate(_validator(4), tokens=100, commission=0.0, jailed=True),
+        ValidatorCandidate(_validator(5), tokens=100, commission=0.02),
+        # too much of the voting power
+        ValidatorCandidate(_validator(6), tokens=10000, commission=0.0),
+    ]
+    optimizer = StakeOptimizer(
+        candidates,
+        reward_rate=1e-6,
+        fee=0.01,
+        duration=1000,
+        denom="ukii",
+        max_validator_share=0.5,
+        max_power_share=0.5,
+    )
+    assert [c.address for c in optimizer.ranked] == [
+        _validator(2),
+        _validator(5),
+        _validator(1),
+    ]
+
+    plan = optimizer.plan(
+        DelegatorPosition(delegator, liquid=400, delegations={str(_validator(1)): 600})
+    )
+    assert plan.allocations == {str(_validator(2)): 500, str(_validator(5)): 500}
+    assert [type(msg) for msg in plan.msgs] == [
+        MsgBeginRedelegate,
+        MsgBeginRedelegate,
+        MsgDelegate,
+    ]
+    assert plan.msgs[0].validator_src_address == str(_validator(1))
+    assert plan.msgs[0].amount.amount == "500"
+    assert plan.msgs[1].validator_dst_address == str(_validator(5))
+    assert plan.msgs[1].amount.amount == "100"
+    assert plan.msgs[2].validator_address == str(_validator(5))
+    assert plan.msgs[2].amount.amount == "400"
+    assert plan.final_stake > 1000
+    assert 1 <= plan.compounding_period <= 1000
+
+    assert len(optimizer.plan_many([DelegatorPosition(delegator, 10)] * 3)) == 3
+
+    with pytest.raises(RuntimeError):
+        StakeOptimizer(candidates[3:4], 1e-6, 1.0, 1000, "ukii")
+
+
+def test_stake_optimizer_allocation_respects_max_validator_share():
+    """Test no validator exceeds the share, the rest of the stake stays unallocated."""
+    candidates = [
+        ValidatorCandidate(_validator(index), tokens=100, commission=0.01)
+        for index in (1, 2)
+    ]
+    optimizer = StakeOptimizer(
+        candidates,
+        1e-6,
+        0.01,
+        1000,
+        "ukii",
+        max_validator_share=0.3,
+        max_power_share=1.0,
+    )
+    assert [amount for _, amount in optimizer.allocate(1000)] == [300, 300]
+    assert [amount for _, amount in optimizer.allocate(10**24)] == [3 * 10**23] * 2
+    assert optimizer.allocate(3) == []
+
+    plan = optimizer.plan(DelegatorPosition(Address(bytes(20)), liquid=1000))
+    assert sum(plan.allocations.values()) == 600
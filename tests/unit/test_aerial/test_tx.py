@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2021 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the local transaction encoding and decoding."""
+
+from kiipy.aerial.client.bank import create_bank_send_msg
+from kiipy.aerial.contract.cosmwasm import create_cosmwasm_execute_msg
+from kiipy.aerial.tx import (
+    SigningCfg,
+    Transaction,
+    TxDecoder,
+    decode_tx,
+    encode_tx,
+    message_class,
+)
+from kiipy.aerial.wallet import LocalWallet
+from kiipy.crypto.hashfuncs import sha256
+from kiipy.protos.cosmos.bank.v1beta1.tx_pb2 import MsgSend
+from kiipy.protos.cosmwasm.wasm.v1.tx_pb2 import MsgExecuteContract
+
+
+def _signed_tx_bytes(wallet: LocalWallet) -> bytes:
+    recipient = LocalWallet.generate().address()
+    tx = Transaction()
+    tx.add_message(create_bank_send_msg(wallet.address(), recipient, 10, "ukii"))
+    tx.add_message(
+        create_cosmwasm_execute_msg(wallet.address(), recipient, {"ping": {}})
+    )
+    tx.seal(SigningCfg.direct(wallet.public_key(), 4), "100ukii", 200000, memo="m")
+    tx.sign(wallet.signer(), "kiichain", 1)
+    tx.complete()
+    return encode_tx(tx.tx)
+
+
+def test_decode_tx():
+    """Test decoding raw transaction bytes locally."""
+    wallet = LocalWallet.generate()
+    tx_bytes = _signed_tx_bytes(wallet)
+
+    decoded = decode_tx(tx_bytes)
+    assert decoded.hash == sha256(tx_bytes).hex().upper()
+    assert decoded.memo == "m"
+    assert [type(m) for m in decoded.messages] == [MsgSend, MsgExecuteContract]
+    assert decoded.messages[1].msg == b'{"ping": {}}'
+    assert decoded.signers == [wallet.address()]
+    assert decoded.auth_info.signer_infos[0].sequence == 4
+    assert len(decoded.signatures) == 1
+    assert decode_tx(tx_bytes, tx_hash="ABCD").hash == "ABCD"
+
+    assert message_class("/cosmos.bank.v1beta1.MsgSend") is MsgSend
+    assert message_class("/unknown.Msg") is None
+
+
+def test_tx_decoder_cache():
+    """Test decoded transactions are cached by hash."""
+    wallet = LocalWallet.generate()
+    txs = [_signed_tx_bytes(wallet) for _ in range(3)]
+
+    decoder = TxDecoder(max_entries=2)
+    first = decoder.decode(txs[0])
+    assert decoder.decode(memoryview(txs[0])) is first
+    assert decoder.get(first.hash.lower()) is first
+
+    decoder.decode(txs[1])
+    decoder.decode(txs[2])
+    assert decoder.get(first.hash) is None
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the validator set cache."""
+
+from unittest.mock import Mock
+
+from google.protobuf.any_pb2 import Any as ProtoAny
+
+from kiipy.aerial.client.staking import ValidatorStatus
+from kiipy.aerial.client.utils import BLOCK_HEIGHT_METADATA_KEY
+from kiipy.aerial.client.validators import ValidatorSetCache
+from kiipy.crypto.address import Address
+from kiipy.protos.cosmos.base.query.v1beta1.pagination_pb2 import PageResponse
+from kiipy.protos.cosmos.crypto.ed25519.keys_pb2 import PubKey
+from kiipy.protos.cosmos.staking.v1beta1.query_pb2 import QueryValidatorsResponse
+from kiipy.protos.cosmos.staking.v1beta1.staking_pb2 import Description, Validator
+
+
+def _validator(index: int, tokens: str, status: int = 3) -> Validator:
+    consensus_pubkey = ProtoAny()
+    consensus_pubkey.Pack(PubKey(key=bytes([index]) * 32), type_url_prefix="/")
+    return Validator(
+        operator_address=str(Address(bytes([index]) * 20, "kiivaloper")),
+        consensus_pubkey=consensus_pubkey,
+        tokens=tokens,
+        status=status,
+        description=Description(moniker=f"v{index}"),
+    )
+
+
+def _client(*validator_sets):
+    """Serve each validator set in pages of two validators."""
+    client = Mock()
+    sets = iter(validator_sets)
+    current = []
+
+    def validators(req, metadata):
+        if not req.pagination.key:
+            current[:] = next(sets)
+            client.paged_heights.append(dict(metadata)[BLOCK_HEIGHT_METADATA_KEY])
+        # every page is read at the height of the refresh
+        assert dict(metadata)[BLOCK_HEIGHT_METADATA_KEY] == client.paged_heights[-1]
+        start = int(req.pagination.key or b"0")
+        end = start + req.pagination.limit
+        return QueryValidatorsResponse(
+            validators=current[start:end],
+            pagination=PageResponse(
+                next_key=str(end).encode() if end < len(current) else b""
+            ),
+        )
+
+    client.paged_heights = []
+    client.staking.Validators.side_effect = validators
+    return client
+
+
+def test_validator_set_snapshot_and_diff():
+    """Test the snapshot indexes and the changes between refreshes."""
+    large_stake = "123456789012345678901234567"
+    first = [_validator(1, large_stake), _validator(2, "200"), _validator(3, "300")]
+    second = [
+        _validator(1, large_stake),
+        _validator(2, "250"),
+        _validator(3, "300", status=2),
+        _validator(4, "400"),
+    ]
+    client = _client(first, second)
+    cache = ValidatorSetCache(client, page_limit=2)
+
+    diff = cache.refresh(height=10)
+    assert len(diff.joined) == 3 and not diff.left
+    assert len(cache) == 3
+    top = cache.validators()[0]
+    assert top.tokens == int(large_stake)
+    assert cache.by_consensus_pubkey(bytes([1]) * 32) is top
+    assert cache.get(str(top.address)) is top
+
+    # no new block, no request
+    assert cache.refresh(height=10).empty
+
+    diff = cache.refresh(height=11)
+    assert [s.moniker for s in diff.joined] == ["v4"]
+    assert not diff.left
+    assert [(p.tokens, c.tokens) for p, c in diff.power_changes] == [(200, 250)]
+    assert [(p.status, c.status) for p, c in diff.status_changes] == [
+        (ValidatorStatus.BONDED, ValidatorStatus.UNBONDING)
+    ]
+    # unchanged validators keep their entry
+    assert cache.by_consensus_pubkey(bytes([1]) * 32) is top
+    assert len(cache.validators(ValidatorStatus.BONDED)) == 3
+    assert client.paged_heights == ["10", "11"]
+
+
+def test_validator_set_left():
+    """Test validators missing from the new snapshot are reported as left."""
+    cache = ValidatorSetCache(
+        _client([_validator(1, "1"), _validator(2, "2")], [_validator(2, "2")])
+    )
+    cache.refresh(height=1)
+    diff = cache.refresh(height=2)
+    assert [s.moniker for s in diff.left] == ["v1"]
+    assert cache.by_consensus_pubkey(bytes([1]) * 32) is None
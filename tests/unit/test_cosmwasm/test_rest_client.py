@@ -104,6 +104,37 @@ class WasmRestClientTestCase(unittest.TestCase):
             mock_client.last_base_url
             == "/cosmwasm/wasm/v1/contract/kiicontractaddress/smart/e30="
         )
+        assert mock_client.last_headers is None
+
+    @staticmethod
+    def test_query_smart_contract_state_json():
+        """Test query smart contract state returning the decoded result."""
+        mock_client = MockRestClient(b'{"data": {"orders": [{"id": 1}]}}')
+        wasm = CosmWasmRestClient(mock_client)
+
+        assert wasm.smart_contract_state_json(
+            QuerySmartContractStateRequest(
+                address="kiicontractaddress", query_data=b"{}"
+            )
+        ) == {"orders": [{"id": 1}]}
+        assert (
+            mock_client.last_base_url
+            == "/cosmwasm/wasm/v1/contract/kiicontractaddress/smart/e30="
+        )
+
+    @staticmethod
+    def test_query_smart_contract_state_at_height():
+        """Test query smart contract state forwards the call metadata as headers."""
+        mock_client = MockRestClient(b'{"data": {"balance":"1"}}')
+        wasm = CosmWasmRestClient(mock_client)
+
+        wasm.SmartContractState(
+            QuerySmartContractStateRequest(
+                address="kiicontractaddress", query_data=b"{}"
+            ),
+            metadata=[("x-cosmos-block-height", "42")],
+        )
+        assert mock_client.last_headers == {"x-cosmos-block-height": "42"}
 
     @staticmethod
     def test_query_raw_contract_state():
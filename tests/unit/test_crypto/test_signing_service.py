@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the signing service signers."""
+
+import base64
+import os
+import socket
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from kiipy.crypto.hashfuncs import sha256
+from kiipy.crypto.keypairs import PrivateKey
+from kiipy.crypto.signing_service import (
+    ProcessPoolSigner,
+    SigningDaemon,
+    UnixSocketSigner,
+    _recv_frame,
+    _send_frame,
+)
+
+
+requires_unix_sockets = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix sockets not supported"
+)
+
+
+def test_process_pool_signer_matches_local_signatures():
+    """Test process pool signer produces the same signatures as the private key."""
+    private_key = PrivateKey()
+    messages = [f"message {i}".encode() for i in range(8)]
+
+    with ProcessPoolSigner(private_key, max_workers=2) as signer:
+        assert signer.public_key.public_key == private_key.public_key.public_key
+        assert signer.sign(messages[0]) == private_key.sign(messages[0])
+        assert signer.sign_many(messages) == [private_key.sign(m) for m in messages]
+
+        digest = sha256(messages[1])
+        assert signer.sign_digest(digest) == private_key.sign_digest(digest)
+
+
+@requires_unix_sockets
+def test_unix_socket_signer_batches_concurrent_requests(tmp_path):
+    """Test concurrent sign requests through the signing daemon."""
+    private_key = PrivateKey()
+    key_id = private_key.public_key.public_key_hex
+    messages = [f"message {i}".encode() for i in range(32)]
+
+    with SigningDaemon(str(tmp_path / "signer.sock"), [private_key]) as daemon:
+        signer = UnixSocketSigner(daemon.socket_path, key_id, max_batch_size=8)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                signatures = list(executor.map(signer.sign, messages))
+
+            assert signatures == [private_key.sign(m) for m in messages]
+            assert signer.sign_many(messages[:3]) == signatures[:3]
+            assert signer.public_key.verify(messages[0], signatures[0])
+
+            digest = sha256(messages[0])
+            assert signer.sign_digest(digest) == private_key.sign_digest(digest)
+        finally:
+            signer.close()
+
+
+@requires_unix_sockets
+def test_unix_socket_signer_errors(tmp_path):
+    """Test unknown keys and unreachable daemons are reported."""
+    socket_path = str(tmp_path / "signer.sock")
+    unknown_key_id = PrivateKey().public_key.public_key_hex
+
+    with SigningDaemon(socket_path, [PrivateKey()]):
+        signer = UnixSocketSigner(socket_path, unknown_key_id, timeout=5)
+        with pytest.raises(RuntimeError, match="Unknown signing key"):
+            signer.sign(b"message")
+        signer.close()
+
+    signer = UnixSocketSigner(str(tmp_path / "missing.sock"), unknown_key_id, timeout=5)
+    with pytest.raises(RuntimeError, match="Unable to connect"):
+        signer.sign(b"message")
+
+
+@requires_unix_sockets
+def test_signing_daemon_replaces_stale_socket(tmp_path):
+    """Test the daemon replaces a stale socket and restricts it to its owner."""
+    socket_path = str(tmp_path / "signer.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+
+    private_key = PrivateKey()
+    with SigningDaemon(socket_path, [private_key]):
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        signer = UnixSocketSigner(socket_path, private_key.public_key.public_key_hex)
+        assert signer.sign(b"message") == private_key.sign(b"message")
+        signer.close()
+    assert not os.path.exists(socket_path)
+
+
+@requires_unix_sockets
+def test_unix_socket_signer_reconnects_after_bad_response(tmp_path):
+    """Test short responses fail the whole batch and the signer reconnects."""
+    socket_path = str(tmp_path / "signer.sock")
+    private_key = PrivateKey()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    connections = []
+
+    def serve():
+        for signatures in ([], None):
+            conn, _ = server.accept()
+            connections.append(conn)
+            request = _recv_frame(conn)
+            if signatures is None:
+                signatures = [
+                    base64.b64encode(
+                        private_key.sign(base64.b64decode(item[0]))
+                    ).decode()
+                    for item in request["items"]
+                ]
+            _send_frame(conn, {"signatures": signatures})
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+
+    signer = UnixSocketSigner(
+        socket_path, private_key.public_key.public_key_hex, timeout=5
+    )
+    try:
+        with pytest.raises(RuntimeError, match="returned 0 signatures"):
+            signer.sign(b"message")
+        assert signer.sign(b"message") == private_key.sign(b"message")
+        assert len(connections) == 2
+    finally:
+        signer.close()
+        thread.join(5)
+        for conn in connections:
+            conn.close()
+        server.close()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018-2022 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the chain indexer."""
+
+import dataclasses
+from unittest.mock import Mock
+
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from kiipy.aerial.client import CompactBlock
+from kiipy.aerial.client.bank import create_bank_send_msg
+from kiipy.aerial.config import NetworkConfig
+from kiipy.aerial.contract.cosmwasm import create_cosmwasm_execute_msg
+from kiipy.aerial.tx import SigningCfg, Transaction, encode_tx
+from kiipy.aerial.wallet import LocalWallet
+from kiipy.crypto.address import Address
+from kiipy.crypto.hashfuncs import sha256
+from kiipy.indexer import ChainIndexer, message_addresses
+from kiipy.protos.cosmos.bank.v1beta1.tx_pb2 import MsgSend
+from kiipy.protos.cosmos.base.abci.v1beta1.abci_pb2 import TxResponse
+from kiipy.protos.cosmos.tx.v1beta1.service_pb2 import GetTxsEventResponse
+from kiipy.protos.tendermint.abci.types_pb2 import Event, EventAttribute
+
+
+def _tx_bytes(wallet: LocalWallet, *msgs) -> bytes:
+    tx = Transaction()
+    for msg in msgs:
+        tx.add_message(msg)
+    tx.seal(SigningCfg.direct(wallet.public_key(), 0), "100ukii", 200000, memo="m")
+    tx.sign(wallet.signer(), "kiichain", 1)
+    tx.complete()
+    return encode_tx(tx.tx)
+
+
+def _block(height: int, *txs: bytes) -> CompactBlock:
+    return CompactBlock(height, "kiichain", Timestamp(seconds=1600000000 + height), txs)
+
+
+def _chain():
+    alice, bob, carol = (LocalWallet.generate() for _ in range(3))
+    send = _tx_bytes(
+        alice, create_bank_send_msg(alice.address(), bob.address(), 5, "ukii")
+    )
+    execute = _tx_bytes(
+        bob, create_cosmwasm_execute_msg(bob.address(), "kii1pool", {"swap": {}})
+    )
+    payout = _tx_bytes(
+        carol, create_bank_send_msg(carol.address(), alice.address(), 7, "ukii")
+    )
+    blocks = [_block(1, send), _block(2), _block(3, execute, payout)]
+    return (alice, bob, carol), blocks
+
+
+def test_message_addresses():
+    """Test the sender and recipient are found from the message fields."""
+    addresses = message_addresses(MsgSend(from_address="kii1from", to_address="kii1to"))
+    assert (addresses.sender, addresses.recipient, addresses.contract) == (
+        "kii1from",
+        "kii1to",
+        None,
+    )
+
+
+def test_index_blocks_and_query(tmp_path):
+    """Test transactions, messages and events are indexed and queried."""
+    (alice, bob, carol), blocks = _chain()
+    transfer = Event(
+        type="transfer",
+        attributes=[EventAttribute(key="recipient", value=str(carol.address()))],
+    )
+
+    def get_txs_event(req):
+        height = int(req.events[0].split("=")[1])
+        block = next(b for b in blocks if b.height == height)
+        return GetTxsEventResponse(
+            tx_responses=[
+                TxResponse(height=height, txhash=h, code=0, events=[transfer])
+                for h in block.tx_hashes
+            ]
+        )
+
+    client = Mock()
+    client.network_config = NetworkConfig.kii_testnet()
+    client.txs.GetTxsEvent.side_effect = get_txs_event
+    indexer = ChainIndexer(client, str(tmp_path / "chain.db"), commit_size=1)
+    assert indexer.index_blocks(blocks) == 3
+    assert indexer.checkpoint() == 3
+    # blocks without transactions are not queried for results
+    assert client.txs.GetTxsEvent.call_count == 2
+
+    history = indexer.account_history(str(alice.address()))
+    assert [(tx.height, tx.index) for tx in history] == [(1, 0), (3, 1)]
+    assert history[0].hash == sha256(bytes(blocks[0].txs[0])).hex().upper()
+    assert history[0].signer == str(alice.address())
+    assert history[0].code == 0 and history[0].memo == "m"
+    assert len(indexer.account_history(str(alice.address()), from_height=2)) == 1
+    assert len(indexer.account_history(str(alice.address()), limit=1)) == 1
+    # carol only appears as a transfer recipient in the events
+    assert len(indexer.account_history(str(carol.address()))) == 3
+
+    sends = indexer.messages(
+        type_url="/cosmos.bank.v1beta1.MsgSend", recipient=str(bob.address())
+    )
+    assert len(sends) == 1
+    assert sends[0].sender == str(alice.address())
+    assert sends[0].decode().amount[0].amount == "5"
+    assert [m.height for m in indexer.messages(contract="kii1pool")] == [3]
+
+    events = indexer.events(event_type="transfer", from_height=3)
+    assert [(e.height, e.get("recipient")) for e in events] == [
+        (3, str(carol.address())),
+        (3, str(carol.address())),
+    ]
+    indexer.close()
+
+
+def test_sync_resumes_from_checkpoint(tmp_path):
+    """Test sync starts after the last committed block and writes in batches."""
+    (alice, _, _), blocks = _chain()
+    client = Mock()
+    # signers are decoded with the address prefix of the network
+    client.network_config = dataclasses.replace(
+        NetworkConfig.kii_testnet(), address_prefix="osmo"
+    )
+    client.iter_blocks.side_effect = lambda start, **kwargs: iter(
+        b for b in blocks if b.height >= start and b.height <= kwargs["end"]
+    )
+    path = str(tmp_path / "chain.db")
+
+    indexer = ChainIndexer(client, path, with_events=False)
+    assert indexer.sync(end=1) == 1
+    indexer.close()
+
+    indexer = ChainIndexer(client, path, with_events=False)
+    assert indexer.checkpoint() == 1
+    assert indexer.sync(end=3) == 2
+    assert client.iter_blocks.call_args.args == (2,)
+    assert indexer.sync(end=3) == 0
+    assert indexer.store.tx(blocks[2].tx_hashes[0]).code is None
+    assert indexer.store.tx(blocks[0].tx_hashes[0]).signer == str(
+        Address(alice.address(), "osmo")
+    )
+    client.txs.GetTxsEvent.assert_not_called()
+    indexer.close()
@@ -20,7 +20,15 @@
 """Test case of Mnemonic module."""
 import unittest
 
-from kiipy.mnemonic import derive_child_key_from_mnemonic
+from kiipy.mnemonic import (
+    derive_child_key_from_mnemonic,
+    entropies_to_mnemonics,
+    entropy_to_mnemonic,
+    generate_mnemonics,
+    mnemonic_to_entropy,
+    validate_mnemonic_and_normalise,
+    validate_mnemonics,
+)
 
 
 COSMOS_HD_PATH = "m/44'/118'/0'/0/0"
@@ -103,3 +111,56 @@ class MnemonicTestCase(unittest.TestCase):
                 mnemonic, passphrase, COSMOS_HD_PATH
             )
             assert mnemonic_key == gt_key
+
+    def test_entropy_to_mnemonic_vectors(self):
+        """Test entropy encoding against the BIP-39 reference vectors."""
+        vectors = [
+            (
+                "00000000000000000000000000000000",
+                "abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about",
+            ),
+            (
+                "7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f",
+                "legal winner thank year wave sausage worth useful legal winner thank yellow",
+            ),
+            (
+                "808080808080808080808080808080808080808080808080",
+                "letter advice cage absurd amount doctor acoustic avoid letter advice cage absurd amount doctor acoustic avoid letter always",
+            ),
+            (
+                "ffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff",
+                "zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo vote",
+            ),
+        ]
+        for entropy_hex, mnemonic in vectors:
+            entropy = bytes.fromhex(entropy_hex)
+            self.assertEqual(entropy_to_mnemonic(entropy), mnemonic)
+            self.assertEqual(mnemonic_to_entropy(mnemonic), entropy)
+
+        self.assertEqual(
+            entropies_to_mnemonics(bytes.fromhex(e) for e, _ in vectors),
+            [m for _, m in vectors],
+        )
+
+    def test_mnemonic_checksum_validation(self):
+        """Test mnemonics with a bad checksum are rejected."""
+        for mnemonic in MNEMONICS:
+            self.assertEqual(validate_mnemonic_and_normalise(mnemonic), mnemonic)
+
+        bad_checksum = "abandon " * 11 + "abandon"
+        with self.assertRaises(ValueError):
+            validate_mnemonic_and_normalise(bad_checksum)
+        with self.assertRaises(ValueError):
+            validate_mnemonic_and_normalise("abandon " * 11 + "notaword")
+
+        self.assertEqual(
+            validate_mnemonics([MNEMONICS[0], bad_checksum, "too short"]),
+            [True, False, False],
+        )
+
+    def test_generate_mnemonics(self):
+        """Test generating a batch of mnemonics."""
+        mnemonics = generate_mnemonics(10, num_bits=128)
+        self.assertEqual(len(mnemonics), 10)
+        self.assertTrue(all(len(m.split()) == 12 for m in mnemonics))
+        self.assertTrue(all(validate_mnemonics(mnemonics)))